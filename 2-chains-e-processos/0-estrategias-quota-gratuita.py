@@ -6,112 +6,158 @@ Este arquivo contém várias estratégias para usar o Gemini gratuitamente
 sem exceder as quotas de 15 requisições por minuto.
 """
 
+import asyncio
+import threading
 import time
-import random
 import os
 from typing import List, Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from cache_gemini import ResponseCache
+from extrativo_gemini import ExtractiveSummarizer
+from agendador_gemini import PRIORITY_BATCH, DeadlineExceededError, RequestScheduler
+from packing_gemini import PromptPacker
+from quota_gemini import QuotaLimiter, QUOTA_CONFIG, CircuitBreaker, CircuitOpenError, is_quota_error, parse_retry_delay
+from clientes_gemini import REGISTRY
 
 # ============================================================================
 # ESTRATÉGIA 1: Rate Limiting Inteligente com Backoff Exponencial
 # ============================================================================
 
 class SmartRateLimiter:
-    def __init__(self, requests_per_minute=15):
+    def __init__(self, requests_per_minute=15, limiter=None):
         self.requests_per_minute = requests_per_minute
-        self.min_interval = 60.0 / requests_per_minute
-        self.last_request_time = 0
+        # A espera vem dos buckets de quota (minuto/hora/dia), não de um intervalo fixo
+        self.limiter = limiter or QuotaLimiter.from_config({"requests_per_minute": requests_per_minute})
+        self.min_interval = self.limiter.min_interval
         self.consecutive_failures = 0
         self.max_retries = 3
         
     def wait_if_needed(self):
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.min_interval:
-            wait_time = self.min_interval - time_since_last
-            # Adiciona jitter para evitar thundering herd
-            wait_time += random.uniform(0, 1)
+        wait_time = self.limiter.reserve()
+        if wait_time > 0:
             print(f"⏳ Aguardando {wait_time:.1f}s...")
             time.sleep(wait_time)
     
-    def handle_quota_error(self):
+    def handle_quota_error(self, error=None):
         self.consecutive_failures += 1
-        # Backoff exponencial: 60s, 120s, 240s
-        wait_time = 60 * (2 ** (self.consecutive_failures - 1))
-        print(f"🚫 Quota excedida! Aguardando {wait_time}s...")
+        # Usa a espera sugerida pelo servidor; sem sugestão, backoff exponencial
+        # a partir de initial_backoff, limitado a backoff_on_quota_error
+        wait_time = parse_retry_delay(error) if error is not None else None
+        if wait_time is None:
+            wait_time = min(QUOTA_CONFIG["initial_backoff"] * (2 ** (self.consecutive_failures - 1)),
+                            QUOTA_CONFIG["backoff_on_quota_error"])
+        print(f"🚫 Quota excedida! Aguardando {wait_time:.1f}s...")
         time.sleep(wait_time)
     
     def reset_failures(self):
         self.consecutive_failures = 0
 
 # ============================================================================
-# ESTRATÉGIA 2: Modelo com Fallback para Texto Simples
+# ESTRATÉGIA 2: Modelo com Fallback para Resumo Extrativo Local
 # ============================================================================
 
 class FallbackModel:
-    def __init__(self, model_name="gemini-2.5-flash-lite"):
-        self.model = ChatGoogleGenerativeAI(model=model_name, temperature=0)
-        self.rate_limiter = SmartRateLimiter()
+    def __init__(self, model_name="gemini-2.5-flash-lite", cache=None, client=None, rate_limiter=None,
+                 fallback=None):
+        self.model_name = model_name
+        self._client = client
+        if client is None and rate_limiter is None:
+            # Quota dividida com os outros modelos do processo (mesma API key)
+            quota = REGISTRY.quota(model_name)
+            self.rate_limiter = SmartRateLimiter(limiter=quota.limiter)
+            self.circuit_breaker = quota.circuit_breaker
+        else:
+            self.rate_limiter = rate_limiter or SmartRateLimiter()
+            self.circuit_breaker = CircuitBreaker()
+        self.cache = cache
+        # Resumo extrativo (TF-IDF + TextRank) usado quando o Gemini não responde
+        self.fallback = fallback or ExtractiveSummarizer()
+    
+    @property
+    def model(self):
+        # Construído só na primeira chamada real: cache e fallback não precisam dele
+        if self._client is None:
+            self._client = REGISTRY.client(self.model_name, 0)
+        return self._client
         
     def invoke(self, prompt, max_retries=3):
+        if self.cache is not None:
+            cached = self.cache.lookup(self.model_name, 0, prompt)
+            if cached is not None:
+                return cached
+        
         for attempt in range(max_retries):
             try:
-                self.rate_limiter.wait_if_needed()
-                result = self.model.invoke(prompt)
-                self.rate_limiter.reset_failures()
-                return result
-                
-            except Exception as e:
-                error_msg = str(e).lower()
-                if "quota" in error_msg or "429" in error_msg:
-                    self.rate_limiter.handle_quota_error()
-                    if attempt == max_retries - 1:
-                        print("⚠️  Usando fallback de texto simples...")
-                        return self._simple_fallback(prompt)
-                else:
-                    raise e
-        
-        return self._simple_fallback(prompt)
-    
-    def _simple_fallback(self, prompt):
-        """Fallback simples quando o Gemini não está disponível"""
-        # Implementa lógica básica de sumarização
-        text = str(prompt)
-        words = text.split()
-        if len(words) > 100:
-            # Pega as primeiras e últimas frases
-            sentences = text.split('.')
-            if len(sentences) > 2:
-                summary = sentences[0] + '. ' + sentences[-2] + '.'
-                return type('obj', (object,), {'content': summary})()
+                # guard() resolve a chamada de teste do half_open em qualquer saída
+                with self.circuit_breaker.guard():
+                    try:
+                        self.rate_limiter.wait_if_needed()
+                        result = self.model.invoke(prompt)
+                    except Exception as e:
+                        if not is_quota_error(e):
+                            raise
+                        self.circuit_breaker.record_failure()
+                        if attempt == max_retries - 1:
+                            print("⚠️  Usando resumo extrativo local...")
+                            return self._local_fallback(prompt)
+                        self.rate_limiter.handle_quota_error(e)
+                        continue
+                    self.rate_limiter.reset_failures()
+                    self.circuit_breaker.record_success()
+                    if self.cache is not None:
+                        self.cache.update(self.model_name, 0, prompt, result)
+                    return result
+            except CircuitOpenError:
+                # Com o circuito aberto nem tenta: vai direto para o fallback
+                print("⚠️  Circuito aberto, usando resumo extrativo local...")
+                return self._local_fallback(prompt)
         
-        return type('obj', (object,), {'content': text[:200] + '...' if len(text) > 200 else text})()
+        return self._local_fallback(prompt)
+    
+    def _local_fallback(self, prompt):
+        """
+        Fallback local quando o Gemini não está disponível (retorna AIMessage
+        marcada com response_metadata["degraded"] = True)
+        """
+        result = self.fallback.invoke(prompt)
+        result.response_metadata["degraded"] = True
+        return result
 
 # ============================================================================
-# ESTRATÉGIA 3: Processamento em Lotes com Delays
+# ESTRATÉGIA 3: Processamento em Lotes no Ritmo da Quota
 # ============================================================================
 
-def process_in_batches(items: List, batch_size: int = 3, delay_between_batches: float = 10.0):
+def process_in_batches(items: List, batch_size: int = 3, delay_between_batches: float = 0.0, model=None,
+                       limiter=None):
     """
-    Processa itens em lotes com delays entre eles para respeitar quotas
+    Processa itens em lotes respeitando a quota.
+    
+    Com um `model`, cada lote vira UMA requisição (PromptPacker): os prompts
+    do lote são empacotados juntos e a resposta é separada por item. O
+    ritmo vem do limitador do modelo, que espera só o necessário.
+    Sem modelo, cada item espera pelo `limiter` (padrão: QUOTA_CONFIG).
+    `delay_between_batches` é uma pausa extra opcional entre lotes.
     """
     results = []
+    packer = PromptPacker(model, pack_size=batch_size) if model is not None else None
+    if packer is None:
+        limiter = limiter or QuotaLimiter.from_config()
     
     for i in range(0, len(items), batch_size):
         batch = items[i:i + batch_size]
         print(f"📦 Processando lote {i//batch_size + 1}/{(len(items) + batch_size - 1)//batch_size}")
         
         # Processa o lote atual
-        for item in batch:
-            # Aqui você processaria cada item
-            results.append(item)
-            time.sleep(4.5)  # 4.5s entre itens (15/min = 4s, mas vamos ser conservadores)
+        if packer is not None:
+            results.extend(packer.invoke_many(batch))
+        else:
+            for item in batch:
+                # Aqui você processaria cada item
+                limiter.acquire()
+                results.append(item)
         
-        # Delay entre lotes
-        if i + batch_size < len(items):
+        if delay_between_batches and i + batch_size < len(items):
             print(f"⏸️  Aguardando {delay_between_batches}s entre lotes...")
             time.sleep(delay_between_batches)
     
@@ -121,38 +167,171 @@ def process_in_batches(items: List, batch_size: int = 3, delay_between_batches:
 # ESTRATÉGIA 4: Cache Local para Evitar Chamadas Repetidas
 # ============================================================================
 
-class LocalCache:
-    def __init__(self):
-        self.cache = {}
-    
-    def get(self, key):
-        return self.cache.get(key)
-    
-    def set(self, key, value):
-        self.cache[key] = value
-    
-    def has(self, key):
-        return key in self.cache
+# O cache fica em disco (cache_gemini.py), com chave estável por modelo,
+# temperatura e prompt. Reexecutar o mesmo corpus não gasta quota.
+LocalCache = ResponseCache
 
 # ============================================================================
 # ESTRATÉGIA 5: Uso de Múltiplas Contas (se disponível)
 # ============================================================================
 
+class KeySlot:
+    """
+    Uma API key com a quota compartilhada do registro e o próprio cooldown.
+    
+    O cliente Gemini só é construído na primeira requisição enviada por
+    esta chave.
+    """
+    
+    def __init__(self, index: int, model_name: str, temperature: float, api_key: str):
+        self.index = index
+        self.model_name = model_name
+        self.temperature = temperature
+        self.api_key = api_key
+        # Mesmo estado (bucket, taxa adaptativa, circuito) dos outros modelos com esta chave
+        self.quota = REGISTRY.quota(model_name, api_key)
+        self.limiter = self.quota.limiter
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.request_count = 0
+        self.quota_errors = 0
+    
+    @property
+    def model(self):
+        """Cliente Gemini desta chave, construído (ou reaproveitado do registro) no primeiro uso"""
+        return REGISTRY.client(self.model_name, self.temperature, self.api_key)
+    
+    def available_at(self, now: float) -> float:
+        """Momento em que esta chave pode enviar a próxima requisição"""
+        return max(self.cooldown_until, now + self.limiter.peek_wait())
+
+
 class MultiAccountModel:
-    def __init__(self, api_keys: List[str]):
-        self.models = []
-        self.current_index = 0
+    """
+    Distribui as requisições entre várias API keys.
+    
+    Cada chave tem o próprio token bucket. Cada requisição vai para a chave
+    que libera mais cedo (empate: menos requisições em andamento). Uma chave
+    que recebe 429 entra em cooldown e as outras continuam atendendo, então
+    com N chaves a vazão se aproxima de N vezes o RPM de uma chave.
+    """
+    
+    def __init__(self, api_keys: List[str], model_name="gemini-2.5-flash-lite", temperature=0,
+                 cooldown: float = None, max_retries: int = 3):
+        if not api_keys:
+            raise ValueError("Informe pelo menos uma API key")
+        self.cooldown = cooldown if cooldown is not None else QUOTA_CONFIG["backoff_on_quota_error"]
+        self.max_retries = max_retries
+        self.slots = []
+        self._lock = threading.Lock()
+        
+        self.slots = [KeySlot(index, model_name, temperature, api_key)
+                      for index, api_key in enumerate(api_keys)]
+    
+    @property
+    def models(self):
+        """Clientes de todas as chaves (constrói os que ainda não foram usados)"""
+        return [slot.model for slot in self.slots]
+    
+    def _reserve_slot(self):
+        """
+        Escolhe a chave que libera mais cedo e reserva um token nela.
         
-        for api_key in api_keys:
-            # Aqui você configuraria cada modelo com uma API key diferente
-            # model = ChatGoogleGenerativeAI(..., google_api_key=api_key)
-            pass
+        Se até essa chave está em cooldown, nada é reservado: um token
+        reservado agora ficaria parado até o fim do cooldown, gastando a
+        quota compartilhada com os outros modelos da mesma chave.
+        
+        Returns:
+            tuple: (slot, segundos a esperar antes de enviar), ou (None,
+                segundos até o fim do cooldown) se todas as chaves estão em cooldown
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = min(self.slots, key=lambda s: (s.available_at(now), s.in_flight))
+            if slot.cooldown_until > now:
+                return None, slot.cooldown_until - now
+            wait = slot.limiter.reserve()
+            slot.in_flight += 1
+            return slot, wait
+    
+    def _handle_result(self, slot: KeySlot, error: Exception = None) -> bool:
+        """Atualiza o estado da chave; retorna True se o erro foi de quota"""
+        quota_error = error is not None and is_quota_error(error)
+        cooldown = (parse_retry_delay(error) or self.cooldown) if quota_error else 0.0
+        # Mesmo lock de _reserve_slot: threads e corrotinas mexem nos mesmos contadores
+        with self._lock:
+            slot.in_flight -= 1
+            if error is None:
+                slot.request_count += 1
+            elif quota_error:
+                slot.quota_errors += 1
+                slot.cooldown_until = max(slot.cooldown_until, time.monotonic() + cooldown)
+        # O 429 (ou o sucesso) vale para a chave inteira: os outros modelos que
+        # usam a mesma quota do registro também reduzem a taxa
+        if error is None:
+            slot.quota.rate_controller.on_success()
+            slot.quota.circuit_breaker.record_success()
+        elif quota_error:
+            slot.quota.rate_controller.on_quota_error(error)
+            slot.quota.circuit_breaker.record_failure()
+        if quota_error:
+            print(f"🚫 Quota excedida na chave {slot.index + 1}! Cooldown de {cooldown:.0f}s")
+        return quota_error
     
     def get_next_model(self):
-        # Rotaciona entre as contas disponíveis
-        model = self.models[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.models)
-        return model
+        """Retorna o modelo da chave que está livre mais cedo"""
+        with self._lock:
+            now = time.monotonic()
+            return min(self.slots, key=lambda s: (s.available_at(now), s.in_flight)).model
+    
+    def invoke(self, prompt):
+        for attempt in range(self.max_retries):
+            slot, wait = self._reserve_slot()
+            while slot is None:
+                time.sleep(wait)
+                slot, wait = self._reserve_slot()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                result = slot.model.invoke(prompt)
+            except Exception as e:
+                if not self._handle_result(slot, e) or attempt == self.max_retries - 1:
+                    raise
+                continue
+            self._handle_result(slot)
+            return result
+    
+    async def ainvoke(self, prompt):
+        for attempt in range(self.max_retries):
+            slot, wait = self._reserve_slot()
+            while slot is None:
+                await asyncio.sleep(wait)
+                slot, wait = self._reserve_slot()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                result = await slot.model.ainvoke(prompt)
+            except Exception as e:
+                if not self._handle_result(slot, e) or attempt == self.max_retries - 1:
+                    raise
+                continue
+            self._handle_result(slot)
+            return result
+    
+    def get_stats(self):
+        """Retorna estatísticas por chave"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "key": slot.index + 1,
+                    "requests": slot.request_count,
+                    "quota_errors": slot.quota_errors,
+                    "in_flight": slot.in_flight,
+                    "cooldown_remaining": max(0.0, slot.cooldown_until - now),
+                }
+                for slot in self.slots
+            ]
 
 # ============================================================================
 # EXEMPLO DE USO
@@ -161,13 +340,17 @@ class MultiAccountModel:
 def exemplo_uso_inteligente():
     """Exemplo de como usar as estratégias combinadas"""
     
-    # 1. Usa o modelo com fallback
-    model = FallbackModel()
-    
-    # 2. Cache local
+    # 1. Cache local (persistente entre execuções)
     cache = LocalCache()
     
-    # 3. Processamento em lotes
+    # 2. Modelo com fallback, consultando o cache antes de cada chamada
+    model = FallbackModel(cache=cache)
+    
+    # 3. Agendador: lote no ritmo dos buckets de quota e perguntas interativas
+    #    na frente. Só o lote tem o resumo extrativo local como fallback: para
+    #    uma pergunta ele só devolveria o texto da própria pergunta
+    scheduler = RequestScheduler(model, limiter=model.rate_limiter.limiter)
+    
     textos = [
         "Primeiro texto para processar...",
         "Segundo texto para processar...",
@@ -176,29 +359,24 @@ def exemplo_uso_inteligente():
         "Quinto texto para processar..."
     ]
     
-    resultados = []
-    
-    for i, texto in enumerate(textos):
-        # Verifica cache primeiro
-        cache_key = f"processed_{hash(texto)}"
-        if cache.has(cache_key):
-            print(f"📋 Usando resultado do cache para texto {i+1}")
-            resultados.append(cache.get(cache_key))
-            continue
-        
-        # Processa com o modelo
-        print(f"🤖 Processando texto {i+1}/{len(textos)}")
-        resultado = model.invoke(texto)
-        resultados.append(resultado)
+    with scheduler:
+        print(f"🤖 Enfileirando {len(textos)} textos como lote")
+        futuros = [scheduler.submit(texto, priority=PRIORITY_BATCH, fallback=model.fallback)
+                   for texto in textos]
         
-        # Salva no cache
-        cache.set(cache_key, resultado)
+        # Uma pergunta interativa passa na frente do lote (prazo de 30s)
+        try:
+            resposta = scheduler.invoke("Em uma frase: o que é rate limiting?", deadline=30)
+            if resposta.response_metadata.get("degraded"):
+                print("⚠️  Gemini indisponível: a pergunta ficou sem resposta do modelo")
+            else:
+                print(f"💬 Resposta interativa: {resposta.content}")
+        except DeadlineExceededError as e:
+            print(f"⏱️  Pergunta interativa sem resposta: {e}")
         
-        # Delay entre processamentos
-        if i < len(textos) - 1:
-            print("⏳ Aguardando 5 segundos...")
-            time.sleep(5)
+        resultados = [futuro.result() for futuro in futuros]
     
+    print(f"📊 Agendador: {scheduler.get_stats()}")
     return resultados
 
 if __name__ == "__main__":
@@ -1,10 +1,10 @@
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.runnables import chain
-from dotenv import load_dotenv
-load_dotenv()
+from cascata_gemini import ModelCascade
 
-model = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.5)
+# Cascata com rate limiting: pode ser encadeada com | como o modelo do LangChain.
+# Perguntas simples ficam no flash-lite; o pro só entra se a resposta for reprovada
+model = ModelCascade(temperature=0.5)
 
 @chain
 def square(input_dict: dict) -> dict:
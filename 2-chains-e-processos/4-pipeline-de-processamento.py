@@ -1,8 +1,7 @@
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
-from dotenv import load_dotenv
-load_dotenv()
+from cascata_gemini import DEFAULT_VALIDATORS, ModelCascade, message_text
+from pipeline_gemini import Stage, StagedPipeline
 
 template_translate = PromptTemplate(
     input_variables=["initial_text"],
@@ -14,10 +13,38 @@ template_summarize = PromptTemplate(
     template="Summarize the following text in exactly 4 words:\n ```{text}```"
 )
 
-llm_en = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0)
+
+def four_words(prompt, message):
+    """O resumo precisa ter exatamente 4 palavras"""
+    return len(message_text(message).split()) == 4
+
+
+# Cascata (Runnable): tenta o flash-lite e só usa o pro quando a resposta é
+# reprovada; cada modelo tem a própria quota e o cliente compartilhado
+llm_en = ModelCascade(temperature=0)
+llm_summary = ModelCascade(temperature=0, validators=[*DEFAULT_VALIDATORS, four_words])
 
 translate = template_translate | llm_en | StrOutputParser()
-pipeline = {"text": translate} | template_summarize | llm_en | StrOutputParser()
+pipeline = {"text": translate} | template_summarize | llm_summary | StrOutputParser()
 
 response = pipeline.invoke({"initial_text": "Bolsonaro vai ser preso e vamos fazer muita festa!"})
-print(response)
\ No newline at end of file
+print(response)
+
+# Vários textos: cada etapa tem fila e workers próprios, então a tradução dos
+# próximos textos acontece enquanto os anteriores são resumidos
+textos = [
+    "O time venceu o campeonato depois de dez anos de espera.",
+    "A nova lei de proteção de dados entra em vigor no mês que vem.",
+    "Choveu o dia inteiro e o show ao ar livre foi adiado.",
+    "A empresa anunciou a abertura de trezentas vagas de emprego.",
+]
+staged = StagedPipeline([
+    Stage("traduzir", {"text": translate}),
+    Stage("resumir", template_summarize | llm_summary | StrOutputParser()),
+])
+for texto, resumo in zip(textos, staged.run([{"initial_text": t} for t in textos])):
+    print(f"📝 {texto}\n   ➜ {resumo}")
+
+stats = staged.get_stats()
+print(f"📊 {stats['items']} textos em {stats['elapsed']:.1f}s ({stats['items_per_minute']:.1f} textos/min)")
+print(f"🪜 Cascata do resumo: {llm_summary.get_stats()['answered']}")
\ No newline at end of file
@@ -1,10 +1,9 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.chains.summarize import load_summarize_chain
-from dotenv import load_dotenv
-load_dotenv()
+from utils_gemini import RateLimitedModel
 
-model = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite", temperature=0)
+# load_summarize_chain exige um BaseChatModel: o adaptador mantém o rate limiting
+model = RateLimitedModel("gemini-2.5-flash-lite", temperature=0).as_chat_model()
 
 long_text = """
 The universe began approximately 13.8 billion years ago with the Big Bang, an unimaginably hot and dense state that rapidly expanded. In the first few moments, fundamental forces separated, and subatomic particles formed. Within minutes, hydrogen and helium nuclei were created through nuclear fusion. For hundreds of thousands of years, the universe remained too hot for atoms to form, existing as a plasma of charged particles.
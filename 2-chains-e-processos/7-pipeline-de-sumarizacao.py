@@ -1,7 +1,16 @@
+import io
+import os
+import sys
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.prompts import PromptTemplate
 from utils_gemini import RateLimitedModel
-import time
+from sumarizacao_gemini import DEFAULT_MAP_PROMPT, IncrementalSummarizer
+from compactacao_gemini import PromptCompactor
+from telemetria_gemini import TELEMETRY
+from journal_gemini import DEFAULT_JOURNAL_PATH, JobJournal
+from ingestao_gemini import iter_chunks
+from dedup_gemini import DEFAULT_INDEX_PATH, NearDuplicateIndex
+from extrativo_gemini import ExtractiveSummarizer
 
 # Usa o modelo com rate limiting (importado do módulo)
 model = RateLimitedModel()
@@ -18,71 +27,83 @@ Throughout this vast cosmic and biological history, Earth has been the only know
 """
 
 splitter = RecursiveCharacterTextSplitter(chunk_size=250, chunk_overlap=50)
-chunks = splitter.create_documents([long_text])
 
-print(f"📝 Texto dividido em {len(chunks)} chunks para processamento")
+# Os chunks são gerados sob demanda: o texto (ou o arquivo passado na linha
+# de comando, de qualquer tamanho) é lido em blocos e a fase map começa
+# assim que o primeiro chunk fica pronto
+source = sys.argv[1] if len(sys.argv) > 1 else io.StringIO(long_text)
+# A compactação remove o overlap repetido entre chunks vizinhos e normaliza
+# espaços antes de cada chunk virar prompt
+compactor = PromptCompactor(max_overlap=100)  # >= chunk_overlap do splitter
+chunks = compactor.compact_chunks(iter_chunks(source, splitter))
 
-# Prompts para sumarização
-map_prompt = PromptTemplate.from_template("Write a concise summary of the following text:\n {context}")
-reduce_prompt = PromptTemplate.from_template("Combine the following summaries into a single concise summary:\n {context}")
+print(f"📝 Lendo {'o arquivo ' + source if isinstance(source, str) else 'o texto'} em blocos para processamento")
 
 print("🚀 Iniciando pipeline de sumarização...")
-print("⚠️  Este processo pode demorar devido aos delays de rate limiting")
+print("⚠️  Os chunks são processados em paralelo, limitados pela quota do modelo")
 print("=" * 50)
 
-# Processa cada chunk individualmente com rate limiting
-summaries = []
-for i, chunk in enumerate(chunks):
-    print(f"📦 Processando chunk {i+1}/{len(chunks)}")
-    
-    # Cria o prompt para este chunk
-    prompt = map_prompt.format(context=chunk.page_content)
-    
-    # Invoca o modelo com rate limiting (automático!)
-    result = model.invoke(prompt)
-    
-    # Extrai o conteúdo da resposta
-    if hasattr(result, 'content'):
-        summary = result.content
-    else:
-        summary = str(result)
-    
-    summaries.append(summary)
-    print(f"✅ Chunk {i+1} processado: {len(summary)} caracteres")
-    
-    # Delay entre chunks (exceto o último)
-    if i < len(chunks) - 1:
-        print("⏸️  Aguardando antes do próximo chunk...")
-        time.sleep(2)  # Delay adicional entre chunks
-
-print("\n🔄 Combinando sumários...")
+# Fase map em paralelo + reduce em árvore (prompts padrão de sumarizacao_gemini)
+# Resumos que não cabem em token_budget são combinados em níveis antes do final
+# Modo incremental: resumos de chunks e de nós do reduce ficam guardados por
+# hash de conteúdo, então rodar de novo após editar o texto só refaz o que mudou
+# Chunks quase iguais aos de execuções anteriores reaproveitam o resumo salvo
+# Os nós concluídos ficam no diário: se o processo cair, a próxima execução
+# retoma de onde parou. Vários processos com GEMINI_WORKER_ID diferentes
+# dividem o mesmo job
+# O pré-filtro extrativo corta localmente as frases menos relevantes de cada
+# chunk antes da fase map (chunks com menos de 4 frases passam inteiros)
+near_duplicates = NearDuplicateIndex(threshold=0.8, path=DEFAULT_INDEX_PATH)
+journal = JobJournal(DEFAULT_JOURNAL_PATH, worker_id=os.environ.get("GEMINI_WORKER_ID"))
+summarizer = IncrementalSummarizer(model, store=journal, token_budget=4000,
+                                   near_duplicates=near_duplicates,
+                                   map_prompt=compactor.compact_template(DEFAULT_MAP_PROMPT),
+                                   prefilter=ExtractiveSummarizer().compress)
 
-# Combina todos os sumários em um único texto
-combined_summaries = "\n".join(summaries)
+# O sumário final é impresso em streaming, conforme o modelo gera
+final_started = False
 
-# Cria o prompt para combinação final
-final_prompt = reduce_prompt.format(context=combined_summaries)
+def print_final_token(text):
+    global final_started
+    if not final_started:
+        final_started = True
+        print("\n" + "=" * 50)
+        print("✅ RESULTADO FINAL:")
+        print("=" * 50)
+    print(text, end="", flush=True)
 
-# Invoca o modelo para combinação final
-print("🤖 Gerando sumário final...")
-final_result = model.invoke(final_prompt)
+result = summarizer.summarize(chunks, on_token=print_final_token)
+journal.close()
+near_duplicates.save()
 
-# Extrai o resultado final
-if hasattr(final_result, 'content'):
-    final_summary = final_result.content
-else:
-    final_summary = str(final_result)
+summaries = [r["summary"] for r in result["map_results"]]
+final_summary = result["summary"]
+latencies = [r["latency"] for r in result["map_results"] if not r["reused"]] or [0.0]
+reused = sum(r["reused"] for r in result["map_results"])
 
-print("\n" + "=" * 50)
-print("✅ RESULTADO FINAL:")
-print("=" * 50)
-print(final_summary)
-print("\n" + "=" * 50)
+print("\n\n" + "=" * 50)
 print(f"📊 Estatísticas:")
-print(f"   Chunks processados: {len(chunks)}")
+print(f"   Chunks processados: {len(result['map_results'])}")
 print(f"   Sumários gerados: {len(summaries)}")
 print(f"   Caracteres no resultado final: {len(final_summary)}")
+print(f"   Latência por chunk: média {sum(latencies)/len(latencies):.1f}s, máxima {max(latencies):.1f}s")
+compaction = compactor.get_stats()
+print(f"   Tokens dos chunks: {compaction['tokens_before']} → {compaction['tokens_after']} "
+      f"após compactação ({compaction['saved_ratio']:.0%} a menos)")
+print(f"   Chunks reaproveitados sem chamar o modelo: {reused}")
+print(f"   Nós da árvore reaproveitados: {result['nodes_reused']}, recalculados: {result['nodes_computed']}")
+print(f"   Passos no diário: {journal.get_stats()['completed']} ({journal.get_stats()['fsyncs']} fsyncs nesta execução)")
+print(f"   Níveis intermediários no reduce: {result['reduce_levels']}")
+print(f"   Tempo total: {result['elapsed']:.1f}s")
 
 # Mostra estatísticas do modelo
 stats = model.get_stats()
-print(f"   Total de requisições ao Gemini: {stats['total_requests']}")
\ No newline at end of file
+print(f"   Total de requisições ao Gemini: {stats['total_requests']}")
+if stats["avg_ttft"] is not None:
+    print(f"   Tempo até o primeiro token do sumário final: {stats['avg_ttft']:.1f}s")
+
+# Para onde foi o tempo: espera na quota, modelo, backoff e cada etapa
+print()
+TELEMETRY.print_summary()
+TELEMETRY.export("telemetria-sumarizacao.prom")
+print("   Métricas exportadas em telemetria-sumarizacao.prom (formato Prometheus)")
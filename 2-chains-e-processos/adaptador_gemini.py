@@ -0,0 +1,99 @@
+"""
+ADAPTADOR BASECHATMODEL PARA O RATELIMITEDMODEL
+===============================================
+
+Algumas APIs do LangChain só aceitam um BaseChatModel: load_summarize_chain
+(map_reduce) chama get_num_tokens para decidir quando colapsar os resumos,
+e o LLMChain trata o modelo como um modelo de linguagem. O
+RateLimitedChatModel embrulha um RateLimitedModel nessa interface, então
+essas chains também passam pelo limitador, cache e retry, e o batch
+paralelo do LangChain pode usar a quota inteira sem estourá-la.
+
+A contagem de tokens usa o estimador local (tokens_gemini), sem chamar a
+API nem depender do tokenizer do GPT-2.
+
+Como usar:
+from langchain.chains.summarize import load_summarize_chain
+from utils_gemini import RateLimitedModel
+
+chat_model = RateLimitedModel().as_chat_model()
+chain = load_summarize_chain(chat_model, chain_type="map_reduce")
+"""
+
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage, BaseMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from utils_gemini import quota_concurrency
+
+
+def _as_chunk(message: BaseMessage) -> BaseMessageChunk:
+    """Respostas do cache chegam como AIMessage; o streaming exige chunks"""
+    if isinstance(message, BaseMessageChunk):
+        return message
+    return AIMessageChunk(
+        content=message.content,
+        response_metadata=getattr(message, "response_metadata", {}) or {},
+        usage_metadata=getattr(message, "usage_metadata", None),
+    )
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    BaseChatModel que delega cada chamada a um RateLimitedModel.
+
+    Sequências de parada (`stop`) não são repassadas: o RateLimitedModel
+    envia só as mensagens.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    rate_limited: Any
+    """RateLimitedModel que faz as chamadas"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "rate-limited-gemini"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.rate_limited.model_name, "temperature": self.rate_limited.temperature}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        message = self.rate_limited.invoke(messages)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        message = await self.rate_limited.ainvoke(messages)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for message in self.rate_limited.stream(messages):
+            chunk = ChatGenerationChunk(message=_as_chunk(message))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async for message in self.rate_limited.astream(messages):
+            chunk = ChatGenerationChunk(message=_as_chunk(message))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def batch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        return super().batch(inputs, quota_concurrency(config), return_exceptions=return_exceptions, **kwargs)
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        return await super().abatch(inputs, quota_concurrency(config),
+                                    return_exceptions=return_exceptions, **kwargs)
+
+    def get_num_tokens(self, text: str) -> int:
+        return self.rate_limited.token_estimator.estimate(text)
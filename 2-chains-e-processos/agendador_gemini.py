@@ -0,0 +1,312 @@
+"""
+AGENDADOR DE REQUISIÇÕES COM PRIORIDADE E PRAZO
+===============================================
+
+Com uma fila FIFO única, uma pergunta interativa espera atrás de um lote
+de 500 chunks. O RequestScheduler mantém uma fila de prioridade na frente
+do modelo:
+
+- classes de prioridade: INTERACTIVE (primeiro), NORMAL e BATCH (usa a
+  capacidade que sobra). O lote nunca gasta as últimas
+  `interactive_reserve` requisições do bucket, então uma pergunta
+  interativa que chega no meio de um lote sai sem esperar o próximo refill
+- prazos: cada requisição pode ter um `deadline` (segundos). Se a espera
+  pela quota mais a latência típica do modelo passar do prazo, a
+  requisição é respondida pelo `fallback` (ex.: ExtractiveSummarizer) ou
+  falha com DeadlineExceededError, sem gastar quota. Respostas do fallback
+  vêm marcadas em `response_metadata["degraded"]`, para quem chamou saber
+  que não são do modelo
+- nada de sleeps fixos: o despachante dorme exatamente até o bucket de
+  quota liberar a próxima requisição (ou até chegar algo mais urgente)
+
+Como usar:
+from agendador_gemini import RequestScheduler, PRIORITY_INTERACTIVE
+from utils_gemini import RateLimitedModel
+
+scheduler = RequestScheduler(RateLimitedModel())
+futures = [scheduler.submit(texto) for texto in textos]          # lote
+resposta = scheduler.submit("Pergunta?", priority=PRIORITY_INTERACTIVE,
+                            deadline=10).result()
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from quota_gemini import QUOTA_CONFIG, CircuitOpenError, QuotaLimiter, is_quota_error
+from tokens_gemini import DEFAULT_ESTIMATOR
+from telemetria_gemini import TELEMETRY
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BATCH = 2
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_NORMAL: "normal", PRIORITY_BATCH: "batch"}
+
+
+class DeadlineExceededError(Exception):
+    """A requisição não seria atendida dentro do prazo e não há fallback"""
+
+    def __init__(self, expected_in: float):
+        super().__init__(f"Prazo não pode ser cumprido (atendimento estimado em {expected_in:.1f}s)")
+        self.expected_in = expected_in
+
+
+class ScheduledRequest:
+    """Uma requisição na fila do agendador"""
+
+    def __init__(self, prompt: Any, priority: int, deadline_at: Optional[float], fallback, tokens: int):
+        self.prompt = prompt
+        self.priority = priority
+        self.deadline_at = deadline_at
+        self.fallback = fallback
+        self.tokens = tokens
+        self.submitted_at = time.monotonic()
+        self.dequeued = False  # já despachada ou descartada (remoção preguiçosa das filas)
+        self.future: Future = Future()
+
+
+class RequestScheduler:
+    """
+    Fila de prioridade com prazos alimentada pelos buckets de quota.
+
+    Um thread despachante escolhe a próxima requisição e a executa em um
+    pool de `max_workers` threads assim que o limitador tiver capacidade.
+    A reserva de quota é feita no despacho e repassada à chamada do modelo
+    (QuotaLimiter.prepaid), então o modelo não reserva nem espera de novo.
+    """
+
+    def __init__(self, model, limiter: Optional[QuotaLimiter] = None, fallback=None,
+                 max_workers: Optional[int] = None, interactive_reserve: int = 1,
+                 expected_latency: float = 2.0):
+        """
+        Args:
+            model: Modelo com `invoke` (ex.: RateLimitedModel)
+            limiter (QuotaLimiter): Limitador consultado antes de despachar
+                (padrão: model.limiter, ou um novo a partir de QUOTA_CONFIG)
+            fallback: Modelo local usado quando um prazo não pode ser cumprido
+                ou a quota acabou (ex.: ExtractiveSummarizer); a resposta
+                dele vem com response_metadata["degraded"] = True
+            max_workers (int): Requisições em andamento ao mesmo tempo
+                (padrão: QUOTA_CONFIG["max_concurrent_requests"])
+            interactive_reserve (int): Requisições do bucket que só o tráfego
+                interativo pode usar
+            expected_latency (float): Latência inicial estimada do modelo (s);
+                é atualizada com as latências observadas
+        """
+        self.model = model
+        self.limiter = limiter or getattr(model, "limiter", None) or QuotaLimiter.from_config()
+        self.fallback = fallback
+        self.max_workers = max_workers or QUOTA_CONFIG["max_concurrent_requests"]
+        self.interactive_reserve = interactive_reserve
+        self.expected_latency = expected_latency
+
+        self._queue = []
+        # Mesmas requisições (as que têm prazo) ordenadas pelo prazo: as
+        # vencidas saem do topo, sem varrer a fila inteira
+        self._deadlines = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = 0
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gemini-scheduler")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="gemini-dispatcher", daemon=True)
+
+        self.completed = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.queue_wait = {name: 0.0 for name in PRIORITY_NAMES.values()}
+        self.shed = 0
+        self.fallbacks = 0
+        self._dispatcher.start()
+
+    # ------------------------------------------------------------------
+    # Envio
+    # ------------------------------------------------------------------
+
+    def submit(self, prompt: Any, priority: int = PRIORITY_BATCH, deadline: Optional[float] = None,
+               fallback=None) -> Future:
+        """
+        Coloca a requisição na fila.
+
+        Args:
+            prompt: Prompt do modelo
+            priority (int): PRIORITY_INTERACTIVE, PRIORITY_NORMAL ou PRIORITY_BATCH
+            deadline (float): Prazo em segundos a partir de agora (None = sem prazo)
+            fallback: Substitui o fallback do agendador para esta requisição
+
+        Returns:
+            Future: Resolvido com a resposta (ou com DeadlineExceededError)
+        """
+        tokens = 0
+        if self.limiter.token_bucket is not None:
+            tokens = DEFAULT_ESTIMATOR.estimate_prompt(prompt) + QUOTA_CONFIG["expected_output_tokens"]
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        request = ScheduledRequest(prompt, priority, deadline_at, fallback or self.fallback, tokens)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Agendador encerrado")
+            sequence = next(self._sequence)
+            heapq.heappush(self._queue, (priority, deadline_at or float("inf"), sequence, request))
+            if deadline_at is not None:
+                heapq.heappush(self._deadlines, (deadline_at, sequence, request))
+            self._queued += 1
+            self._condition.notify()
+        return request.future
+
+    async def asubmit(self, prompt: Any, priority: int = PRIORITY_BATCH, deadline: Optional[float] = None,
+                      fallback=None) -> Any:
+        """Versão assíncrona de submit: espera e retorna a resposta"""
+        return await asyncio.wrap_future(self.submit(prompt, priority, deadline, fallback))
+
+    def invoke(self, prompt: Any, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> Any:
+        """Atalho síncrono (por padrão com prioridade interativa)"""
+        return self.submit(prompt, priority, deadline).result()
+
+    # ------------------------------------------------------------------
+    # Despacho
+    # ------------------------------------------------------------------
+
+    def _wait_for(self, request: ScheduledRequest) -> float:
+        """Quanto falta para o limitador liberar esta requisição"""
+        n = 1 if request.priority == PRIORITY_INTERACTIVE else 1 + self.interactive_reserve
+        return self.limiter.peek_wait(n, request.tokens)
+
+    def _dequeue(self, request: ScheduledRequest):
+        request.dequeued = True
+        self._queued -= 1
+
+    def _discard_dequeued(self):
+        """Tira do topo da fila as requisições já removidas pela fila de prazos"""
+        while self._queue and self._queue[0][3].dequeued:
+            heapq.heappop(self._queue)
+
+    def _expired(self, now: float):
+        """Remove da fila as requisições cujo prazo já não pode ser cumprido"""
+        expired = []
+        while self._deadlines and now + self.expected_latency > self._deadlines[0][0]:
+            request = heapq.heappop(self._deadlines)[2]
+            if not request.dequeued:
+                self._dequeue(request)
+                expired.append(request)
+        return expired
+
+    def _dispatch_loop(self):
+        while True:
+            with self._condition:
+                while not self._queued and not self._closed:
+                    self._condition.wait()
+                if not self._queued:
+                    return
+                now = time.monotonic()
+                to_shed = self._expired(now)
+                self._discard_dequeued()
+                request = wait = None
+                if self._queue and not to_shed:
+                    head = self._queue[0][3]
+                    wait = self._wait_for(head)
+                    if head.deadline_at is not None and now + wait + self.expected_latency > head.deadline_at:
+                        heapq.heappop(self._queue)
+                        self._dequeue(head)
+                        to_shed.append(head)
+                    elif wait <= 0 and self._running < self.max_workers:
+                        heapq.heappop(self._queue)
+                        self._dequeue(head)
+                        # Reserva aqui para o próximo peek já enxergar esta requisição
+                        self.limiter.reserve(1, head.tokens)
+                        self._running += 1
+                        request = head
+                    else:
+                        # Acorda quando o bucket liberar, quando um worker
+                        # terminar ou quando chegar algo mais urgente
+                        self._condition.wait(timeout=wait if wait > 0 else None)
+            for shed in to_shed:
+                self._shed(shed, wait or 0.0)
+            if request is not None:
+                self._executor.submit(self._run, request)
+
+    def _shed(self, request: ScheduledRequest, expected_in: float):
+        self.shed += 1
+        TELEMETRY.increment("scheduler_shed_total", priority=PRIORITY_NAMES.get(request.priority, str(request.priority)))
+        if request.fallback is None:
+            request.future.set_exception(DeadlineExceededError(expected_in + self.expected_latency))
+            return
+        print("⏱️  Prazo não seria cumprido: respondendo com o fallback local")
+        self._respond_with_fallback(request)
+
+    def _respond_with_fallback(self, request: ScheduledRequest):
+        self.fallbacks += 1
+        try:
+            result = request.fallback.invoke(request.prompt)
+        except Exception as e:
+            request.future.set_exception(e)
+            return
+        # Marca a resposta como substituta (ex.: um resumo extrativo não
+        # responde a uma pergunta)
+        metadata = getattr(result, "response_metadata", None)
+        if isinstance(metadata, dict):
+            metadata["degraded"] = True
+            metadata["fallback"] = type(request.fallback).__name__
+        request.future.set_result(result)
+
+    def _run(self, request: ScheduledRequest):
+        name = PRIORITY_NAMES.get(request.priority, str(request.priority))
+        start = time.monotonic()
+        self.queue_wait[name] = self.queue_wait.get(name, 0.0) + start - request.submitted_at
+        TELEMETRY.observe("scheduler_queue_wait_seconds", start - request.submitted_at, priority=name)
+        try:
+            # A reserva feita no despacho vale para a chamada do modelo
+            with self.limiter.prepaid(1, request.tokens):
+                result = self.model.invoke(request.prompt)
+        except Exception as e:
+            if request.fallback is not None and (is_quota_error(e) or isinstance(e, CircuitOpenError)):
+                print("⚠️  Quota indisponível: respondendo com o fallback local")
+                self._respond_with_fallback(request)
+            else:
+                request.future.set_exception(e)
+        else:
+            # Média móvel da latência, usada para decidir se um prazo é viável
+            self.expected_latency = 0.8 * self.expected_latency + 0.2 * (time.monotonic() - start)
+            self.completed[name] = self.completed.get(name, 0) + 1
+            request.future.set_result(result)
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify()
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida e estatísticas
+    # ------------------------------------------------------------------
+
+    def close(self, wait: bool = True):
+        """Para de aceitar requisições; com `wait`, espera a fila esvaziar"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if wait:
+            self._dispatcher.join()
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna fila atual, concluídas e espera média na fila por prioridade"""
+        with self._condition:
+            queued = self._queued
+        return {
+            "queued": queued,
+            "running": self._running,
+            "completed": dict(self.completed),
+            "avg_queue_wait": {name: self.queue_wait[name] / count
+                               for name, count in self.completed.items() if count},
+            "shed": self.shed,
+            "fallbacks": self.fallbacks,
+            "expected_latency": self.expected_latency,
+        }
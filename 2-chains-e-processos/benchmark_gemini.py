@@ -0,0 +1,487 @@
+"""
+BENCHMARK OFFLINE COM GEMINI SIMULADO
+=====================================
+
+Mede vazão e latência do RateLimitedModel, do FallbackModel, do
+process_in_batches e do pipeline de sumarização sem gastar quota: as
+chamadas vão para um chat model local (SimulatedGeminiModel) que imita a
+latência do Gemini, aplica a quota por minuto do lado do "servidor"
+(respondendo 429 com retry_delay quando ela estoura), injeta rajadas de
+429 e devolve contagem de tokens.
+
+Com `--startup`, mede o custo de inicialização (`python -X importtime`) de
+importar utils_gemini e criar um RateLimitedModel, e falha se os módulos
+que deveriam ser carregados sob demanda (LAZY_MODULES) forem importados
+ou se o tempo passar de `--startup-budget` milissegundos.
+
+Para o benchmark não demorar minutos, o tempo é acelerado por `speedup`:
+as janelas de quota (QUOTA_CONFIG["time_scale"]), latências e delays
+ficam `speedup` vezes mais curtos. Os números do relatório são convertidos
+de volta para a escala real.
+
+Como usar:
+python benchmark_gemini.py
+python benchmark_gemini.py --scenarios rate_limited_async,map_reduce --sizes 20,80
+python benchmark_gemini.py --burst-429 0.05 --json resultado.json
+python benchmark_gemini.py --startup --startup-budget 500
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from quota_gemini import QUOTA_CONFIG
+
+# ============================================================================
+# MODELO SIMULADO
+# ============================================================================
+
+_PACKED_REQUEST = re.compile(r"### Request (\d+)\n(.*?)(?=\n\n### Request |\Z)", re.DOTALL)
+
+class SimulatedGeminiModel(BaseChatModel):
+    """
+    Chat model local que se comporta como o Gemini do ponto de vista da quota.
+
+    - latência log-normal com média `latency_mean` segundos
+    - quota do servidor: no máximo `requests_per_minute` requisições aceitas
+      em qualquer janela de `window_seconds` (60 s na escala real); acima
+      disso responde 429 com a espera sugerida
+    - rajadas de 429: cada chamada tem `burst_429_probability` de iniciar
+      uma sequência de `burst_length` erros
+    - tokens: ~4 caracteres por token na entrada, `output_tokens` na saída
+    - prompts empacotados (packing_gemini.py) recebem a resposta em JSON
+    """
+
+    latency_mean: float = 0.8
+    latency_sigma: float = 0.3
+    requests_per_minute: float = 15
+    window_seconds: float = 60.0
+    burst_429_probability: float = 0.0
+    burst_length: int = 3
+    retry_hint: float = 2.0
+    output_tokens: int = 60
+    seed: int = 0
+
+    _rng: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default=None)
+    _accepted: Any = PrivateAttr(default=None)
+    _burst_remaining: int = PrivateAttr(default=0)
+    _stats: Dict[str, Any] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._accepted = deque()
+        self._stats = {"accepted": 0, "rejected_429": 0, "service_times": [],
+                       "input_tokens": 0, "output_tokens": 0}
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated-gemini"
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self._stats
+
+    def _admit(self) -> float:
+        """Aplica a quota do servidor; retorna a latência da chamada ou lança 429"""
+        with self._lock:
+            now = time.monotonic()
+            while self._accepted and now - self._accepted[0] >= self.window_seconds:
+                self._accepted.popleft()
+            if self._burst_remaining == 0 and self._rng.random() < self.burst_429_probability:
+                self._burst_remaining = self.burst_length
+            if self._burst_remaining > 0:
+                self._burst_remaining -= 1
+                self._stats["rejected_429"] += 1
+                raise Exception(f"429 RESOURCE_EXHAUSTED: quota exceeded. Please retry in {self.retry_hint:.2f}s.")
+            if len(self._accepted) >= self.requests_per_minute:
+                retry = self.window_seconds - (now - self._accepted[0])
+                self._stats["rejected_429"] += 1
+                raise Exception(f"429 RESOURCE_EXHAUSTED: quota exceeded. Please retry in {retry:.2f}s.")
+            self._accepted.append(now)
+            self._stats["accepted"] += 1
+            mu = -0.5 * self.latency_sigma ** 2
+            return self.latency_mean * self._rng.lognormvariate(mu, self.latency_sigma)
+
+    def _result(self, messages, latency: float) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        input_tokens = max(1, len(prompt) // 4)
+        with self._lock:
+            self._stats["service_times"].append(latency)
+            self._stats["input_tokens"] += input_tokens
+            self._stats["output_tokens"] += self.output_tokens
+        packed = _PACKED_REQUEST.findall(prompt)
+        if packed:
+            content = json.dumps([{"id": int(i), "answer": "Summary: " + " ".join(text.split()[:10])}
+                                  for i, text in packed])
+        else:
+            content = "Summary: " + " ".join(prompt.split()[-self.output_tokens // 2:])
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": input_tokens + self.output_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        latency = self._admit()
+        time.sleep(latency)
+        return self._result(messages, latency)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        latency = self._admit()
+        await asyncio.sleep(latency)
+        return self._result(messages, latency)
+
+
+# ============================================================================
+# CONFIGURAÇÃO ACELERADA
+# ============================================================================
+
+_DELAY_KEYS = ["min_delay_between_requests", "delay_between_batches", "backoff_on_quota_error",
+               "initial_backoff", "circuit_reset_timeout"]
+
+
+class accelerated_quota:
+    """
+    Context manager que acelera QUOTA_CONFIG por `speedup` enquanto o
+    benchmark roda (janelas e delays divididos) e restaura depois.
+    """
+
+    def __init__(self, speedup: float):
+        self.speedup = speedup
+        self.saved = None
+
+    def __enter__(self):
+        self.saved = dict(QUOTA_CONFIG)
+        QUOTA_CONFIG["time_scale"] = QUOTA_CONFIG.get("time_scale", 1.0) * self.speedup
+        for key in _DELAY_KEYS:
+            QUOTA_CONFIG[key] = QUOTA_CONFIG[key] / self.speedup
+        return self
+
+    def __exit__(self, *exc):
+        QUOTA_CONFIG.clear()
+        QUOTA_CONFIG.update(self.saved)
+
+
+def load_strategies_module():
+    """Carrega 0-estrategias-quota-gratuita.py (o nome com hífens impede o import)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "0-estrategias-quota-gratuita.py")
+    spec = importlib.util.spec_from_file_location("estrategias_quota_gratuita", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ============================================================================
+# CENÁRIOS
+# ============================================================================
+
+def make_corpus(size: int, seed: int = 0) -> List[str]:
+    """Textos sintéticos e distintos (para não acertar cache nem single-flight)"""
+    rng = random.Random(seed)
+    words = ("quota model request token latency summary chunk galaxy planet star "
+             "energy history earth life ocean climate").split()
+    return [f"Item {i}: " + " ".join(rng.choice(words) for _ in range(rng.randint(30, 80)))
+            for i in range(size)]
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+async def _atimed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+def scenario_rate_limited_sync(server: SimulatedGeminiModel, corpus: List[str]) -> Dict[str, Any]:
+    from utils_gemini import RateLimitedModel
+    model = RateLimitedModel(client=server)
+    latencies = [_timed(model.invoke, text)[1] for text in corpus]
+    return {"latencies": latencies, "limiter_wait": model.limiter.total_wait_time}
+
+
+def scenario_rate_limited_async(server: SimulatedGeminiModel, corpus: List[str]) -> Dict[str, Any]:
+    from utils_gemini import RateLimitedModel
+    model = RateLimitedModel(client=server)
+
+    async def run():
+        return await asyncio.gather(*(_atimed(model.ainvoke(text)) for text in corpus))
+
+    latencies = [elapsed for _, elapsed in asyncio.run(run())]
+    return {"latencies": latencies, "limiter_wait": model.limiter.total_wait_time}
+
+
+def scenario_fallback_model(server: SimulatedGeminiModel, corpus: List[str]) -> Dict[str, Any]:
+    strategies = load_strategies_module()
+    model = strategies.FallbackModel(client=server)
+    latencies = [_timed(model.invoke, text)[1] for text in corpus]
+    return {"latencies": latencies, "limiter_wait": model.rate_limiter.limiter.total_wait_time}
+
+
+def scenario_process_in_batches(server: SimulatedGeminiModel, corpus: List[str]) -> Dict[str, Any]:
+    from utils_gemini import RateLimitedModel
+    strategies = load_strategies_module()
+    model = RateLimitedModel(client=server)
+    _, elapsed = _timed(strategies.process_in_batches, corpus, QUOTA_CONFIG["optimal_batch_size"], 0.0, model)
+    # Um lote inteiro sai em uma requisição: a latência por item é a média do lote
+    return {"latencies": [elapsed / len(corpus)] * len(corpus), "limiter_wait": model.limiter.total_wait_time}
+
+
+def scenario_map_reduce(server: SimulatedGeminiModel, corpus: List[str]) -> Dict[str, Any]:
+    from sumarizacao_gemini import MapReduceSummarizer
+    from utils_gemini import RateLimitedModel
+    model = RateLimitedModel(client=server)
+    result = MapReduceSummarizer(model).summarize(corpus)
+    return {"latencies": [r["latency"] for r in result["map_results"]],
+            "limiter_wait": model.limiter.total_wait_time}
+
+
+def scenario_staged_pipeline(server: SimulatedGeminiModel, corpus: List[str]) -> Dict[str, Any]:
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from pipeline_gemini import Stage, StagedPipeline
+    from utils_gemini import RateLimitedModel
+    model = RateLimitedModel(client=server)
+    # Duas chamadas por item (traduzir → resumir), com as etapas sobrepostas
+    translate = PromptTemplate.from_template("Translate to English: {text}") | model | StrOutputParser()
+    summarize = PromptTemplate.from_template("Summarize in 4 words: {text}") | model | StrOutputParser()
+    pipeline = StagedPipeline([Stage("traduzir", {"text": translate}), Stage("resumir", summarize)])
+    pipeline.run([{"text": text} for text in corpus])
+    return {"latencies": list(pipeline.latencies), "limiter_wait": model.limiter.total_wait_time}
+
+
+SCENARIOS = {
+    "rate_limited_sync": scenario_rate_limited_sync,
+    "rate_limited_async": scenario_rate_limited_async,
+    "fallback_model": scenario_fallback_model,
+    "process_in_batches": scenario_process_in_batches,
+    "map_reduce": scenario_map_reduce,
+    "staged_pipeline": scenario_staged_pipeline,
+}
+
+# ============================================================================
+# CUSTO DE INICIALIZAÇÃO
+# ============================================================================
+
+STARTUP_SNIPPET = "from utils_gemini import RateLimitedModel; RateLimitedModel()"
+
+# Módulos que só podem ser importados na primeira chamada real ao Gemini
+LAZY_MODULES = ("langchain_google_genai", "google.ai.generativelanguage", "dotenv")
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(report: str) -> List[Dict[str, Any]]:
+    """Linhas de `python -X importtime` como dicts (tempos em milissegundos)"""
+    entries = []
+    for line in report.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append({
+                "module": match.group(4),
+                "self_ms": int(match.group(1)) / 1000,
+                "cumulative_ms": int(match.group(2)) / 1000,
+                "depth": (len(match.group(3)) - 1) // 2,
+            })
+    return entries
+
+
+def measure_startup(snippet: str = STARTUP_SNIPPET, runs: int = 3) -> Dict[str, Any]:
+    """
+    Roda `snippet` em processos novos com `-X importtime`.
+
+    Fica com a execução mais rápida (as outras sofrem com disco e cache frio).
+
+    Returns:
+        dict: import_ms (soma dos imports de primeiro nível), wall_ms do
+            processo, os módulos mais caros e os de LAZY_MODULES importados
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "startup-benchmark"))
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", snippet], cwd=directory,
+                                   env=env, capture_output=True, text=True, check=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+        entries = parse_importtime(completed.stderr)
+        import_ms = sum(e["cumulative_ms"] for e in entries if e["depth"] == 0)
+        if best is None or import_ms < best["import_ms"]:
+            best = {"import_ms": import_ms, "wall_ms": wall_ms, "entries": entries}
+
+    entries = best["entries"]
+    return {
+        "snippet": snippet,
+        "import_ms": best["import_ms"],
+        "wall_ms": best["wall_ms"],
+        "modules": len(entries),
+        "slowest": [{"module": e["module"], "cumulative_ms": e["cumulative_ms"]}
+                    for e in sorted(entries, key=lambda e: -e["cumulative_ms"]) if e["depth"] <= 1][:10],
+        "lazy_violations": sorted({e["module"] for e in entries
+                                   if any(e["module"] == m or e["module"].startswith(m + ".") for m in LAZY_MODULES)}),
+    }
+
+
+def print_startup_report(result: Dict[str, Any], budget_ms: Optional[float] = None) -> bool:
+    """Mostra o relatório de inicialização; retorna False se a verificação falhou"""
+    print("\n🚀 INICIALIZAÇÃO")
+    print("=" * 60)
+    print(f"   {result['snippet']}")
+    print(f"   Imports: {result['import_ms']:.0f} ms em {result['modules']} módulos "
+          f"(processo inteiro: {result['wall_ms']:.0f} ms)")
+    print("   Imports mais caros (até dois níveis):")
+    for item in result["slowest"]:
+        print(f"   {item['cumulative_ms']:>9.1f} ms  {item['module']}")
+
+    ok = True
+    if result["lazy_violations"]:
+        ok = False
+        print(f"❌ Importados na inicialização (deveriam ser sob demanda): {', '.join(result['lazy_violations'])}")
+    if budget_ms is not None and result["import_ms"] > budget_ms:
+        ok = False
+        print(f"❌ Imports levaram {result['import_ms']:.0f} ms (orçamento: {budget_ms:.0f} ms)")
+    if ok:
+        print("✅ Inicialização dentro do esperado")
+    return ok
+
+
+# ============================================================================
+# EXECUÇÃO E RELATÓRIO
+# ============================================================================
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_scenario(name: str, size: int, speedup: float = 20.0, latency_mean: float = 0.8,
+                 burst_429: float = 0.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Roda um cenário e devolve as métricas já convertidas para a escala real.
+
+    Returns:
+        dict: requests_per_minute, latências p50/p95/p99 (s), wall_time,
+            work_time (soma do tempo de serviço do servidor), sleep_time
+            (espera no limitador), erros 429, quota_allowed (requisições
+            que a janela deslizante aceitaria no período), quota_unused
+            (quota que sobrou) e quota_efficiency (aceitas / quota_allowed)
+    """
+    with accelerated_quota(speedup):
+        server = SimulatedGeminiModel(
+            latency_mean=latency_mean / speedup,
+            requests_per_minute=QUOTA_CONFIG["requests_per_minute"],
+            window_seconds=60.0 / speedup,
+            retry_hint=2.0 / speedup,
+            burst_429_probability=burst_429,
+            seed=seed,
+        )
+        corpus = make_corpus(size, seed)
+        start = time.perf_counter()
+        measured = SCENARIOS[name](server, corpus)
+        wall = time.perf_counter() - start
+
+    stats = server.stats
+    wall_real = wall * speedup
+    latencies = [value * speedup for value in measured["latencies"]]
+    # Na janela deslizante de 60 s, um período de T segundos comporta no
+    # máximo floor(T / 60) + 1 janelas cheias (a primeira começa no instante 0)
+    allowed = QUOTA_CONFIG["requests_per_minute"] * (int(wall_real // 60.0) + 1)
+    return {
+        "scenario": name,
+        "items": size,
+        "requests": stats["accepted"],
+        "errors_429": stats["rejected_429"],
+        "wall_time": wall_real,
+        "requests_per_minute": stats["accepted"] / wall_real * 60.0 if wall_real else 0.0,
+        "items_per_minute": size / wall_real * 60.0 if wall_real else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "work_time": sum(stats["service_times"]) * speedup,
+        "sleep_time": measured["limiter_wait"] * speedup if measured["limiter_wait"] is not None else None,
+        "quota_allowed": allowed,
+        "quota_unused": allowed - stats["accepted"],
+        "quota_efficiency": stats["accepted"] / allowed,
+        "input_tokens": stats["input_tokens"],
+        "output_tokens": stats["output_tokens"],
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print("\n📊 RESULTADOS (escala real)")
+    print("=" * 110)
+    print(f"{'cenário':<20} {'itens':>6} {'req':>5} {'429':>4} {'req/min':>8} {'itens/min':>9} "
+          f"{'p50':>7} {'p95':>7} {'p99':>7} {'trabalho':>9} {'espera':>9} {'efic.':>6}")
+    for r in results:
+        sleep = f"{r['sleep_time']:.0f}s" if r["sleep_time"] is not None else "-"
+        print(f"{r['scenario']:<20} {r['items']:>6} {r['requests']:>5} {r['errors_429']:>4} "
+              f"{r['requests_per_minute']:>8.1f} {r['items_per_minute']:>9.1f} "
+              f"{r['latency_p50']:>6.1f}s {r['latency_p95']:>6.1f}s {r['latency_p99']:>6.1f}s "
+              f"{r['work_time']:>8.0f}s {sleep:>9} {r['quota_efficiency']:>6.0%}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark offline das estratégias de quota")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Cenários separados por vírgula")
+    parser.add_argument("--sizes", default="10,40", help="Tamanhos de corpus separados por vírgula")
+    parser.add_argument("--speedup", type=float, default=20.0, help="Fator de aceleração do tempo")
+    parser.add_argument("--latency", type=float, default=0.8, help="Latência média do modelo (s)")
+    parser.add_argument("--burst-429", type=float, default=0.0, help="Probabilidade de rajada de 429 por chamada")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Arquivo para salvar os resultados em JSON")
+    parser.add_argument("--startup", action="store_true",
+                        help="Mede só o custo de inicialização (imports e criação do modelo)")
+    parser.add_argument("--startup-budget", type=float, help="Tempo máximo de imports (ms) no --startup")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        result = measure_startup()
+        ok = print_startup_report(result, args.startup_budget)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"\n💾 Resultado salvo em {args.json}")
+        if not ok:
+            raise SystemExit(1)
+        return result
+
+    results = []
+    for name in args.scenarios.split(","):
+        for size in (int(s) for s in args.sizes.split(",")):
+            print(f"\n🧪 {name} com {size} itens...")
+            results.append(run_scenario(name, size, args.speedup, args.latency, args.burst_429, args.seed))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Resultados salvos em {args.json}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+CACHE PERSISTENTE DE RESPOSTAS DO GEMINI
+=========================================
+
+Guarda as respostas do modelo em um arquivo SQLite, endereçadas por um
+digest estável (SHA-256) de modelo + temperatura + prompt normalizado.
+Diferente do hash() do Python, o digest é o mesmo em qualquer processo,
+então o cache sobrevive a reinícios e pode ser compartilhado.
+
+O tamanho é limitado por número de entradas e por bytes (eviction LRU),
+e cada entrada expira depois de `ttl_seconds`. Os totais de entradas e
+bytes são mantidos em memória, então gravar uma resposta não varre a
+tabela; a limpeza das expiradas e a releitura dos totais (que pegam as
+gravações de outros processos) rodam a cada `sweep_every` gravações.
+
+Também contém o SingleFlight, que junta requisições idênticas em
+andamento ao mesmo tempo em uma única chamada ao modelo.
+
+Como usar:
+from cache_gemini import ResponseCache
+from utils_gemini import RateLimitedModel
+
+model = RateLimitedModel(cache=ResponseCache())
+model.invoke("Seu prompt aqui")  # segunda execução não gasta quota
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+# langchain_core.messages é importado só quando necessário: este módulo é
+# carregado por utils_gemini e não deve pesar na inicialização
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".gemini_cache.sqlite3")
+
+
+def normalize_prompt(prompt: Any) -> Any:
+    """
+    Converte o prompt em uma estrutura JSON estável.
+
+    Strings têm os espaços das pontas removidos; listas de mensagens e
+    PromptValues viram pares (tipo, conteúdo).
+    """
+    if isinstance(prompt, str):
+        return prompt.strip()
+    from langchain_core.messages import BaseMessage
+    if hasattr(prompt, "to_messages"):
+        prompt = prompt.to_messages()
+    if isinstance(prompt, BaseMessage):
+        prompt = [prompt]
+    if isinstance(prompt, (list, tuple)):
+        normalized = []
+        for message in prompt:
+            if isinstance(message, BaseMessage):
+                normalized.append([message.type, message.content])
+            elif isinstance(message, (list, tuple)) and len(message) == 2:
+                normalized.append([str(message[0]), message[1]])
+            else:
+                normalized.append(["human", str(message).strip()])
+        return normalized
+    return str(prompt).strip()
+
+
+def make_cache_key(model_name: str, temperature: float, prompt: Any) -> str:
+    """Digest estável de (modelo, temperatura, prompt normalizado)"""
+    payload = json.dumps(
+        {"model": model_name, "temperature": temperature, "prompt": normalize_prompt(prompt)},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache de respostas em SQLite com eviction por idade e por tamanho.
+
+    Seguro para uso entre threads do mesmo processo; vários processos podem
+    abrir o mesmo arquivo (o SQLite cuida do lock).
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 10000,
+                 max_bytes: int = 100 * 1024 * 1024, ttl_seconds: Optional[float] = 7 * 86400,
+                 sweep_every: int = 256):
+        """
+        Args:
+            path (str): Arquivo SQLite (":memory:" para um cache só em memória)
+            max_entries (int): Número máximo de respostas guardadas
+            max_bytes (int): Tamanho máximo somado das respostas
+            ttl_seconds (float): Idade máxima de uma entrada (None = sem expiração)
+            sweep_every (int): Gravações entre duas limpezas das entradas
+                expiradas (e releituras dos totais)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_every = max(1, sweep_every)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._count, self._bytes = self._totals()
+
+    def _totals(self):
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    # ------------------------------------------------------------------
+    # Interface de baixo nível (chave já calculada)
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Optional["BaseMessage"]:
+        """Retorna a resposta guardada ou None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, size, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count -= 1
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        from langchain_core.messages import messages_from_dict
+        return messages_from_dict([json.loads(value)])[0]
+
+    def set(self, key: str, message: Any):
+        """Guarda a resposta e aplica a eviction"""
+        from langchain_core.messages import AIMessage, BaseMessage, message_to_dict
+        if not isinstance(message, BaseMessage):
+            message = AIMessage(content=getattr(message, "content", str(message)))
+        value = json.dumps(message_to_dict(message), ensure_ascii=False)
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            if old is None:
+                self._count += 1
+                self._bytes += size
+            else:
+                self._bytes += size - old[0]
+            self._evict(now)
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def _evict(self, now: float):
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            # Varredura periódica: expiradas e totais reais (outros processos
+            # também gravam no arquivo)
+            if self.ttl_seconds is not None:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._count, self._bytes = self._totals()
+        if self._count <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        # Remove as entradas usadas há mais tempo até caber nos dois limites
+        # (o índice de accessed_at faz a leitura parar nas removidas)
+        removed_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if self._count <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            removed_keys.append((key,))
+            self._count -= 1
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", removed_keys)
+
+    # ------------------------------------------------------------------
+    # Interface de alto nível (usada pelos modelos)
+    # ------------------------------------------------------------------
+
+    def lookup(self, model_name: str, temperature: float, prompt: Any) -> Optional["BaseMessage"]:
+        return self.get(make_cache_key(model_name, temperature, prompt))
+
+    def update(self, model_name: str, temperature: float, prompt: Any, message: Any):
+        self.set(make_cache_key(model_name, temperature, prompt), message)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._count = self._bytes = 0
+
+    def get_stats(self):
+        """Retorna estatísticas de uso do cache"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._conn.close()
+
+
+# ============================================================================
+# SINGLE-FLIGHT: UMA CHAMADA PARA VÁRIOS PEDIDOS IDÊNTICOS
+# ============================================================================
+
+# Publicado aos seguidores quando o líder é cancelado (ou interrompido)
+_RETRY = object()
+
+
+class SingleFlight:
+    """
+    Agrupa requisições idênticas em andamento em uma única chamada.
+
+    O primeiro pedido de uma chave (o "líder") executa a chamada; os que
+    chegam enquanto ela não terminou esperam e recebem o mesmo resultado
+    (ou a mesma exceção). Funciona entre threads e entre corrotinas, pois
+    o resultado é publicado em um concurrent.futures.Future.
+
+    Só erros da chamada (Exception) são repassados. Se o líder for
+    cancelado (prazo, wait_for) ou interrompido (KeyboardInterrupt), a
+    chave é liberada e um seguidor tenta de novo, como novo líder.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.upstream_calls = 0
+        self.calls_saved = 0
+
+    def _join(self, key: str):
+        """Retorna (future, é_líder)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.calls_saved += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.upstream_calls += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: Exception = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _retry(self):
+        """O seguidor não economizou a chamada: o líder foi cancelado"""
+        with self._lock:
+            self.calls_saved -= 1
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Executa `fn` (ou espera o líder da mesma chave) e retorna o resultado"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            result = future.result()
+            if result is not _RETRY:
+                return result
+            self._retry()
+        try:
+            result = fn()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            self._finish(key, future, _RETRY)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Versão assíncrona de do: `coro_fn` retorna a corrotina da chamada"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            # shield: cancelar este seguidor não cancela o Future dos outros
+            result = await asyncio.shield(asyncio.wrap_future(future))
+            if result is not _RETRY:
+                return result
+            self._retry()
+        try:
+            result = await coro_fn()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            self._finish(key, future, _RETRY)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def get_stats(self):
+        """Retorna quantas chamadas foram feitas e quantas foram economizadas"""
+        return {"upstream_calls": self.upstream_calls, "calls_saved": self.calls_saved}
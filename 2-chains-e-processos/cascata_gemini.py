@@ -0,0 +1,261 @@
+"""
+CASCATA DE MODELOS (FLASH-LITE PRIMEIRO, PRO SÓ QUANDO PRECISA)
+===============================================================
+
+Muitos scripts usam o gemini-2.5-pro até para tarefas triviais (resumir
+em 4 palavras, responder um prompt curto), e o pro tem a menor quota do
+plano gratuito e a maior latência.
+
+O ModelCascade manda cada pedido primeiro para o modelo mais barato e
+rápido e só sobe para o próximo modelo da cascata quando é preciso:
+- roteamento: prompts grandes (mais de `light_token_limit` tokens
+  estimados) ou com sinais de tarefa difícil (passo a passo, demonstração,
+  depuração, algoritmo...) já começam no segundo modelo
+- validação: a resposta passa por validadores; se algum falhar (resposta
+  vazia, cortada, com hesitação ou recusa, ou um validador da tarefa), o
+  pedido sobe para o próximo modelo
+- quota esgotada de um modelo (circuito aberto) também faz o pedido subir
+
+Cada modelo usa o próprio bucket de quota do registro (limites em
+quota_gemini.MODEL_QUOTAS), então as chamadas ao flash-lite não gastam a
+quota do pro.
+
+Como usar:
+from cascata_gemini import DEFAULT_VALIDATORS, ModelCascade
+
+def quatro_palavras(prompt, message):
+    return len(message.content.split()) == 4
+
+model = ModelCascade(validators=[*DEFAULT_VALIDATORS, quatro_palavras])
+chain = template | model | StrOutputParser()
+print(model.get_stats())
+"""
+
+import re
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+
+from extrativo_gemini import prompt_text
+from quota_gemini import CircuitOpenError, is_quota_error
+from telemetria_gemini import TELEMETRY
+from tokens_gemini import DEFAULT_ESTIMATOR
+from utils_gemini import RateLimitedModel, quota_concurrency
+
+# Do mais barato e rápido para o mais capaz
+DEFAULT_MODELS = ("gemini-2.5-flash-lite", "gemini-2.5-pro")
+
+# Sinais de tarefa que o modelo pequeno costuma errar
+COMPLEX_PATTERNS = re.compile(
+    r"passo a passo|step[- ]by[- ]step|demonstr|\bprov[ea]\b|\bprove\b|racioc[ií]nio|reasoning|"
+    r"depur|debug|algoritm|algorithm|refator|refactor|arquitetura|architecture|"
+    r"otimiz|optimi[sz]|equa[çc][ãa]o|equation|teorema|theorem",
+    re.IGNORECASE,
+)
+
+# Respostas que indicam que o modelo não soube responder
+HEDGE_PATTERNS = re.compile(
+    r"não tenho certeza|não sei responder|não consigo (responder|ajudar)|não posso ajudar|"
+    r"i'?m not sure|i don'?t know|i can(no|')t (help|answer)|as an ai",
+    re.IGNORECASE,
+)
+
+
+def message_text(message: Any) -> str:
+    """Texto da resposta (o conteúdo pode vir como lista de partes)"""
+    content = getattr(message, "content", message)
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else str(part.get("text", "")) for part in content)
+    return str(content)
+
+
+# ============================================================================
+# VALIDADORES: (prompt, resposta) -> True se a resposta pode ser usada
+# ============================================================================
+
+def not_empty(prompt: Any, message: Any) -> bool:
+    """A resposta tem algum texto"""
+    return bool(message_text(message).strip())
+
+
+def finished(prompt: Any, message: Any) -> bool:
+    """O modelo terminou a resposta (não foi cortada por limite de tokens ou segurança)"""
+    metadata = getattr(message, "response_metadata", None) or {}
+    return metadata.get("finish_reason") in (None, "STOP")
+
+
+def no_hedging(prompt: Any, message: Any) -> bool:
+    """A resposta não é uma recusa nem uma hesitação"""
+    return not HEDGE_PATTERNS.search(message_text(message))
+
+
+DEFAULT_VALIDATORS = (not_empty, finished, no_hedging)
+
+
+class ModelCascade(Runnable[Any, BaseMessage]):
+    """
+    Runnable que responde com o modelo mais barato da cascata cuja resposta
+    passa nos validadores.
+
+    A resposta do último modelo é devolvida mesmo que falhe na validação
+    (não há para onde subir).
+    """
+
+    def __init__(self, models: Sequence[Any] = DEFAULT_MODELS,
+                 validators: Optional[Sequence[Callable[[Any, Any], bool]]] = None,
+                 light_token_limit: int = 8000, complex_patterns=COMPLEX_PATTERNS,
+                 temperature: float = 0, cache=None, telemetry=None):
+        """
+        Args:
+            models (list): Nomes de modelos ou RateLimitedModels, do mais
+                barato para o mais capaz (padrão: flash-lite e pro)
+            validators (list): Funções (prompt, resposta) -> bool
+                (padrão: DEFAULT_VALIDATORS)
+            light_token_limit (int): Prompts com mais tokens estimados que
+                isto começam no segundo modelo
+            complex_patterns (re.Pattern): Prompts que casam com o padrão
+                começam no segundo modelo (None = só o tamanho decide)
+            temperature (float): Temperatura dos modelos criados pelo nome
+            cache (ResponseCache): Cache dos modelos criados pelo nome (opcional)
+            telemetry (Telemetry): Registro de métricas (padrão: TELEMETRY)
+        """
+        if not models:
+            raise ValueError("Informe pelo menos um modelo")
+        self.models = [
+            m if isinstance(m, RateLimitedModel) else RateLimitedModel(m, temperature=temperature, cache=cache)
+            for m in models
+        ]
+        self.validators = list(DEFAULT_VALIDATORS if validators is None else validators)
+        self.light_token_limit = light_token_limit
+        self.complex_patterns = complex_patterns
+        self.telemetry = telemetry or TELEMETRY
+        names = [m.model_name for m in self.models]
+        self.routed = dict.fromkeys(names, 0)
+        self.answered = dict.fromkeys(names, 0)
+        self.escalations = dict.fromkeys(names, 0)
+        self.unvalidated = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Roteamento e validação
+    # ------------------------------------------------------------------
+
+    def route(self, prompt: Any) -> int:
+        """Posição na cascata do primeiro modelo a tentar"""
+        if len(self.models) == 1:
+            return 0
+        if DEFAULT_ESTIMATOR.estimate_prompt(prompt) > self.light_token_limit:
+            return 1
+        if self.complex_patterns is not None and self.complex_patterns.search(prompt_text(prompt)):
+            return 1
+        return 0
+
+    def validate(self, prompt: Any, message: Any) -> Optional[str]:
+        """Nome do primeiro validador que rejeita a resposta, ou None"""
+        for validator in self.validators:
+            if not validator(prompt, message):
+                return getattr(validator, "__name__", type(validator).__name__)
+        return None
+
+    def _count(self, counter: Dict[str, int], model_name: str):
+        with self._lock:
+            counter[model_name] += 1
+
+    def _should_escalate(self, position: int, prompt: Any, outcome: Any) -> Optional[str]:
+        """Motivo para subir na cascata, ou None para usar a resposta"""
+        if isinstance(outcome, Exception):
+            if position == len(self.models) - 1:
+                raise outcome
+            return "quota"
+        reason = self.validate(prompt, outcome)
+        if reason is not None and position == len(self.models) - 1:
+            with self._lock:
+                self.unvalidated += 1
+            print(f"⚠️ Resposta de {self.models[position].model_name} reprovada em '{reason}' "
+                  "(último modelo da cascata)")
+            return None
+        return reason
+
+    def _escalate(self, position: int, reason: str):
+        model_name = self.models[position].model_name
+        self._count(self.escalations, model_name)
+        self.telemetry.increment("cascade_escalations_total", model=model_name, reason=reason)
+        print(f"⬆️ {model_name} reprovado em '{reason}': subindo para {self.models[position + 1].model_name}")
+
+    def _answer(self, position: int, message: BaseMessage) -> BaseMessage:
+        model_name = self.models[position].model_name
+        self._count(self.answered, model_name)
+        self.telemetry.increment("cascade_answers_total", model=model_name)
+        return message
+
+    # ------------------------------------------------------------------
+    # Runnable
+    # ------------------------------------------------------------------
+
+    def invoke(self, prompt, config=None, **kwargs):
+        """
+        Responde com o primeiro modelo (a partir do roteado) aprovado nos validadores.
+
+        Raises:
+            Exception: Erros que não são de quota, ou erro de quota do último modelo
+        """
+        return self._call_with_config(self._invoke, prompt, config)
+
+    def _invoke(self, prompt):
+        start = self.route(prompt)
+        self._count(self.routed, self.models[start].model_name)
+        for position in range(start, len(self.models)):
+            try:
+                outcome = self.models[position].invoke(prompt)
+            except Exception as e:
+                if not (isinstance(e, CircuitOpenError) or is_quota_error(e)):
+                    raise
+                outcome = e
+            reason = self._should_escalate(position, prompt, outcome)
+            if reason is None:
+                return self._answer(position, outcome)
+            self._escalate(position, reason)
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        """Versão assíncrona de invoke"""
+        return await self._acall_with_config(self._ainvoke, prompt, config)
+
+    async def _ainvoke(self, prompt):
+        start = self.route(prompt)
+        self._count(self.routed, self.models[start].model_name)
+        for position in range(start, len(self.models)):
+            try:
+                outcome = await self.models[position].ainvoke(prompt)
+            except Exception as e:
+                if not (isinstance(e, CircuitOpenError) or is_quota_error(e)):
+                    raise
+                outcome = e
+            reason = self._should_escalate(position, prompt, outcome)
+            if reason is None:
+                return self._answer(position, outcome)
+            self._escalate(position, reason)
+
+    def batch(self, prompts, config=None, *, return_exceptions=False, **kwargs):
+        return super().batch(prompts, quota_concurrency(config), return_exceptions=return_exceptions, **kwargs)
+
+    async def abatch(self, prompts, config=None, *, return_exceptions=False, **kwargs):
+        return await super().abatch(prompts, quota_concurrency(config),
+                                    return_exceptions=return_exceptions, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Estatísticas
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pedidos roteados, respondidos e escalados por modelo, e requisições feitas"""
+        with self._lock:
+            stats = {
+                "routed": dict(self.routed),
+                "answered": dict(self.answered),
+                "escalations": dict(self.escalations),
+                "unvalidated": self.unvalidated,
+            }
+        stats["requests"] = {m.model_name: m.request_count for m in self.models}
+        return stats
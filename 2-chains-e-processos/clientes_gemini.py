@@ -0,0 +1,161 @@
+"""
+REGISTRO COMPARTILHADO DE CLIENTES GEMINI
+=========================================
+
+Cada ChatGoogleGenerativeAI abre o próprio canal com o Google, e cada
+RateLimitedModel criava o próprio limitador. Em um mesmo processo, dois
+modelos achavam que tinham, cada um, os 15 RPM inteiros e juntos
+recebiam 429.
+
+O ClientRegistry é um registro único do processo que entrega:
+- um cliente por (modelo, temperatura, API key), construído no primeiro
+  uso e reaproveitado por todos. O canal gRPC (HTTP/2) do cliente fica
+  aberto com keep-alive, então só a primeira requisição paga conexão e
+  handshake TLS
+- um estado de quota por (modelo, API key): limitador, controle adaptativo
+  de taxa e circuit breaker. Todos os modelos da mesma chave dividem o
+  mesmo bucket (a temperatura não muda a quota), e cada modelo tem os
+  próprios limites (quota_gemini.MODEL_QUOTAS)
+
+Como usar:
+from clientes_gemini import REGISTRY
+
+llm = REGISTRY.client("gemini-2.5-pro", temperature=0)
+quota = REGISTRY.quota("gemini-2.5-flash-lite")
+print(REGISTRY.get_stats())
+"""
+
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from quota_gemini import AdaptiveRateController, CircuitBreaker, QuotaLimiter
+
+_environment_loaded = False
+
+
+def load_environment():
+    """Carrega as variáveis de ambiente (API key do Gemini) uma única vez"""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+
+def create_gemini_client(model_name="gemini-2.5-flash-lite", temperature=0, **kwargs):
+    """
+    Constrói um ChatGoogleGenerativeAI novo (fora do registro).
+
+    O import de langchain_google_genai (o mais lento do projeto) e a leitura
+    do .env acontecem aqui, no primeiro uso real, e não no import do módulo.
+    """
+    load_environment()
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model_name, temperature=temperature, **kwargs)
+
+
+def resolve_api_key(api_key: Optional[str]) -> Optional[str]:
+    """
+    API key que o cliente vai usar de fato: None vira a GOOGLE_API_KEY do
+    ambiente (depois de carregar o .env). Assim quem passa a chave do
+    ambiente explicitamente e quem não passa nada dividem o mesmo cliente e
+    a mesma quota.
+    """
+    if api_key is None:
+        load_environment()
+        api_key = os.environ.get("GOOGLE_API_KEY")
+    return api_key
+
+
+def key_fingerprint(api_key: Optional[str]) -> str:
+    """Identifica a API key nas estatísticas sem expor a chave"""
+    if api_key is None:
+        return "default"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+class SharedQuota:
+    """Estado de quota de um (modelo, API key), dividido por todos os modelos"""
+
+    def __init__(self, model_name: str, limiter: Optional[QuotaLimiter] = None):
+        self.limiter = limiter or QuotaLimiter.for_model(model_name)
+        self.rate_controller = AdaptiveRateController(self.limiter)
+        self.circuit_breaker = CircuitBreaker()
+
+
+class ClientRegistry:
+    """
+    Clientes e quotas compartilhados pelo processo inteiro.
+
+    Seguro para uso entre threads: cada cliente é construído uma única vez,
+    mesmo que várias threads peçam a mesma chave ao mesmo tempo.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, float, Optional[str]], Any] = {}
+        self._quotas: Dict[Tuple[str, Optional[str]], SharedQuota] = {}
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.clients_reused = 0
+
+    def client(self, model_name: str = "gemini-2.5-flash-lite", temperature: float = 0,
+               api_key: Optional[str] = None):
+        """
+        Cliente compartilhado de (modelo, temperatura, API key).
+
+        Args:
+            model_name (str): Nome do modelo Gemini
+            temperature (float): Temperatura do modelo
+            api_key (str): API key (padrão: GOOGLE_API_KEY do ambiente)
+        """
+        api_key = resolve_api_key(api_key)
+        key = (model_name, float(temperature), api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.clients_reused += 1
+                return client
+            kwargs = {"google_api_key": api_key} if api_key is not None else {}
+            client = self._clients[key] = create_gemini_client(model_name, temperature, **kwargs)
+            self.clients_created += 1
+            return client
+
+    def quota(self, model_name: str = "gemini-2.5-flash-lite", api_key: Optional[str] = None) -> SharedQuota:
+        """Limitador, controle de taxa e circuit breaker de (modelo, API key)"""
+        key = (model_name, resolve_api_key(api_key))
+        with self._lock:
+            quota = self._quotas.get(key)
+            if quota is None:
+                quota = self._quotas[key] = SharedQuota(model_name)
+            return quota
+
+    def clear(self):
+        """Esquece clientes e quotas (ex.: depois de mudar QUOTA_CONFIG)"""
+        with self._lock:
+            self._clients.clear()
+            self._quotas.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Clientes criados/reaproveitados e estado de cada quota"""
+        with self._lock:
+            quotas = dict(self._quotas)
+            clients = len(self._clients)
+        return {
+            "clients": clients,
+            "clients_created": self.clients_created,
+            "clients_reused": self.clients_reused,
+            "quotas": {
+                f"{model_name}/{key_fingerprint(api_key)}": {
+                    "requests_per_minute": quota.rate_controller.requests_per_minute,
+                    "circuit_state": quota.circuit_breaker.state,
+                    "total_wait_time": quota.limiter.total_wait_time,
+                }
+                for (model_name, api_key), quota in quotas.items()
+            },
+        }
+
+
+# Instância compartilhada
+REGISTRY = ClientRegistry()
@@ -0,0 +1,131 @@
+"""
+COMPACTAÇÃO DE PROMPTS
+======================
+
+Etapa entre o splitter e o modelo que tira dos prompts os tokens que não
+carregam informação nova:
+
+- overlap: o RecursiveCharacterTextSplitter repete no início de cada chunk
+  o final do chunk anterior (chunk_overlap). A compactação remove esse
+  trecho repetido, já que o modelo vê o texto do vizinho na outra chamada
+- espaços: espaços repetidos, espaços no fim das linhas e linhas em branco
+  em excesso são normalizados
+- reescritas sem perda: lista configurável de (nome, regex, substituição)
+
+Cada token economizado aqui é um token a menos no orçamento de tokens por
+minuto. `get_stats()` mostra quantos tokens entraram e quantos saíram.
+
+Como usar:
+from compactacao_gemini import PromptCompactor
+
+compactor = PromptCompactor()
+for chunk in compactor.compact_chunks(chunks):
+    ...
+print(compactor.get_stats())
+"""
+
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from tokens_gemini import DEFAULT_ESTIMATOR
+
+# (nome, padrão, substituição) aplicados em ordem
+DEFAULT_REWRITES: List[Tuple[str, str, str]] = [
+    ("espacos_no_fim_da_linha", r"[ \t]+(?=\n)", ""),
+    ("espacos_repetidos", r"[ \t]{2,}", " "),
+    ("espaco_apos_quebra", r"\n[ \t]+", "\n"),
+    ("linhas_em_branco", r"\n{3,}", "\n\n"),
+    ("aspas_curvas", r"[“”]", '"'),
+    ("apostrofos_curvos", r"[‘’]", "'"),
+    ("reticencias", r"…", "..."),
+    ("espaco_nao_separavel", r" ", " "),
+]
+
+
+def overlap_length(previous: str, current: str, min_overlap: int = 8, max_overlap: int = 200) -> int:
+    """Tamanho do maior prefixo de `current` que também é sufixo de `previous`"""
+    limit = min(len(previous), len(current), max_overlap)
+    for size in range(limit, min_overlap - 1, -1):
+        if previous.endswith(current[:size]):
+            return size
+    return 0
+
+
+class PromptCompactor:
+    """
+    Remove overlap e normaliza o texto dos chunks antes da fase map.
+
+    Os chunks precisam ser processados na ordem do texto (a remoção do
+    overlap compara cada chunk com o anterior).
+    """
+
+    def __init__(self, rewrites: Optional[List[Tuple[str, str, str]]] = None,
+                 dedupe_overlap: bool = True, min_overlap: int = 8, max_overlap: int = 200,
+                 estimator=None):
+        """
+        Args:
+            rewrites (list): Reescritas (nome, regex, substituição); padrão DEFAULT_REWRITES
+            dedupe_overlap (bool): Remove o trecho repetido do chunk anterior
+            min_overlap (int): Menor repetição considerada overlap (em caracteres)
+            max_overlap (int): Maior repetição procurada (use >= chunk_overlap)
+            estimator (TokenEstimator): Estimador para as estatísticas de tokens
+        """
+        self.rewrites = [(name, re.compile(pattern), replacement)
+                         for name, pattern, replacement in (DEFAULT_REWRITES if rewrites is None else rewrites)]
+        self.dedupe_overlap = dedupe_overlap
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.estimator = estimator or DEFAULT_ESTIMATOR
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.overlap_chars_removed = 0
+        self.chunks = 0
+
+    def compact_text(self, text: str) -> str:
+        """Aplica as reescritas e remove espaços nas pontas"""
+        for _, pattern, replacement in self.rewrites:
+            text = pattern.sub(replacement, text)
+        return text.strip()
+
+    def compact_template(self, template: PromptTemplate) -> PromptTemplate:
+        """Mesmo template com o texto fixo compactado"""
+        return PromptTemplate.from_template(self.compact_text(template.template))
+
+    def compact_chunks(self, chunks: Iterable[Any]) -> Iterator[Any]:
+        """
+        Gera os chunks compactados, na mesma ordem.
+
+        Aceita strings ou Documents (o metadata é preservado) e pode ser
+        encadeado com geradores, como ingestao_gemini.iter_chunks.
+        """
+        previous = ""
+        for chunk in chunks:
+            is_document = hasattr(chunk, "page_content")
+            raw = chunk.page_content if is_document else str(chunk)
+            text = raw
+            if self.dedupe_overlap and previous:
+                overlap = overlap_length(previous, raw, self.min_overlap, self.max_overlap)
+                # Não deixa um chunk inteiramente repetido virar vazio
+                if overlap and overlap < len(raw.strip()):
+                    text = raw[overlap:]
+                    self.overlap_chars_removed += overlap
+            previous = raw
+            text = self.compact_text(text)
+            self.chunks += 1
+            self.tokens_before += self.estimator.estimate(raw)
+            self.tokens_after += self.estimator.estimate(text)
+            yield Document(page_content=text, metadata=dict(chunk.metadata)) if is_document else text
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tokens estimados antes e depois da compactação"""
+        saved = self.tokens_before - self.tokens_after
+        return {
+            "chunks": self.chunks,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": saved,
+            "saved_ratio": saved / self.tokens_before if self.tokens_before else 0.0,
+            "overlap_chars_removed": self.overlap_chars_removed,
+        }
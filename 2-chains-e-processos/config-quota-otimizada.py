@@ -7,26 +7,16 @@ do Gemini sem exceder as quotas.
 """
 
 import os
+import time
 from typing import Dict, Any
 
 # ============================================================================
 # CONFIGURAÇÕES DE QUOTA
 # ============================================================================
 
-QUOTA_CONFIG = {
-    "requests_per_minute": 15,
-    "requests_per_hour": 900,  # 15 * 60
-    "requests_per_day": 21600,  # 15 * 60 * 24
-    
-    # Delays recomendados
-    "min_delay_between_requests": 4.5,  # segundos
-    "delay_between_batches": 10.0,      # segundos
-    "backoff_on_quota_error": 60,       # segundos
-    
-    # Tamanhos de lote otimizados
-    "optimal_batch_size": 3,
-    "max_concurrent_requests": 1,
-}
+# Os valores ficam em quota_gemini.py para serem compartilhados com o
+# RateLimitedModel (este arquivo não pode ser importado por causa dos hífens)
+from quota_gemini import QUOTA_CONFIG, SlidingWindowCounter
 
 # ============================================================================
 # DICAS PARA ECONOMIZAR QUOTAS
@@ -79,41 +69,65 @@ OPTIMIZATION_STRATEGIES = {
 # ============================================================================
 
 class QuotaMonitor:
-    def __init__(self):
+    """
+    Acompanha o uso de quota com janelas deslizantes (minuto, hora, dia e
+    tokens por minuto), sem os resets de janela fixa.
+    """
+    
+    def __init__(self, clock=time.time):
         self.request_count = 0
-        self.last_reset = time.time()
-        self.hourly_requests = 0
-        self.daily_requests = 0
+        self.minute_requests = SlidingWindowCounter(60, clock)
+        self.hourly_requests = SlidingWindowCounter(3600, clock)
+        self.daily_requests = SlidingWindowCounter(86400, clock)
+        self.minute_tokens = SlidingWindowCounter(60, clock)
+    
+    def _limits(self, n: int, tokens: int):
+        return [
+            (self.minute_requests, n, QUOTA_CONFIG["requests_per_minute"]),
+            (self.hourly_requests, n, QUOTA_CONFIG["requests_per_hour"]),
+            (self.daily_requests, n, QUOTA_CONFIG["requests_per_day"]),
+            (self.minute_tokens, tokens, QUOTA_CONFIG["tokens_per_minute"]),
+        ]
         
-    def can_make_request(self) -> bool:
+    def can_make_request(self, tokens: int = 0) -> bool:
         """Verifica se ainda pode fazer requisições"""
-        current_time = time.time()
+        return self.time_until_available(1, tokens) == 0
+    
+    def time_until_available(self, n: int = 1, tokens: int = 0) -> float:
+        """
+        Segundos até ser possível fazer mais `n` requisições somando `tokens`.
         
-        # Reset contadores a cada hora/dia
-        if current_time - self.last_reset >= 3600:  # 1 hora
-            self.hourly_requests = 0
-            self.last_reset = current_time
-            
-        if current_time - self.last_reset >= 86400:  # 1 dia
-            self.daily_requests = 0
-            
-        return (self.hourly_requests < QUOTA_CONFIG["requests_per_hour"] and
-                self.daily_requests < QUOTA_CONFIG["requests_per_day"])
-    
-    def record_request(self):
-        """Registra uma requisição feita"""
+        Schedulers podem dormir exatamente esse tempo em vez de um delay fixo.
+        """
+        return max(counter.time_until_available(amount, limit)
+                   for counter, amount, limit in self._limits(n, tokens))
+    
+    def record_request(self, tokens: int = 0):
+        """Registra uma requisição feita (e os tokens gastos, se conhecidos)"""
         self.request_count += 1
-        self.hourly_requests += 1
-        self.daily_requests += 1
+        self.minute_requests.add()
+        self.hourly_requests.add()
+        self.daily_requests.add()
+        if tokens:
+            self.minute_tokens.add(tokens)
         
     def get_quota_status(self) -> Dict[str, Any]:
         """Retorna status atual das quotas"""
+        minute = self.minute_requests.count()
+        hourly = self.hourly_requests.count()
+        daily = self.daily_requests.count()
+        tokens = self.minute_tokens.count()
         return {
-            "requests_this_hour": self.hourly_requests,
-            "requests_today": self.daily_requests,
-            "hourly_remaining": QUOTA_CONFIG["requests_per_hour"] - self.hourly_requests,
-            "daily_remaining": QUOTA_CONFIG["requests_per_day"] - self.daily_requests,
-            "can_make_request": self.can_make_request()
+            "requests_this_minute": minute,
+            "requests_this_hour": hourly,
+            "requests_today": daily,
+            "tokens_this_minute": tokens,
+            "minute_remaining": QUOTA_CONFIG["requests_per_minute"] - minute,
+            "hourly_remaining": QUOTA_CONFIG["requests_per_hour"] - hourly,
+            "daily_remaining": QUOTA_CONFIG["requests_per_day"] - daily,
+            "tokens_remaining": QUOTA_CONFIG["tokens_per_minute"] - tokens,
+            "can_make_request": self.can_make_request(),
+            "seconds_until_available": self.time_until_available(),
         }
 
 # ============================================================================
@@ -189,10 +203,10 @@ def exemplo_configuracao():
     monitor = QuotaMonitor()
     status = monitor.get_quota_status()
     print(f"\n📈 STATUS ATUAL:")
+    print(f"   Requisições restantes neste minuto: {status['minute_remaining']}")
     print(f"   Requisições restantes esta hora: {status['hourly_remaining']}")
     print(f"   Requisições restantes hoje: {status['daily_remaining']}")
     print(f"   Pode fazer requisição: {'✅ Sim' if status['can_make_request'] else '❌ Não'}")
 
 if __name__ == "__main__":
-    import time
     exemplo_configuracao()
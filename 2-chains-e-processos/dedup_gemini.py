@@ -0,0 +1,277 @@
+"""
+ÍNDICE DE QUASE-DUPLICATAS (MINHASH + LSH)
+==========================================
+
+O cache de respostas só acerta quando o prompt é idêntico. Em documentos
+reais muitos chunks são QUASE iguais: parágrafos de boilerplate, versões
+com poucas palavras editadas, reenvios do mesmo arquivo. Este índice
+encontra esses chunks e reaproveita o resumo já gerado, sem gastar quota.
+
+Como funciona:
+- cada chunk é normalizado e quebrado em shingles de `shingle_size`
+  caracteres, com hash calculado de forma vetorizada (NumPy)
+- a assinatura MinHash (`num_perm` valores) estima a similaridade de
+  Jaccard entre dois chunks
+- a assinatura é dividida em `bands` faixas; chunks que coincidem em pelo
+  menos uma faixa viram candidatos (LSH), então a busca não depende do
+  número de chunks guardados
+- só candidatos com similaridade estimada >= `threshold` são aceitos
+
+Como usar:
+from dedup_gemini import NearDuplicateIndex
+
+index = NearDuplicateIndex(threshold=0.8)
+index.add(chunk, summary)
+index.lookup(chunk_levemente_editado)  # retorna o summary ou None
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".gemini_map_summaries.npz")
+
+_WHITESPACE = re.compile(r"\s+")
+_HASH_SHIFT = np.uint64(32)
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas e espaços colapsados (edições de formatação não contam)"""
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+def shingle_hashes(text: str, shingle_size: int = 5) -> np.ndarray:
+    """
+    Hashes (uint64) dos shingles de caracteres do texto normalizado.
+
+    O hash de cada janela é um polinômio sobre os bytes, calculado para
+    todas as janelas de uma vez.
+    """
+    data = np.frombuffer(normalize_text(text).encode("utf-8"), dtype=np.uint8)
+    if data.size == 0:
+        return np.zeros(1, dtype=np.uint64)
+    if data.size < shingle_size:
+        data = np.pad(data, (0, shingle_size - data.size))
+    windows = sliding_window_view(data, shingle_size).astype(np.uint64)
+    powers = np.uint64(1099511628211) ** np.arange(shingle_size - 1, -1, -1, dtype=np.uint64)
+    return np.unique(windows @ powers)
+
+
+class NearDuplicateIndex:
+    """
+    Índice de textos quase duplicados com MinHash e LSH por faixas.
+
+    Guarda um valor (ex.: o resumo da fase map) por texto. Como o valor
+    depende do prompt usado para gerá-lo, use um índice por prompt.
+    Seguro para uso entre threads.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 5, max_bucket_size: int = 100,
+                 path: Optional[str] = None, seed: int = 1):
+        """
+        Args:
+            threshold (float): Similaridade mínima (Jaccard estimado) para reaproveitar
+            num_perm (int): Tamanho da assinatura MinHash
+            bands (int): Número de faixas do LSH (precisa dividir num_perm).
+                Mais faixas encontram mais candidatos, com mais verificações
+            shingle_size (int): Tamanho dos shingles em caracteres
+            max_bucket_size (int): Máximo de textos por bucket do LSH (evita
+                buckets gigantes quando há muito boilerplate)
+            path (str): Arquivo .npz para persistir o índice (None = só memória).
+                Se existir, é carregado
+            seed (int): Semente das permutações (índices salvos dependem dela)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm precisa ser múltiplo de bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_bucket_size = max_bucket_size
+        self.path = path
+        self.seed = seed
+        self.hits = 0
+        self.misses = 0
+
+        rng = np.random.default_rng(seed)
+        # Hash multiplicativo (a * x + b) >> 32 com `a` ímpar simula cada permutação
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self._band_mult = rng.integers(1, 2 ** 63, self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self._lock = threading.Lock()
+        self._signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self._values: List[Any] = []
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    # ------------------------------------------------------------------
+    # Assinaturas
+    # ------------------------------------------------------------------
+
+    def signature(self, text: str) -> np.ndarray:
+        """Assinatura MinHash (uint32, tamanho num_perm) do texto"""
+        hashes = shingle_hashes(text, self.shingle_size)
+        permuted = (hashes[:, None] * self._a + self._b) >> _HASH_SHIFT
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """Uma chave por faixa; aceita uma assinatura ou uma matriz delas"""
+        bands = signatures.reshape(-1, self.bands, self.rows).astype(np.uint64)
+        return bands @ self._band_mult
+
+    # ------------------------------------------------------------------
+    # Busca e inserção
+    # ------------------------------------------------------------------
+
+    def _candidates(self, keys: np.ndarray) -> List[int]:
+        found = set()
+        for band, key in enumerate(keys.tolist()):
+            found.update(self._buckets[band].get(key, ()))
+        return list(found)
+
+    def query(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Procura o texto guardado mais parecido.
+
+        Returns:
+            dict: {"value", "similarity", "id"} ou None se nenhum passar do threshold
+        """
+        signature = self.signature(text)
+        keys = self._band_keys(signature)[0]
+        with self._lock:
+            candidates = self._candidates(keys)
+            if not candidates:
+                self.misses += 1
+                return None
+            ids = np.array(candidates)
+            similarities = (self._signatures[ids] == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {"value": self._values[ids[best]], "similarity": float(similarities[best]), "id": int(ids[best])}
+
+    def lookup(self, text: str) -> Optional[Any]:
+        """Retorna o valor do texto quase duplicado, ou None"""
+        match = self.query(text)
+        return match["value"] if match else None
+
+    def add(self, text: str, value: Any) -> int:
+        """Guarda o valor do texto e retorna o id interno"""
+        signature = self.signature(text)
+        keys = self._band_keys(signature)[0]
+        with self._lock:
+            return self._insert(signature, keys.tolist(), value)
+
+    def _reserve_rows(self, count: int) -> int:
+        """Garante espaço para mais `count` assinaturas; retorna o primeiro id livre"""
+        first_id = len(self._values)
+        needed = first_id + count
+        if needed > len(self._signatures):
+            grown = np.zeros((max(needed, 2 * len(self._signatures)), self.num_perm), dtype=np.uint32)
+            grown[:first_id] = self._signatures[:first_id]
+            self._signatures = grown
+        return first_id
+
+    def _insert(self, signature: np.ndarray, keys: List[int], value: Any) -> int:
+        item_id = self._reserve_rows(1)
+        self._signatures[item_id] = signature
+        self._values.append(value)
+        for band, key in enumerate(keys):
+            bucket = self._buckets[band].setdefault(key, [])
+            if len(bucket) < self.max_bucket_size:
+                bucket.append(item_id)
+        return item_id
+
+    def _insert_many(self, signatures: np.ndarray, values: List[Any]):
+        """
+        Insere um bloco de assinaturas de uma vez (usado ao carregar).
+
+        As chaves de todas as faixas são calculadas numa única operação, e
+        em cada faixa os ids são agrupados por chave com um argsort, em vez
+        de passar item a item pelos buckets.
+        """
+        first_id = self._reserve_rows(len(values))
+        self._signatures[first_id:first_id + len(values)] = signatures
+        self._values.extend(values)
+        all_keys = self._band_keys(signatures)
+        ids = np.arange(first_id, first_id + len(values))
+        for band in range(self.bands):
+            column = all_keys[:, band]
+            order = np.argsort(column, kind="stable")
+            keys, starts = np.unique(column[order], return_index=True)
+            buckets = self._buckets[band]
+            for key, group in zip(keys.tolist(), np.split(ids[order], starts[1:])):
+                bucket = buckets.setdefault(key, [])
+                room = self.max_bucket_size - len(bucket)
+                if room > 0:
+                    bucket.extend(group[:room].tolist())
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def save(self, path: Optional[str] = None):
+        """
+        Salva assinaturas e valores (os buckets são reconstruídos ao carregar).
+
+        As assinaturas vão como matriz uint32; os valores, como os bytes de
+        cada um em JSON concatenados, mais os offsets de cada valor.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("Informe o caminho do arquivo")
+        with self._lock:
+            count = len(self._values)
+            encoded = [json.dumps(value, ensure_ascii=False).encode("utf-8") for value in self._values]
+            offsets = np.zeros(count + 1, dtype=np.int64)
+            np.cumsum([len(item) for item in encoded], out=offsets[1:])
+            with open(path, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    signatures=self._signatures[:count],
+                    value_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                    value_offsets=offsets,
+                    params=np.array([self.num_perm, self.bands, self.shingle_size, self.seed]),
+                )
+
+    def load(self, path: str):
+        """Carrega um índice salvo com os mesmos parâmetros"""
+        with np.load(path) as data:
+            params = data["params"].tolist()
+            if params != [self.num_perm, self.bands, self.shingle_size, self.seed]:
+                raise ValueError(f"Índice salvo com parâmetros diferentes: {params}")
+            signatures = data["signatures"].astype(np.uint32, copy=False)
+            if "values" in data.files:
+                # Formato antigo: todos os valores numa única string JSON
+                values = json.loads(str(data["values"]))
+            else:
+                raw = data["value_bytes"].tobytes()
+                offsets = data["value_offsets"].tolist()
+                values = [json.loads(raw[start:end]) for start, end in zip(offsets, offsets[1:])]
+        with self._lock:
+            self._insert_many(signatures, values)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna tamanho do índice e taxa de reaproveitamento"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._values),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -8,6 +8,7 @@ sem precisar repetir a classe.
 
 # Importa o modelo com rate limiting
 from utils_gemini import RateLimitedModel
+from packing_gemini import PromptPacker
 
 # Cria o modelo (rate limiting automático!)
 model = RateLimitedModel()
@@ -36,11 +37,24 @@ texto = "Python é uma linguagem de programação interpretada, de alto nível e
 result4 = model.invoke(f"Analise este texto e diga se é positivo ou negativo: {texto}")
 print(f"Resposta: {result4.content}")
 
+# Exemplo 5: As mesmas quatro perguntas em UMA requisição
+print("\n5️⃣ Quatro perguntas empacotadas em uma requisição:")
+packer = PromptPacker(model, pack_size=4)
+perguntas = [
+    "Explique o que é Python em uma frase",
+    "Traduza 'Hello World' para português",
+    "Escreva uma função Python que soma dois números",
+    f"Analise este texto e diga se é positivo ou negativo: {texto}",
+]
+for pergunta, resposta in zip(perguntas, packer.invoke_many(perguntas)):
+    print(f"❓ {pergunta}\n   Resposta: {resposta.content}")
+
 # Mostra estatísticas finais
 print("\n" + "=" * 50)
 stats = model.get_stats()
 print("📊 ESTATÍSTICAS FINAIS:")
 print(f"   Total de requisições: {stats['total_requests']}")
+print(f"   Perguntas por requisição no exemplo 5: {packer.get_stats()['prompts_per_request']:.1f}")
 print(f"   Rate limiting funcionando: ✅")
 print(f"   Sem erros de quota: ✅")
 
@@ -0,0 +1,176 @@
+"""
+SUMARIZAÇÃO EXTRATIVA LOCAL
+===========================
+
+Resume textos sem chamar nenhum modelo: as frases são representadas por
+vetores TF-IDF (NumPy) e ordenadas por TextRank (PageRank sobre a
+similaridade de cosseno entre frases). As frases mais centrais são
+devolvidas na ordem original do texto.
+
+Serve para duas coisas:
+- fallback: quando a quota acaba, `invoke`/`ainvoke` devolvem uma
+  AIMessage como a do Gemini, então o serviço continua respondendo
+- pré-filtro: `compress` descarta as frases menos relevantes de um chunk
+  antes de ele ir para o modelo, economizando tokens em toda requisição
+
+Como usar:
+from extrativo_gemini import ExtractiveSummarizer
+
+summarizer = ExtractiveSummarizer(max_sentences=3)
+summarizer.invoke(texto_longo).content
+summarizer.compress(chunk, ratio=0.6)
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.messages import AIMessage
+
+# Fim de frase (inclui ":" para separar instruções do texto) ou parágrafo
+_SENTENCE_END = re.compile(r"(?<=[.!?:;])\s+|\n\s*\n")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+a about after all also an and are as at be been but by can for from had has have he her his
+in into is it its more most no not of on or our over she so than that the their them then
+there these they this to up was we were what when which who will with would you your
+ao aos as com como da das de dos do e ela ele em entre era essa esse esta este foi for
+isso mais mas na nas no nos o os ou para pela pelo por que se sem ser seu sua são um uma
+""".split())
+
+
+def split_sentences(text: str) -> List[str]:
+    """Divide o texto em frases (sem as vazias)"""
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+def prompt_text(prompt: Any) -> str:
+    """Texto de um prompt: string, mensagem, lista de mensagens ou PromptValue"""
+    if isinstance(prompt, str):
+        return prompt
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    if isinstance(prompt, (list, tuple)):
+        parts = []
+        for message in prompt:
+            if isinstance(message, (list, tuple)) and len(message) == 2:
+                parts.append(str(message[1]))
+            else:
+                parts.append(str(getattr(message, "content", message)))
+        return "\n\n".join(parts)
+    return str(getattr(prompt, "content", prompt))
+
+
+def tfidf_matrix(sentences: List[str]) -> np.ndarray:
+    """Matriz frases x termos com TF-IDF e linhas normalizadas (norma L2)"""
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            if len(word) > 1 and word not in STOPWORDS:
+                rows.append(i)
+                cols.append(vocabulary.setdefault(word, len(vocabulary)))
+    counts = np.zeros((len(sentences), max(1, len(vocabulary))))
+    np.add.at(counts, (np.array(rows, dtype=int), np.array(cols, dtype=int)), 1.0)
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1.0
+    weights = np.log1p(counts) * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return weights / np.where(norms == 0, 1.0, norms)
+
+
+def textrank_scores(vectors: np.ndarray, damping: float = 0.85, iterations: int = 50,
+                    tolerance: float = 1e-6) -> np.ndarray:
+    """PageRank sobre o grafo de similaridade de cosseno entre as frases"""
+    n = len(vectors)
+    if n == 0:
+        return np.zeros(0)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Frases sem nenhuma similaridade distribuem o peso igualmente
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1.0, out_weight), 1.0 / n)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+class ExtractiveSummarizer:
+    """
+    Sumarizador extrativo (TF-IDF + TextRank) com a interface de um modelo.
+
+    Não tem estado entre chamadas, então pode ser compartilhado entre
+    threads e corrotinas.
+    """
+
+    def __init__(self, max_sentences: int = 3, ratio: Optional[float] = None,
+                 damping: float = 0.85):
+        """
+        Args:
+            max_sentences (int): Máximo de frases no resumo
+            ratio (float): Se informado, fração das frases a manter (o
+                resumo fica com max(1, ratio * frases), limitado por max_sentences)
+            damping (float): Fator de amortecimento do TextRank
+        """
+        self.max_sentences = max_sentences
+        self.ratio = ratio
+        self.damping = damping
+        self.calls = 0
+
+    def rank(self, sentences: List[str]) -> np.ndarray:
+        """Pontuação de cada frase (maior = mais central no texto)"""
+        if len(sentences) <= 2:
+            return np.ones(len(sentences))
+        return textrank_scores(tfidf_matrix(sentences), self.damping)
+
+    def select(self, sentences: List[str], count: int) -> List[str]:
+        """As `count` frases mais bem pontuadas, na ordem original"""
+        if count >= len(sentences):
+            return list(sentences)
+        top = np.argsort(-self.rank(sentences), kind="stable")[:count]
+        return [sentences[i] for i in sorted(top.tolist())]
+
+    def summarize(self, text: str, max_sentences: Optional[int] = None) -> str:
+        """Resumo extrativo do texto"""
+        sentences = split_sentences(text)
+        count = max_sentences or self.max_sentences
+        if self.ratio is not None:
+            count = min(count, max(1, math.ceil(self.ratio * len(sentences))))
+        return " ".join(self.select(sentences, count))
+
+    def compress(self, text: str, ratio: float = 0.6, min_sentences: int = 4) -> str:
+        """
+        Pré-filtro: mantém as frases mais relevantes até ~`ratio` dos caracteres.
+
+        Textos com menos de `min_sentences` frases voltam sem alteração
+        (não há o que cortar sem perder o assunto).
+        """
+        sentences = split_sentences(text)
+        if len(sentences) < min_sentences:
+            return text
+        budget = ratio * sum(len(s) for s in sentences)
+        order = np.argsort(-self.rank(sentences), kind="stable").tolist()
+        kept, used = [], 0
+        for index in order:
+            if kept and used + len(sentences[index]) > budget:
+                continue
+            kept.append(index)
+            used += len(sentences[index])
+        return " ".join(sentences[i] for i in sorted(kept))
+
+    def invoke(self, prompt: Any) -> AIMessage:
+        """Resume o texto do prompt e devolve uma AIMessage (como o Gemini)"""
+        self.calls += 1
+        return AIMessage(
+            content=self.summarize(prompt_text(prompt)),
+            response_metadata={"model_name": "extractive-textrank"},
+        )
+
+    async def ainvoke(self, prompt: Any) -> AIMessage:
+        return self.invoke(prompt)
@@ -0,0 +1,114 @@
+"""
+INGESTÃO EM STREAMING DE ARQUIVOS GRANDES
+=========================================
+
+`splitter.create_documents([texto])` exige o texto inteiro em memória e
+só devolve os chunks depois de dividir tudo. Aqui o arquivo é lido em
+blocos e os chunks saem de um gerador, um a um:
+
+- cada bloco é cortado no último separador do splitter (parágrafo, linha,
+  espaço), e o resto fica para o próximo bloco
+- o trecho cortado é dividido pelo próprio splitter, então tamanho de
+  chunk, overlap e separadores são os mesmos de create_documents
+- a memória usada depende de `block_size`, não do tamanho do arquivo
+
+Junto com MapReduceSummarizer (que aceita iteradores e consome os chunks
+por uma fila limitada), a primeira chamada ao modelo sai assim que o
+primeiro bloco é lido.
+
+Como usar:
+from ingestao_gemini import iter_chunks
+
+for chunk in iter_chunks("arquivo_grande.txt"):
+    print(chunk.page_content)
+"""
+
+import io
+import os
+from typing import Iterable, Iterator, Optional, Union
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+def default_splitter() -> RecursiveCharacterTextSplitter:
+    """O mesmo splitter usado nos scripts de sumarização"""
+    return RecursiveCharacterTextSplitter(chunk_size=250, chunk_overlap=50)
+
+
+def iter_blocks(source: Union[str, os.PathLike, io.TextIOBase, Iterable[str]],
+                block_size: int = DEFAULT_BLOCK_SIZE, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Lê o texto em blocos de até `block_size` caracteres.
+
+    Args:
+        source: Caminho de arquivo, arquivo aberto em modo texto ou
+            iterável de strings (ex.: linhas)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding=encoding) as f:
+            yield from iter_blocks(f, block_size)
+        return
+    if hasattr(source, "read"):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return
+            yield block
+    else:
+        yield from source
+
+
+def _cut_point(text: str, separators) -> int:
+    """
+    Posição do último separador (o de maior prioridade presente).
+
+    O separador fica no início do próximo trecho, como o splitter faz com
+    keep_separator=True, para que os tamanhos dos pedaços sejam os mesmos.
+    """
+    for separator in separators:
+        if not separator:
+            break
+        position = text.rfind(separator)
+        if position > 0:
+            return position
+    return len(text)
+
+
+def iter_text_chunks(source, splitter: Optional[RecursiveCharacterTextSplitter] = None,
+                     block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Divide o texto em chunks sem carregá-lo inteiro.
+
+    Os blocos são cortados em separadores do splitter, então só os chunks
+    que cruzariam a fronteira de um bloco podem diferir de create_documents.
+    Use `block_size` bem maior que um parágrafo para que os cortes caiam
+    entre parágrafos ou linhas.
+    """
+    splitter = splitter or default_splitter()
+    separators = getattr(splitter, "_separators", ["\n\n", "\n", " "])
+    pending = ""
+    for block in iter_blocks(source, block_size):
+        pending += block
+        if len(pending) < block_size:
+            continue
+        cut = _cut_point(pending, separators)
+        yield from splitter.split_text(pending[:cut])
+        pending = pending[cut:]
+    if pending.strip():
+        yield from splitter.split_text(pending)
+
+
+def iter_chunks(source, splitter: Optional[RecursiveCharacterTextSplitter] = None,
+                block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[Document]:
+    """
+    Versão de iter_text_chunks que gera Documents, como create_documents.
+
+    O metadata de cada Document tem "source" (quando for um arquivo) e
+    "chunk" (posição do chunk no texto).
+    """
+    metadata = {"source": os.fspath(source)} if isinstance(source, (str, os.PathLike)) else {}
+    for index, text in enumerate(iter_text_chunks(source, splitter, block_size)):
+        yield Document(page_content=text, metadata={**metadata, "chunk": index})
@@ -0,0 +1,275 @@
+"""
+DIÁRIO DE JOBS (CHECKPOINT E RETOMADA)
+======================================
+
+Em um job longo de map-reduce, cada chamada concluída custa quota e
+minutos. O JobJournal grava cada passo concluído (map, collapse, reduce)
+em um arquivo append-only, uma linha JSON por passo, com a chave do passo
+e os hashes das entradas. Se o processo morrer no chunk 37 de 40, a nova
+execução lê o diário e só faz os passos que faltam.
+
+Durabilidade:
+- cada linha vai para o arquivo com um único write() em modo append, então
+  um processo que morre não perde o que já escreveu
+- o fsync (que protege contra queda da máquina) é feito em lotes: a cada
+  `fsync_every` linhas ou `fsync_interval` segundos, e ao fechar
+- uma última linha incompleta (queda no meio da escrita) é ignorada
+
+Vários workers podem dividir o mesmo job: antes de calcular um passo,
+o worker o reserva (claim) no diário, sob um lock de arquivo. Os outros
+pulam os passos reservados, seguem com os próximos e depois leem o
+resultado do diário. Uma reserva expira em `claim_ttl` segundos, então o
+trabalho de um worker que morreu é retomado por outro.
+
+Como usar:
+from journal_gemini import JobJournal
+from sumarizacao_gemini import IncrementalSummarizer
+
+journal = JobJournal("resumo-relatorio.jsonl", worker_id="worker-1")
+IncrementalSummarizer(model, store=journal).summarize(chunks)
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".gemini_journal.jsonl")
+
+
+class _FileLock:
+    """Lock exclusivo entre processos sobre um arquivo auxiliar"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+
+class JobJournal:
+    """
+    Diário append-only dos passos concluídos de um job.
+
+    Também serve de `store` para o IncrementalSummarizer: get(key) devolve
+    a AIMessage do passo concluído e set(key, message) grava um passo.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH, worker_id: Optional[str] = None,
+                 fsync_every: int = 8, fsync_interval: float = 1.0, claim_ttl: float = 300.0):
+        """
+        Args:
+            path (str): Arquivo do diário (JSON lines)
+            worker_id (str): Identificador deste worker (padrão: hostname-pid).
+                Workers que dividem um job precisam de ids diferentes; um
+                worker reiniciado com o mesmo id explícito retoma as próprias
+                reservas na hora (com o padrão, elas expiram em `claim_ttl`)
+            fsync_every (int): Linhas gravadas entre dois fsyncs
+            fsync_interval (float): Segundos máximos entre dois fsyncs
+            claim_ttl (float): Validade de uma reserva de passo
+        """
+        self.path = path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.claim_ttl = claim_ttl
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        self.claims: Dict[str, Dict[str, Any]] = {}
+        self.steps_written = 0
+        self.fsyncs = 0
+        self._offset = 0
+        self._pending_sync = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._file_lock = _FileLock(path + ".lock")
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._close_partial_line()
+        self.refresh()
+
+    def _close_partial_line(self):
+        """Termina uma linha cortada por uma queda, para não colar nela a próxima"""
+        with self._file_lock:
+            with open(self.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    os.write(self._fd, b"\n")
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def refresh(self):
+        """Lê as linhas que outros workers (ou execuções anteriores) gravaram"""
+        with self._lock:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            end = data.rfind(b"\n") + 1
+            # Sem "\n" no fim: linha ainda sendo escrita (ou cortada por uma queda)
+            for line in data[:end].splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(entry)
+            self._offset += end
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry.get("type") == "done":
+            self.completed[entry["key"]] = entry
+            self.claims.pop(entry["key"], None)
+        elif entry.get("type") == "claim":
+            self.claims[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        """AIMessage do passo concluído, ou None"""
+        entry = self.completed.get(key)
+        if entry is None:
+            self.refresh()
+            entry = self.completed.get(key)
+        return None if entry is None else AIMessage(content=entry["output"])
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def _append(self, entry: Dict[str, Any]):
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            os.write(self._fd, line)
+            self._pending_sync += 1
+            if (self._pending_sync >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync_locked()
+
+    def _sync_locked(self):
+        if self._pending_sync:
+            os.fsync(self._fd)
+            self.fsyncs += 1
+            self._pending_sync = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Força o fsync das linhas pendentes"""
+        with self._lock:
+            self._sync_locked()
+
+    def record(self, key: str, output: str, kind: str = "step", inputs: Optional[List[str]] = None):
+        """Grava um passo concluído com os hashes das suas entradas"""
+        entry = {"type": "done", "key": key, "kind": kind, "inputs": inputs or [],
+                 "output": output, "worker": self.worker_id, "ts": time.time()}
+        self._append(entry)
+        with self._lock:
+            self._apply(entry)
+        self.steps_written += 1
+
+    def set(self, key: str, message: Any):
+        """Interface de store (como ResponseCache.set)"""
+        self.record(key, getattr(message, "content", str(message)))
+
+    def claim(self, key: str) -> bool:
+        """
+        Reserva o passo para este worker.
+
+        Returns:
+            bool: True se este worker deve calcular o passo; False se ele já
+                foi concluído ou está reservado por outro worker
+        """
+        with self._file_lock:
+            self.refresh()
+            if key in self.completed:
+                return False
+            current = self.claims.get(key)
+            if (current is not None and current["worker"] != self.worker_id
+                    and current["expires"] > time.time()):
+                return False
+            entry = {"type": "claim", "key": key, "worker": self.worker_id,
+                     "expires": time.time() + self.claim_ttl}
+            # A reserva é gravada (sem esperar o fsync) antes de soltar o lock
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            with self._lock:
+                os.write(self._fd, line)
+                self._pending_sync += 1
+        self.refresh()
+        return True
+
+    # ------------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------------
+
+    def compact(self):
+        """
+        Reescreve o diário só com os passos concluídos (descarta reservas).
+
+        Use apenas sem outros workers ativos no mesmo diário.
+        """
+        with self._file_lock:
+            self.refresh()
+            temporary = self.path + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                for entry in self.completed.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            with self._lock:
+                os.close(self._fd)
+                os.replace(temporary, self.path)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._offset = os.path.getsize(self.path)
+                self.claims.clear()
+
+    def close(self):
+        self.sync()
+        os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Passos concluídos, reservas ativas e fsyncs feitos"""
+        now = time.time()
+        return {
+            "completed": len(self.completed),
+            "active_claims": sum(1 for c in self.claims.values() if c["expires"] > now),
+            "steps_written": self.steps_written,
+            "fsyncs": self.fsyncs,
+        }
@@ -0,0 +1,194 @@
+"""
+EMPACOTAMENTO DE PROMPTS
+========================
+
+Junta vários prompts pequenos e independentes em uma única requisição e
+separa a resposta de volta em um resultado por prompt. Com a quota de
+15 requisições por minuto, empacotar 4 prompts por chamada multiplica a
+vazão efetiva por 4.
+
+O modelo recebe os prompts numerados e responde com um array JSON
+[{"id": 1, "answer": "..."}, ...]. Só os itens que faltarem na resposta
+(ou todos, se ela não for JSON válido) são reenviados: primeiro em pacotes
+com metade do tamanho, depois um a um. Um pacote nunca é reenviado igual
+(com o cache, seria a mesma resposta inválida; sem ele, quota gasta em
+uma falha provável).
+
+Como usar:
+from packing_gemini import PromptPacker
+from utils_gemini import RateLimitedModel
+
+packer = PromptPacker(RateLimitedModel(), pack_size=4)
+results = packer.invoke_many(["Pergunta 1", "Pergunta 2", "Pergunta 3"])
+print(results[0].content)
+"""
+
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+from langchain_core.messages import AIMessage
+
+PACK_INSTRUCTIONS = (
+    "Answer each of the following independent requests separately. "
+    "Reply ONLY with a JSON array, one object per request, in the form "
+    '[{{"id": <request id>, "answer": "<your answer>"}}]. '
+    "Write each answer in the language of its request.\n\n{requests}"
+)
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def build_packed_prompt(prompts: List[str]) -> str:
+    """Monta o prompt único com os pedidos numerados a partir de 1"""
+    requests = "\n\n".join(f"### Request {i}\n{prompt}" for i, prompt in enumerate(prompts, 1))
+    return PACK_INSTRUCTIONS.format(requests=requests)
+
+
+def parse_packed_response(text: str, count: int) -> Dict[int, str]:
+    """
+    Extrai as respostas por id (base 0) de uma resposta empacotada.
+
+    Ids ausentes, repetidos ou fora do intervalo são ignorados; quem chama
+    decide o que reenviar.
+    """
+    text = _FENCE.sub("", text.strip())
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    answers = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or "answer" not in item:
+            continue
+        try:
+            index = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < count and index not in answers:
+            answers[index] = str(item["answer"])
+    return answers
+
+
+class PromptPacker:
+    """
+    Envia prompts em pacotes de até `pack_size` por requisição.
+
+    O modelo pode ser qualquer objeto com `invoke`/`ainvoke` (por exemplo,
+    RateLimitedModel, que continua cuidando da quota).
+    """
+
+    def __init__(self, model, pack_size: int = 4, max_retries: int = 1):
+        """
+        Args:
+            model: Modelo com invoke/ainvoke
+            pack_size (int): Máximo de prompts por requisição
+            max_retries (int): Quantas vezes reempacotar os itens que falharam
+                (cada vez em pacotes com metade do tamanho) antes de
+                enviá-los um a um
+        """
+        self.model = model
+        self.pack_size = max(1, pack_size)
+        self.max_retries = max_retries
+        self.requests_sent = 0
+        self.prompts_answered = 0
+
+    def _plan(self, pending: List[int], attempt: int, sent: Set[Tuple[int, ...]]):
+        """
+        Divide os pendentes em pacotes e avulsos para a tentativa `attempt`.
+
+        A cada nova tentativa o tamanho cai pela metade, e um pacote igual a
+        um já enviado é dividido ao meio, para não repetir o mesmo prompt.
+
+        Returns:
+            tuple: (pacotes com 2+ itens, índices a enviar sozinhos)
+        """
+        size = max(1, self.pack_size >> attempt)
+        packs, singles = [], []
+        queue = [pending[i:i + size] for i in range(0, len(pending), size)]
+        while queue:
+            pack = queue.pop(0)
+            if len(pack) == 1:
+                singles.append(pack[0])
+            elif tuple(pack) in sent:
+                half = (len(pack) + 1) // 2
+                queue[:0] = [pack[:half], pack[half:]]
+            else:
+                sent.add(tuple(pack))
+                packs.append(pack)
+        return packs, singles
+
+    def _collect(self, pack: List[int], result: Any, results: Dict[int, AIMessage]) -> List[int]:
+        """Guarda as respostas do pacote e retorna os índices que faltaram"""
+        self.requests_sent += 1
+        text = result.content if hasattr(result, "content") else str(result)
+        answers = parse_packed_response(text, len(pack))
+        for position, index in enumerate(pack):
+            if position in answers:
+                results[index] = AIMessage(content=answers[position])
+        return [index for index in pack if index not in results]
+
+    def invoke_many(self, prompts: List[str]) -> List[AIMessage]:
+        """
+        Responde todos os prompts usando o mínimo de requisições.
+
+        Returns:
+            list: Uma AIMessage por prompt, na mesma ordem
+        """
+        results: Dict[int, AIMessage] = {}
+        pending = list(range(len(prompts)))
+        sent: Set[Tuple[int, ...]] = set()
+        for attempt in range(self.max_retries + 1):
+            if not pending:
+                break
+            packs, singles = self._plan(pending, attempt, sent)
+            failed = list(singles)
+            for pack in packs:
+                result = self.model.invoke(build_packed_prompt([prompts[i] for i in pack]))
+                failed.extend(self._collect(pack, result, results))
+            if len(failed) > len(singles):
+                print(f"🔁 {len(failed) - len(singles)} item(ns) sem resposta no pacote; reenviando")
+            pending = failed
+        # O que sobrou vai sozinho, sem empacotamento
+        for index in pending:
+            self.requests_sent += 1
+            results[index] = self.model.invoke(prompts[index])
+        self.prompts_answered += len(prompts)
+        return [results[i] for i in range(len(prompts))]
+
+    async def ainvoke_many(self, prompts: List[str]) -> List[AIMessage]:
+        """Versão assíncrona de invoke_many: os pacotes são enviados em paralelo"""
+        results: Dict[int, AIMessage] = {}
+        pending = list(range(len(prompts)))
+        sent: Set[Tuple[int, ...]] = set()
+        for attempt in range(self.max_retries + 1):
+            if not pending:
+                break
+            packs, singles = self._plan(pending, attempt, sent)
+            responses = await asyncio.gather(
+                *(self.model.ainvoke(build_packed_prompt([prompts[i] for i in pack])) for pack in packs)
+            )
+            failed = list(singles)
+            for pack, result in zip(packs, responses):
+                failed.extend(self._collect(pack, result, results))
+            if len(failed) > len(singles):
+                print(f"🔁 {len(failed) - len(singles)} item(ns) sem resposta no pacote; reenviando")
+            pending = failed
+        responses = await asyncio.gather(*(self.model.ainvoke(prompts[i]) for i in pending))
+        self.requests_sent += len(pending)
+        for index, result in zip(pending, responses):
+            results[index] = result
+        self.prompts_answered += len(prompts)
+        return [results[i] for i in range(len(prompts))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna quantos prompts foram respondidos por requisição"""
+        return {
+            "requests_sent": self.requests_sent,
+            "prompts_answered": self.prompts_answered,
+            "prompts_per_request": self.prompts_answered / self.requests_sent if self.requests_sent else 0.0,
+        }
@@ -0,0 +1,253 @@
+"""
+EXECUÇÃO EM ESTÁGIOS (PIPELINE) DE CHAINS
+=========================================
+
+Rodar uma chain de várias etapas (ex.: traduzir → resumir) item a item faz
+cada item passar pelas duas etapas antes do próximo começar: as chamadas
+da segunda etapa nunca se sobrepõem às da primeira etapa dos itens
+seguintes, e o tempo total vira a soma das latências das etapas.
+
+O StagedPipeline dá a cada etapa uma fila limitada e um grupo de workers
+próprios. Os itens fluem pelas etapas ao mesmo tempo: enquanto o item 5 é
+resumido, os itens 6 a 9 já estão sendo traduzidos. Com o modelo com rate
+limiting em todas as etapas, a vazão passa a ser limitada pela quota.
+
+- filas limitadas (backpressure): uma etapa rápida não acumula itens sem
+  fim na frente de uma lenta, e geradores de entrada são lidos aos poucos
+- resultados na ordem de entrada (`ordered=True`) ou conforme ficam prontos
+- erros: param o pipeline, ou com `return_exceptions=True` viram o
+  resultado do item (as etapas seguintes pulam o item)
+
+Como usar:
+from pipeline_gemini import Stage, StagedPipeline
+
+pipeline = StagedPipeline([
+    Stage("traduzir", {"text": translate}),
+    Stage("resumir", template_summarize | model | StrOutputParser()),
+])
+resultados = pipeline.run([{"initial_text": t} for t in textos])
+print(pipeline.get_stats())
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.runnables.base import coerce_to_runnable
+from quota_gemini import QUOTA_CONFIG
+from telemetria_gemini import TELEMETRY
+
+_DONE = object()
+
+
+class _Failure:
+    """Erro de um item que segue pelas etapas seguintes sem ser processado"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class Stage:
+    """Uma etapa do pipeline: um Runnable com fila e workers próprios"""
+
+    def __init__(self, name: str, runnable: Any, workers: Optional[int] = None,
+                 queue_size: Optional[int] = None):
+        """
+        Args:
+            name (str): Nome da etapa (estatísticas e spans de telemetria)
+            runnable: Runnable do LangChain (ou algo que o LCEL converta, como
+                uma função ou um dict)
+            workers (int): Itens processados ao mesmo tempo nesta etapa
+                (padrão: QUOTA_CONFIG["max_concurrent_requests"])
+            queue_size (int): Itens esperando na fila da etapa (padrão: 2 x workers)
+        """
+        self.name = name
+        self.runnable = coerce_to_runnable(runnable)
+        self.workers = workers or QUOTA_CONFIG["max_concurrent_requests"]
+        self.queue_size = queue_size or 2 * self.workers
+        self.completed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.queue_wait = 0.0
+
+
+class StagedPipeline:
+    """
+    Executa uma sequência de etapas sobre um fluxo de itens, com as etapas
+    trabalhando em paralelo (cada uma em itens diferentes).
+    """
+
+    def __init__(self, stages: List[Any], return_exceptions: bool = False):
+        """
+        Args:
+            stages (list): Stages, pares (nome, runnable) ou runnables
+            return_exceptions (bool): Devolve o erro como resultado do item em
+                vez de interromper o pipeline
+        """
+        self.stages = [self._as_stage(i, stage) for i, stage in enumerate(stages)]
+        if not self.stages:
+            raise ValueError("Informe pelo menos uma etapa")
+        self.return_exceptions = return_exceptions
+        self.items = 0
+        self.elapsed = 0.0
+        self.latencies: deque = deque(maxlen=1000)
+
+    @staticmethod
+    def _as_stage(index: int, stage: Any) -> Stage:
+        if isinstance(stage, Stage):
+            return stage
+        if isinstance(stage, tuple) and len(stage) == 2 and isinstance(stage[0], str):
+            return Stage(stage[0], stage[1])
+        return Stage(f"etapa_{index + 1}", stage)
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    async def _produce(self, inputs: Iterable[Any], queue: asyncio.Queue):
+        index = 0
+        if hasattr(inputs, "__aiter__"):
+            async for value in inputs:
+                await queue.put((index, value, time.monotonic(), time.perf_counter()))
+                index += 1
+        elif isinstance(inputs, (list, tuple)):
+            for value in inputs:
+                await queue.put((index, value, time.monotonic(), time.perf_counter()))
+                index += 1
+        else:
+            iterator = iter(inputs)
+            while True:
+                # Geradores (ex.: leitura de arquivo) são lidos fora do event loop
+                value = await asyncio.to_thread(next, iterator, _DONE)
+                if value is _DONE:
+                    break
+                await queue.put((index, value, time.monotonic(), time.perf_counter()))
+                index += 1
+
+        # Fim da entrada só em término normal: com erro em alguma etapa, o
+        # TaskGroup cancela todos os workers, e um put esperando uma fila
+        # cheia dentro do cancelamento travaria o pipeline
+        for _ in range(self.stages[0].workers):
+            await queue.put(_DONE)
+
+    async def _work(self, position: int, queues: List[asyncio.Queue], remaining: List[int]):
+        stage = self.stages[position]
+        inbox, outbox = queues[position], queues[position + 1]
+        while (item := await inbox.get()) is not _DONE:
+            index, value, enqueued_at, started_at = item
+            stage.queue_wait += time.monotonic() - enqueued_at
+            if not isinstance(value, _Failure):
+                start = time.perf_counter()
+                try:
+                    with TELEMETRY.span(stage.name, item=index):
+                        value = await stage.runnable.ainvoke(value)
+                    stage.completed += 1
+                except Exception as e:
+                    stage.failed += 1
+                    if not self.return_exceptions:
+                        raise
+                    value = _Failure(e)
+                finally:
+                    stage.busy_time += time.perf_counter() - start
+            await outbox.put((index, value, time.monotonic(), started_at))
+
+        # O último worker da etapa encerra os workers da próxima (só em término
+        # normal; um erro sai do laço por exceção e o TaskGroup cancela o resto)
+        remaining[position] -= 1
+        if remaining[position] == 0:
+            next_workers = self.stages[position + 1].workers if position + 1 < len(self.stages) else 1
+            for _ in range(next_workers):
+                await outbox.put(_DONE)
+
+    async def astream(self, inputs: Iterable[Any], ordered: bool = True) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Processa os itens e gera (índice, resultado) de cada um.
+
+        Args:
+            inputs: Lista, gerador ou iterador assíncrono de entradas da 1ª etapa
+            ordered (bool): True = na ordem de entrada; False = conforme
+                os itens ficam prontos
+        """
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        # A saída não tem limite: quem consome é o próprio chamador
+        queues.append(asyncio.Queue())
+        output = queues[-1]
+        remaining = [stage.workers for stage in self.stages]
+
+        async def run_all():
+            try:
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(self._produce(inputs, queues[0]))
+                    for position, stage in enumerate(self.stages):
+                        for _ in range(stage.workers):
+                            group.create_task(self._work(position, queues, remaining))
+            except BaseException as e:
+                await output.put(e)
+                raise
+
+        start = time.perf_counter()
+        runner = asyncio.create_task(run_all())
+        pending: Dict[int, Any] = {}
+        next_index = 0
+        try:
+            while (item := await output.get()) is not _DONE:
+                if isinstance(item, BaseException):
+                    # Erro de uma etapa: repassa o primeiro erro do TaskGroup
+                    errors = getattr(item, "exceptions", None)
+                    raise errors[0] if errors else item
+                index, value, _, started_at = item
+                latency = time.perf_counter() - started_at
+                self.latencies.append(latency)
+                TELEMETRY.observe("pipeline_item_seconds", latency)
+                self.items += 1
+                result = value.error if isinstance(value, _Failure) else value
+                if not ordered:
+                    yield index, result
+                    continue
+                pending[index] = result
+                while next_index in pending:
+                    yield next_index, pending.pop(next_index)
+                    next_index += 1
+        finally:
+            self.elapsed += time.perf_counter() - start
+            if not runner.done():
+                runner.cancel()
+            try:
+                await runner
+            except BaseException:
+                pass
+
+    async def arun(self, inputs: Iterable[Any]) -> List[Any]:
+        """Processa todos os itens e retorna os resultados na ordem de entrada"""
+        return [result async for _, result in self.astream(inputs)]
+
+    def run(self, inputs: Iterable[Any]) -> List[Any]:
+        """Versão síncrona de arun"""
+        return asyncio.run(self.arun(inputs))
+
+    # ------------------------------------------------------------------
+    # Estatísticas
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Vazão do pipeline e, por etapa, itens, tempo ocupado e espera na fila"""
+        latencies = list(self.latencies)
+        return {
+            "items": self.items,
+            "elapsed": self.elapsed,
+            "items_per_minute": self.items / self.elapsed * 60.0 if self.elapsed else 0.0,
+            "avg_item_latency": sum(latencies) / len(latencies) if latencies else None,
+            "stages": {
+                stage.name: {
+                    "workers": stage.workers,
+                    "completed": stage.completed,
+                    "failed": stage.failed,
+                    "avg_latency": stage.busy_time / (stage.completed + stage.failed)
+                    if stage.completed + stage.failed else None,
+                    "avg_queue_wait": stage.queue_wait / (stage.completed + stage.failed)
+                    if stage.completed + stage.failed else None,
+                }
+                for stage in self.stages
+            },
+        }
@@ -0,0 +1,609 @@
+"""
+CONTROLE DE QUOTA PARA O GEMINI
+================================
+
+Este módulo concentra a configuração de quota e os limitadores usados
+pelo RateLimitedModel (utils_gemini.py).
+
+Em vez de espaçar as chamadas com um sleep fixo, cada janela de quota
+(minuto, hora, dia) vira um token bucket. Uma requisição só precisa
+esperar quando algum bucket está vazio, então várias requisições podem
+ficar em andamento ao mesmo tempo enquanto houver orçamento.
+
+Como usar:
+from quota_gemini import QuotaLimiter
+
+limiter = QuotaLimiter.from_config()
+limiter.acquire()          # código síncrono
+await limiter.aacquire()   # código assíncrono
+"""
+
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+# ============================================================================
+# CONFIGURAÇÕES DE QUOTA
+# ============================================================================
+
+QUOTA_CONFIG = {
+    "requests_per_minute": 15,
+    "requests_per_hour": 900,  # 15 * 60
+    "requests_per_day": 21600,  # 15 * 60 * 24
+    "tokens_per_minute": 250000,
+    "expected_output_tokens": 256,      # reservados por requisição até o uso real chegar
+
+    # Delays recomendados
+    "min_delay_between_requests": 4.5,  # segundos
+    "delay_between_batches": 10.0,      # segundos
+    "backoff_on_quota_error": 60,       # segundos
+
+    # Tamanhos de lote otimizados
+    "optimal_batch_size": 3,
+    # Requisições em andamento ao mesmo tempo (padrão de batch/abatch, do
+    # pipeline em estágios, da fase map e do agendador). Era 1 quando as
+    # chamadas eram espaçadas por um sleep fixo; com os token buckets o ritmo
+    # vem do limitador, e a concorrência só sobrepõe a latência das chamadas
+    # sem passar da quota. Use 1 para voltar às chamadas uma a uma.
+    "max_concurrent_requests": 8,
+
+    # Quantas requisições podem sair de uma vez com o bucket do minuto cheio
+    "burst_size": 3,
+
+    # Acelera o relógio das janelas (só para simulações; veja benchmark_gemini.py)
+    "time_scale": 1.0,
+
+    # Controle adaptativo em erros de quota
+    "initial_backoff": 5.0,             # segundos, quando o servidor não sugere um valor
+    "max_retries_on_quota_error": 5,
+    "circuit_failure_threshold": 5,     # falhas seguidas até abrir o circuito
+    "circuit_reset_timeout": 60.0,      # segundos com o circuito aberto
+}
+
+# Limites de cada modelo no plano gratuito, aplicados sobre QUOTA_CONFIG.
+# Modelos fora desta tabela usam QUOTA_CONFIG (os limites do flash-lite)
+MODEL_QUOTAS = {
+    "gemini-2.5-flash": {"requests_per_minute": 10, "requests_per_hour": 600, "requests_per_day": 250},
+    "gemini-2.5-pro": {"requests_per_minute": 5, "requests_per_hour": 300, "requests_per_day": 100},
+}
+
+# ============================================================================
+# TOKEN BUCKET
+# ============================================================================
+
+class TokenBucket:
+    """
+    Token bucket clássico: enche a `rate` tokens por segundo até `capacity`.
+
+    O saldo pode ficar negativo: quem reserva além do disponível recebe o
+    tempo de espera correspondente. Assim as requisições são atendidas em
+    ordem de chegada, sem corrida entre quem acorda primeiro.
+    """
+
+    def __init__(self, capacity: float, rate: float, name: str = ""):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.name = name
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        """Segundos até existirem `n` tokens (sem consumir)"""
+        self._refill(now)
+        missing = n - self.tokens
+        return max(0.0, missing / self.rate) if missing > 0 else 0.0
+
+    def consume(self, n: float, now: float):
+        self._refill(now)
+        self.tokens -= n
+
+    def refund(self, n: float):
+        self.tokens = min(self.capacity, self.tokens + n)
+
+    def set_rate(self, rate: float):
+        self._refill(time.monotonic())
+        self.rate = rate
+
+
+class QuotaLimiter:
+    """
+    Combina vários token buckets (minuto, hora, dia) em um único limitador.
+
+    A reserva é atômica em todos os buckets e devolve quanto tempo o
+    chamador precisa esperar. A mesma instância pode ser compartilhada
+    entre threads e corrotinas.
+
+    Além dos buckets, cada janela guarda o horário das últimas `limit`
+    reservas: uma nova só sai `window` segundos depois da mais antiga delas.
+    Isso impede que o burst do bucket mais a taxa de reposição passem do
+    limite em qualquer janela de 60 s (o que o servidor conta como 429).
+
+    Com `token_bucket`, cada reserva também informa quantos tokens a
+    requisição deve gastar (TPM); ela espera pelo orçamento que acabar
+    primeiro, requisições ou tokens.
+    """
+
+    def __init__(self, buckets: List[TokenBucket], windows: Optional[List[tuple]] = None,
+                 window_margin: float = 0.02, token_bucket: Optional[TokenBucket] = None):
+        """
+        Args:
+            buckets (list): Token buckets a respeitar
+            windows (list): Pares (limite, segundos) de janelas deslizantes rígidas
+            window_margin (float): Folga, em fração da janela, para absorver
+                atrasos de rede entre o envio e a contagem no servidor
+            token_bucket (TokenBucket): Bucket de tokens por minuto (opcional)
+        """
+        self.buckets = buckets
+        self.token_bucket = token_bucket
+        self.windows = [(int(limit), float(seconds) * (1 + window_margin), deque(maxlen=int(limit)))
+                        for limit, seconds in windows or []]
+        self._lock = threading.Lock()
+        self._prepaid = threading.local()
+        self.total_wait_time = 0.0
+        self.total_acquired = 0
+        self.total_tokens = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> "QuotaLimiter":
+        """Cria o limitador a partir de um dicionário no formato de QUOTA_CONFIG"""
+        config = {**QUOTA_CONFIG, **(config or {})}
+        minute = 60.0 / config.get("time_scale", 1.0)
+        rpm = config["requests_per_minute"]
+        burst = max(1, min(config.get("burst_size", 1), rpm))
+        buckets = [TokenBucket(burst, rpm / minute, "minute")]
+        windows = [(rpm, minute)]
+        if config.get("requests_per_hour"):
+            rph = config["requests_per_hour"]
+            buckets.append(TokenBucket(rph, rph / (60 * minute), "hour"))
+            windows.append((rph, 60 * minute))
+        if config.get("requests_per_day"):
+            rpd = config["requests_per_day"]
+            buckets.append(TokenBucket(rpd, rpd / (1440 * minute), "day"))
+            windows.append((rpd, 1440 * minute))
+        token_bucket = None
+        if config.get("tokens_per_minute"):
+            tpm = config["tokens_per_minute"]
+            token_bucket = TokenBucket(tpm, tpm / minute, "tokens")
+        return cls(buckets, windows, token_bucket=token_bucket)
+
+    @classmethod
+    def for_model(cls, model_name: str) -> "QuotaLimiter":
+        """Limitador com os limites do modelo (MODEL_QUOTAS sobre QUOTA_CONFIG)"""
+        return cls.from_config(MODEL_QUOTAS.get(model_name))
+
+    @property
+    def min_interval(self) -> float:
+        """Intervalo médio entre requisições imposto pelo bucket mais restritivo"""
+        return max(1.0 / b.rate for b in self.buckets)
+
+    def _bucket_wait(self, n: float, tokens: float, now: float) -> float:
+        wait = max(b.wait_time(n, now) for b in self.buckets)
+        if self.token_bucket is not None and tokens:
+            wait = max(wait, self.token_bucket.wait_time(min(tokens, self.token_bucket.capacity), now))
+        return wait
+
+    def peek_wait(self, n: float = 1, tokens: float = 0) -> float:
+        """Segundos de espera que uma reserva de `n` teria agora (sem reservar)"""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._bucket_wait(n, tokens, now)
+            for limit, seconds, log in self.windows:
+                if len(log) == limit:
+                    wait = max(wait, log[0] + seconds - now)
+            return wait
+
+    def reserve(self, n: float = 1, tokens: float = 0) -> float:
+        """
+        Reserva `n` requisições (e `tokens` tokens, se houver bucket de TPM).
+
+        Returns:
+            float: Segundos que o chamador deve esperar antes de enviar
+        """
+        credit = getattr(self._prepaid, "credit", None)
+        if credit is not None:
+            # Já reservado por quem chamou (veja prepaid): só corrige os tokens
+            self._prepaid.credit = None
+            self.adjust_tokens(tokens - credit[1])
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            wait = self._bucket_wait(n, tokens, now)
+            start = now + wait
+            for limit, seconds, log in self.windows:
+                if len(log) == limit:
+                    start = max(start, log[0] + seconds)
+            for _, _, log in self.windows:
+                for _ in range(int(n)):
+                    log.append(start)
+            wait = start - now
+            for b in self.buckets:
+                b.consume(n, now)
+            if self.token_bucket is not None and tokens:
+                self.token_bucket.consume(tokens, now)
+            self.total_wait_time += wait
+            self.total_acquired += n
+            self.total_tokens += tokens
+            return wait
+
+    def refund(self, n: float = 1, tokens: float = 0):
+        """Devolve tokens de uma reserva que não chegou a ser usada"""
+        with self._lock:
+            for b in self.buckets:
+                b.refund(n)
+            if self.token_bucket is not None and tokens:
+                self.token_bucket.refund(tokens)
+            self.total_acquired -= n
+            self.total_tokens -= tokens
+
+    @contextmanager
+    def prepaid(self, n: float = 1, tokens: float = 0):
+        """
+        Marca uma reserva já feita (com reserve) para o thread atual.
+
+        A próxima chamada a reserve neste thread usa esse crédito em vez de
+        reservar de novo. Se ninguém usar o crédito (ex.: resposta veio do
+        cache), a reserva é devolvida ao sair do bloco.
+        """
+        self._prepaid.credit = (n, tokens)
+        try:
+            yield
+        finally:
+            credit, self._prepaid.credit = getattr(self._prepaid, "credit", None), None
+            if credit is not None:
+                self.refund(*credit)
+
+    def adjust_tokens(self, delta: float):
+        """
+        Corrige a reserva de tokens com o uso real informado pelo modelo
+        (delta positivo consome mais, negativo devolve).
+        """
+        if self.token_bucket is None or not delta:
+            return
+        with self._lock:
+            if delta > 0:
+                self.token_bucket.consume(delta, time.monotonic())
+            else:
+                self.token_bucket.refund(-delta)
+            self.total_tokens += delta
+
+    def acquire(self, n: float = 1, tokens: float = 0) -> float:
+        """Reserva e bloqueia a thread até a requisição poder sair"""
+        wait = self.reserve(n, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, n: float = 1, tokens: float = 0) -> float:
+        """Reserva e suspende a corrotina até a requisição poder sair"""
+        wait = self.reserve(n, tokens)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund(n, tokens)
+                raise
+        return wait
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o saldo atual de cada bucket"""
+        with self._lock:
+            now = time.monotonic()
+            status = {}
+            for b in self.buckets + ([self.token_bucket] if self.token_bucket else []):
+                b._refill(now)
+                status[b.name] = {"tokens": b.tokens, "capacity": b.capacity}
+            status["total_tokens"] = self.total_tokens
+            status["total_wait_time"] = self.total_wait_time
+            status["total_acquired"] = self.total_acquired
+            return status
+
+
+# ============================================================================
+# JANELA DESLIZANTE
+# ============================================================================
+
+class SlidingWindowCounter:
+    """
+    Contador de janela deslizante com resolução de 1 segundo.
+
+    Só os segundos que tiveram eventos são guardados, em ordem, junto com o
+    total acumulado (soma de prefixos) até o fim de cada um. Assim:
+    - registrar e consultar o total são O(1) amortizado: ao avançar no
+      tempo só os segundos que saíram da janela são descartados, sem
+      percorrer os segundos vazios
+    - `time_until_available` acha com uma busca binária na soma de prefixos
+      o segundo que libera espaço suficiente, em O(log n) em vez de
+      percorrer a janela (86.400 passos na janela de um dia)
+
+    Diferente de uma janela fixa, não existe "reset": cada evento conta por
+    exatamente `window_seconds`.
+    """
+
+    def __init__(self, window_seconds: int, clock=time.time):
+        self.window = int(window_seconds)
+        self.clock = clock
+        self.current_second = int(math.floor(clock()))
+        self._seconds: List[int] = []      # segundos com eventos, do mais antigo ao mais novo
+        self._cumulative: List[int] = []   # eventos desde a criação até o fim de cada segundo
+        self._head = 0                     # primeiro segundo ainda dentro da janela
+        self._added = 0                    # eventos desde a criação
+        self._expired = 0                  # eventos que já saíram da janela
+
+    @property
+    def total(self) -> int:
+        return self._added - self._expired
+
+    def _advance(self, now: float):
+        second = int(math.floor(now))
+        if second <= self.current_second:
+            return
+        self.current_second = second
+        oldest_valid = second - self.window + 1
+        while self._head < len(self._seconds) and self._seconds[self._head] < oldest_valid:
+            self._expired = self._cumulative[self._head]
+            self._head += 1
+        # Descarta de vez os segundos expirados quando eles viram maioria
+        if self._head > 64 and 2 * self._head > len(self._seconds):
+            del self._seconds[:self._head]
+            del self._cumulative[:self._head]
+            self._head = 0
+
+    def add(self, amount: int = 1, now: Optional[float] = None):
+        now = self.clock() if now is None else now
+        self._advance(now)
+        self._added += amount
+        if len(self._seconds) > self._head and self._seconds[-1] == self.current_second:
+            self._cumulative[-1] = self._added
+        else:
+            self._seconds.append(self.current_second)
+            self._cumulative.append(self._added)
+
+    def count(self, now: Optional[float] = None) -> int:
+        """Total de eventos nos últimos `window_seconds` segundos"""
+        self._advance(self.clock() if now is None else now)
+        return self.total
+
+    def time_until_available(self, n: int, limit: int, now: Optional[float] = None) -> float:
+        """
+        Segundos até que mais `n` eventos caibam no limite.
+
+        Com a soma de prefixos, o primeiro segundo cuja expiração libera o
+        excesso é achado por busca binária.
+        """
+        now = self.clock() if now is None else now
+        self._advance(now)
+        excess = self.total + n - limit
+        if excess <= 0:
+            return 0.0
+        if n > limit:
+            return math.inf
+        position = bisect_left(self._cumulative, self._expired + excess, self._head)
+        if position == len(self._seconds):
+            return float(self.window)
+        # O segundo `s` sai da janela quando ela chega a s + window
+        return max(0.0, self._seconds[position] + self.window - now)
+
+
+# ============================================================================
+# CONTROLE ADAPTATIVO (AIMD) E CIRCUIT BREAKER
+# ============================================================================
+
+_RETRY_PATTERNS = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)", re.IGNORECASE),
+    re.compile(r"retry\s*delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE),
+    re.compile(r"retry\s+in\s+(\d+(?:\.\d+)?)\s*(?:s|sec|seconds)\b", re.IGNORECASE),
+    re.compile(r"retry-after['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)", re.IGNORECASE),
+]
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Identifica erros de quota (429 / RESOURCE_EXHAUSTED)"""
+    message = str(error).lower()
+    return "quota" in message or "429" in message or "resource_exhausted" in message
+
+
+def parse_retry_delay(error: Exception) -> Optional[float]:
+    """
+    Extrai do erro o tempo de espera sugerido pelo servidor, se houver.
+
+    Reconhece o campo `retry_delay { seconds: N }` da API do Gemini,
+    mensagens "Please retry in Ns" e cabeçalhos Retry-After.
+    """
+    retry_after = getattr(error, "retry_after", None)
+    if isinstance(retry_after, (int, float)):
+        return float(retry_after)
+    message = str(error)
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class CircuitOpenError(Exception):
+    """Lançada quando o circuit breaker está aberto e a chamada foi recusada"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Circuito aberto por erros de quota; tente novamente em {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker com três estados:
+    - closed: chamadas passam normalmente
+    - open: após `failure_threshold` falhas seguidas, recusa chamadas por
+      `reset_timeout` segundos (o chamador pode falhar rápido ou usar fallback)
+    - half_open: depois do timeout deixa passar uma chamada de teste; sucesso
+      fecha o circuito, falha abre de novo
+
+    Use `guard()` em volta de cada tentativa: ele garante que a chamada de
+    teste seja resolvida em qualquer saída (erro que não é de quota,
+    cancelamento, KeyboardInterrupt), senão o circuito ficaria preso em
+    half_open recusando todas as chamadas.
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        self.failure_threshold = failure_threshold or QUOTA_CONFIG["circuit_failure_threshold"]
+        self.reset_timeout = reset_timeout or QUOTA_CONFIG["circuit_reset_timeout"]
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        """Segundos até o circuito aceitar a próxima chamada"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and self.retry_in() == 0:
+                self.state = "half_open"
+                return True
+            return self.state == "closed"
+
+    def check(self) -> bool:
+        """
+        Lança CircuitOpenError se a chamada não pode passar.
+
+        Returns:
+            bool: True se esta chamada é a chamada de teste do half_open
+        """
+        with self._lock:
+            if self.state == "open" and self.retry_in() == 0:
+                self.state = "half_open"
+                return True
+            if self.state != "closed":
+                raise CircuitOpenError(self.retry_in())
+            return False
+
+    def end_trial(self, answered: bool):
+        """
+        Resolve a chamada de teste, se record_success/record_failure ainda
+        não resolveram.
+
+        Args:
+            answered (bool): O servidor respondeu (mesmo com um erro que não é
+                de quota): fecha o circuito. Caso contrário (cancelamento,
+                interrupção) o circuito volta a open, e como `opened_at` não
+                muda a próxima chamada já é a nova chamada de teste.
+        """
+        with self._lock:
+            if self.state != "half_open":
+                return
+            if answered:
+                self.failures = 0
+                self.state = "closed"
+            else:
+                self.state = "open"
+
+    @contextmanager
+    def guard(self):
+        """
+        Envolve uma tentativa de chamada: check() na entrada e end_trial()
+        em qualquer saída, se a tentativa era a chamada de teste.
+        """
+        trial = self.check()
+        answered = False
+        try:
+            yield
+            answered = True
+        except Exception:
+            answered = True
+            raise
+        finally:
+            if trial:
+                self.end_trial(answered)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"🔌 Circuito aberto por {self.reset_timeout:.0f}s após {self.failures} falhas")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class AdaptiveRateController:
+    """
+    Ajusta a taxa do bucket do minuto com AIMD:
+    - erro de quota: taxa multiplicada por `decrease_factor`
+    - sucesso: taxa aumenta `increase_fraction` da taxa configurada, até ela
+
+    O tempo de espera após um 429 usa a sugestão do servidor quando ela
+    existe; senão, backoff exponencial a partir de QUOTA_CONFIG["initial_backoff"],
+    limitado por QUOTA_CONFIG["backoff_on_quota_error"].
+    """
+
+    def __init__(self, limiter: QuotaLimiter, decrease_factor: float = 0.5,
+                 increase_fraction: float = 1 / 15, min_fraction: float = 0.1):
+        """
+        Args:
+            limiter (QuotaLimiter): Limitador cujo primeiro bucket (minuto) é ajustado
+            decrease_factor (float): Fator aplicado à taxa em cada erro de quota
+            increase_fraction (float): Fração da taxa configurada somada a cada
+                sucesso (1/15 = +1 req/min com a quota de 15 RPM)
+            min_fraction (float): Fração mínima da taxa configurada
+        """
+        self.limiter = limiter
+        self.bucket = limiter.buckets[0]
+        self.max_rate = self.bucket.rate
+        self.min_rate = self.max_rate * min_fraction
+        self.decrease_factor = decrease_factor
+        self.increase_step = self.max_rate * increase_fraction
+        self.consecutive_failures = 0
+        self.last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def requests_per_minute(self) -> float:
+        return self.bucket.rate * 60.0 / QUOTA_CONFIG.get("time_scale", 1.0)
+
+    def on_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.bucket.rate < self.max_rate:
+                self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.increase_step))
+
+    def on_quota_error(self, error: Exception = None) -> float:
+        """
+        Reduz a taxa e calcula quanto esperar antes de tentar de novo.
+
+        Returns:
+            float: Segundos de espera
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            # Vários 429 da mesma rajada contam como um único evento: só reduz
+            # de novo depois de um intervalo da taxa atual
+            now = time.monotonic()
+            if now - self.last_decrease >= 1.0 / self.bucket.rate:
+                self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.decrease_factor))
+                self.last_decrease = now
+            hint = parse_retry_delay(error) if error is not None else None
+            if hint is not None:
+                return hint
+            backoff = QUOTA_CONFIG["initial_backoff"] * (2 ** (self.consecutive_failures - 1))
+            backoff = min(backoff, QUOTA_CONFIG["backoff_on_quota_error"])
+            return backoff * random.uniform(1.0, 1.1)
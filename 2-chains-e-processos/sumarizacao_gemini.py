@@ -0,0 +1,563 @@
+"""
+MOTOR DE SUMARIZAÇÃO MAP-REDUCE
+================================
+
+Sumariza documentos longos em duas fases:
+- map: cada chunk é resumido separadamente, com vários chunks em
+  andamento ao mesmo tempo (limitado por `max_concurrency` e pela quota
+  do RateLimitedModel). Com um NearDuplicateIndex, chunks quase iguais a
+  outros já resumidos reaproveitam o resumo em vez de chamar o modelo.
+  Com `prefilter` (ex.: ExtractiveSummarizer().compress), cada chunk é
+  encolhido localmente antes de ir para o modelo.
+  Os chunks podem vir de um gerador (ex.: ingestao_gemini.iter_chunks):
+  nesse caso são consumidos por uma fila limitada, sem materializar a lista
+- reduce: os resumos parciais são combinados em um único resumo. Se eles
+  não couberem em `token_budget`, são agrupados e reduzidos nível a nível
+  (cada nível em paralelo) até caberem em uma única chamada final.
+  Com `on_token`, a chamada final é feita em streaming e cada pedaço do
+  resumo é entregue assim que chega
+
+O IncrementalSummarizer guarda os resumos de cada chunk e de cada nó do
+reduce por hash de conteúdo (árvore de Merkle): ao reenviar um documento
+editado, só os chunks alterados e os nós acima deles são refeitos.
+
+Como usar:
+from sumarizacao_gemini import MapReduceSummarizer
+from utils_gemini import RateLimitedModel
+
+summarizer = MapReduceSummarizer(RateLimitedModel())
+result = summarizer.summarize(chunks)
+print(result["summary"])
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import PromptTemplate
+from quota_gemini import QUOTA_CONFIG
+from tokens_gemini import DEFAULT_ESTIMATOR
+from telemetria_gemini import TELEMETRY
+
+DEFAULT_MAP_PROMPT = PromptTemplate.from_template("Write a concise summary of the following text:\n {context}")
+DEFAULT_REDUCE_PROMPT = PromptTemplate.from_template("Combine the following summaries into a single concise summary:\n {context}")
+DEFAULT_TOKEN_BUDGET = 4000
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa local de tokens (veja tokens_gemini.TokenEstimator)"""
+    return DEFAULT_ESTIMATOR.estimate(text)
+
+
+def chunk_text(chunk: Any) -> str:
+    """Aceita Documents do LangChain ou strings"""
+    return chunk.page_content if hasattr(chunk, "page_content") else str(chunk)
+
+
+def result_text(result: Any) -> str:
+    """Extrai o texto da resposta do modelo"""
+    return result.content if hasattr(result, "content") else str(result)
+
+
+class MapReduceSummarizer:
+    """
+    Sumarização map-reduce com fase map concorrente.
+
+    O modelo precisa expor `ainvoke` (por exemplo, RateLimitedModel).
+    A quota continua sendo respeitada pelo limitador do modelo; aqui só
+    controlamos quantos chunks ficam em andamento ao mesmo tempo.
+    """
+
+    # Espera antes de tentar de novo um passo adiado (veja _run_map)
+    poll_interval = 0.5
+
+    def __init__(self, model, map_prompt: Optional[PromptTemplate] = None,
+                 reduce_prompt: Optional[PromptTemplate] = None,
+                 max_concurrency: Optional[int] = None,
+                 collapse_prompt: Optional[PromptTemplate] = None,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 near_duplicates=None,
+                 queue_size: Optional[int] = None,
+                 prefilter: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            model: Modelo com `ainvoke` (ex.: RateLimitedModel)
+            map_prompt (PromptTemplate): Prompt da fase map, com a variável {context}
+            reduce_prompt (PromptTemplate): Prompt da fase reduce, com a variável {context}
+            max_concurrency (int): Máximo de chunks em andamento
+                (padrão: QUOTA_CONFIG["max_concurrent_requests"])
+            collapse_prompt (PromptTemplate): Prompt dos níveis intermediários
+                do reduce (padrão: o mesmo do reduce)
+            token_budget (int): Tamanho máximo, em tokens estimados, de um
+                prompt de reduce
+            near_duplicates (NearDuplicateIndex): Índice de resumos da fase map
+                para reaproveitar em chunks quase duplicados (um índice por map_prompt)
+            queue_size (int): Chunks lidos à frente quando os chunks vêm de um
+                gerador (padrão: 2 * max_concurrency)
+            prefilter (callable): Função texto -> texto aplicada a cada chunk
+                antes da fase map, para reduzir os tokens enviados
+        """
+        self.model = model
+        self.map_prompt = map_prompt or DEFAULT_MAP_PROMPT
+        self.reduce_prompt = reduce_prompt or DEFAULT_REDUCE_PROMPT
+        self.collapse_prompt = collapse_prompt or self.reduce_prompt
+        self.max_concurrency = max_concurrency or QUOTA_CONFIG["max_concurrent_requests"]
+        self.token_budget = token_budget
+        self.near_duplicates = near_duplicates
+        self.queue_size = queue_size or 2 * self.max_concurrency
+        self.prefilter = prefilter
+        self.reduce_levels = 0
+
+    async def _map_one(self, index: int, chunk: Any, semaphore: asyncio.Semaphore,
+                       total: Optional[int], claim=None) -> Optional[Dict[str, Any]]:
+        """
+        Resume um chunk.
+
+        `claim` (corrotina opcional) é chamada já com a vaga do semáforo; se
+        devolver False, o chunk não é resumido e o resultado é None.
+        """
+        text = chunk_text(chunk)
+        position = f"{index + 1}/{total}" if total else f"{index + 1}"
+        if self.near_duplicates is not None:
+            match = self.near_duplicates.query(text)
+            if match is not None:
+                print(f"♻️  Chunk {position} reaproveitado (similaridade {match['similarity']:.0%})")
+                return {"index": index, "summary": match["value"], "latency": 0.0, "reused": True}
+        async with semaphore:
+            if claim is not None and not await claim():
+                return None
+            start = time.perf_counter()
+            with TELEMETRY.span("map", chunk=index):
+                context = self.prefilter(text) if self.prefilter is not None else text
+                prompt = self.map_prompt.format(context=context)
+                summary = result_text(await self.model.ainvoke(prompt))
+            latency = time.perf_counter() - start
+        if self.near_duplicates is not None:
+            self.near_duplicates.add(text, summary)
+        print(f"✅ Chunk {position} processado: {len(summary)} caracteres em {latency:.1f}s")
+        return {"index": index, "summary": summary, "latency": latency, "reused": False}
+
+    async def _run_map(self, chunks: Iterable[Any], map_fn) -> List[Dict[str, Any]]:
+        """
+        Aplica `map_fn(index, chunk, semaphore, total)` a todos os chunks.
+
+        Listas são disparadas de uma vez; iteradores são lidos por um
+        produtor que para quando a fila de `queue_size` chunks enche
+        (backpressure), então o gerador nunca corre muito à frente do modelo.
+
+        `map_fn` pode devolver None para adiar o chunk (ex.: reservado por
+        outro worker): ele volta para o fim da fila e é tentado de novo
+        depois dos outros.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        if isinstance(chunks, (list, tuple)):
+            total = len(chunks)
+            return list(await asyncio.gather(
+                *(self._settle(lambda i=i, chunk=chunk: map_fn(i, chunk, semaphore, total))
+                  for i, chunk in enumerate(chunks))
+            ))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        results: List[Dict[str, Any]] = []
+        deferred: deque = deque()
+        done = object()
+
+        async def produce():
+            iterator = iter(chunks)
+            index = 0
+            while True:
+                # A leitura do arquivo acontece fora do event loop
+                chunk = await asyncio.to_thread(next, iterator, done)
+                if chunk is done:
+                    break
+                await queue.put((index, chunk))
+                index += 1
+            # Só em término normal: se um chunk falhar, o TaskGroup cancela os
+            # consumidores, e um put esperando a fila cheia travaria o map
+            for _ in range(self.max_concurrency):
+                await queue.put(None)
+
+        async def consume():
+            while (item := await queue.get()) is not None:
+                result = await map_fn(item[0], item[1], semaphore, None)
+                if result is None:
+                    # Segue para os próximos chunks; este é tentado no fim
+                    deferred.append(item)
+                else:
+                    results.append(result)
+            while deferred:
+                item = deferred.popleft()
+                result = await map_fn(item[0], item[1], semaphore, None)
+                if result is None:
+                    deferred.append(item)
+                    await asyncio.sleep(self.poll_interval)
+                else:
+                    results.append(result)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce())
+                for _ in range(self.max_concurrency):
+                    group.create_task(consume())
+        except BaseExceptionGroup as e:
+            # Repassa o erro do chunk, como no caminho de listas (gather)
+            raise e.exceptions[0]
+        return sorted(results, key=lambda r: r["index"])
+
+    async def _settle(self, step):
+        """
+        Executa `step()` até ele devolver um resultado.
+
+        Entre as tentativas a vaga do semáforo fica livre, e a nova espera
+        entra no fim da fila do semáforo, atrás dos outros passos.
+        """
+        while (result := await step()) is None:
+            await asyncio.sleep(self.poll_interval)
+        return result
+
+    async def amap(self, chunks: Iterable[Any]) -> List[Dict[str, Any]]:
+        """
+        Resume todos os chunks em paralelo.
+
+        Args:
+            chunks: Lista de chunks ou gerador (consumido aos poucos)
+
+        Returns:
+            list: Um dicionário por chunk ({"index", "summary", "latency",
+                "reused"}), na mesma ordem dos chunks
+        """
+        return await self._run_map(chunks, self._map_one)
+
+    def _prompt_tokens(self, prompt: PromptTemplate, summaries: List[str]) -> int:
+        return DEFAULT_ESTIMATOR.estimate_template(prompt, context="\n".join(summaries))
+
+    def group_summaries(self, summaries: List[str]) -> List[List[str]]:
+        """
+        Agrupa resumos consecutivos sem passar de `token_budget`.
+
+        Cada grupo tem pelo menos dois resumos (quando possível), mesmo que
+        isso estoure o orçamento, para que todo nível diminua a lista.
+        """
+        overhead = self._prompt_tokens(self.collapse_prompt, [])
+        groups: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = overhead
+        for summary in summaries:
+            tokens = estimate_tokens(summary) + 1
+            if len(current) >= 2 and current_tokens + tokens > self.token_budget:
+                groups.append(current)
+                current, current_tokens = [], overhead
+            current.append(summary)
+            current_tokens += tokens
+        if current:
+            if len(current) == 1 and groups:
+                groups[-1].append(current[0])
+            else:
+                groups.append(current)
+        return groups
+
+    async def _collapse_group(self, group: List[str], semaphore: asyncio.Semaphore) -> str:
+        async with semaphore:
+            with TELEMETRY.span("collapse", size=len(group)):
+                prompt = self.collapse_prompt.format(context="\n".join(group))
+                return result_text(await self.model.ainvoke(prompt))
+
+    async def acollapse(self, summaries: List[str]) -> List[str]:
+        """
+        Reduz os resumos nível a nível até caberem no prompt final.
+
+        Os grupos de um mesmo nível são processados em paralelo, então a
+        profundidade sequencial é O(log n) chamadas.
+        """
+        self.reduce_levels = 0
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        while len(summaries) > 1 and self._prompt_tokens(self.reduce_prompt, summaries) > self.token_budget:
+            groups = self.group_summaries(summaries)
+            self.reduce_levels += 1
+            print(f"🌳 Nível {self.reduce_levels} do reduce: {len(summaries)} resumos em {len(groups)} grupos")
+            summaries = list(await asyncio.gather(*(self._collapse_group(g, semaphore) for g in groups)))
+        return summaries
+
+    async def areduce(self, summaries: List[str], on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Combina os resumos parciais em um único resumo.
+
+        Args:
+            summaries (list): Resumos parciais
+            on_token (callable): Se informado, a combinação final é feita em
+                streaming (model.astream) e cada pedaço de texto é passado a ele
+        """
+        summaries = await self.acollapse(summaries)
+        return await self._final_reduce(summaries, on_token)
+
+    async def _final_reduce(self, summaries: List[str], on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Chamada final do reduce, em streaming se houver `on_token`"""
+        prompt = self.reduce_prompt.format(context="\n".join(summaries))
+        with TELEMETRY.span("reduce", size=len(summaries)):
+            if on_token is None:
+                return result_text(await self.model.ainvoke(prompt))
+            parts = []
+            async for chunk in self.model.astream(prompt):
+                text = result_text(chunk)
+                parts.append(text)
+                on_token(text)
+            return "".join(parts)
+
+    async def asummarize(self, chunks: Iterable[Any], on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Executa map e reduce (veja areduce para `on_token`).
+
+        Tudo acontece dentro de um span "summarize" da telemetria, pai dos
+        spans de cada chamada de map, collapse e reduce.
+
+        Returns:
+            dict: "summary" (resumo final), "map_results" (resultados por chunk),
+                "reduce_levels" (níveis intermediários do reduce) e "elapsed"
+                (tempo total em segundos)
+        """
+        with TELEMETRY.span("summarize", summarizer=type(self).__name__):
+            return await self._asummarize(chunks, on_token)
+
+    async def _asummarize(self, chunks: Iterable[Any], on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        map_results = await self.amap(chunks)
+        print("\n🔄 Combinando sumários...")
+        summary = await self.areduce([r["summary"] for r in map_results], on_token)
+        return {
+            "summary": summary,
+            "map_results": map_results,
+            "reduce_levels": self.reduce_levels,
+            "elapsed": time.perf_counter() - start,
+        }
+
+    def summarize(self, chunks: Iterable[Any], on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Versão síncrona de asummarize (para scripts)"""
+        return asyncio.run(self.asummarize(chunks, on_token))
+
+
+# ============================================================================
+# RE-SUMARIZAÇÃO INCREMENTAL (ÁRVORE DE MERKLE)
+# ============================================================================
+
+def node_key(kind: str, template: Any, parts: List[str]) -> str:
+    """Digest de um nó: tipo + template do prompt + conteúdo (ou chaves dos filhos)"""
+    payload = json.dumps([kind, getattr(template, "template", str(template)), parts], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def prefilter_id(prefilter: Callable[[str], str]) -> str:
+    """Nome estável do pré-filtro, para as chaves das folhas (ex.: 'ExtractiveSummarizer.compress')"""
+    if isinstance(prefilter, functools.partial):
+        return f"{prefilter_id(prefilter.func)}{prefilter.args}{sorted(prefilter.keywords.items())}"
+    return getattr(prefilter, "__qualname__", type(prefilter).__qualname__)
+
+
+class IncrementalSummarizer(MapReduceSummarizer):
+    """
+    Map-reduce que só refaz o que mudou desde a última execução.
+
+    Cada chunk vira uma folha com chave = hash do seu conteúdo, e cada nó
+    do reduce tem chave = hash das chaves dos filhos (árvore de Merkle).
+    Os resumos ficam em `store` (ex.: ResponseCache) endereçados por essas
+    chaves, então ao reenviar um documento editado:
+    - só os chunks alterados passam pela fase map
+    - só os nós acima deles são reduzidos de novo
+
+    Os grupos de cada nível têm fronteiras definidas pelo conteúdo (pela
+    chave do nó), então inserir ou remover um chunk só muda os grupos
+    vizinhos em vez de deslocar todos os seguintes.
+
+    Com um JobJournal como `store`, cada passo concluído fica no diário
+    (com os hashes das entradas): um job interrompido retoma de onde parou
+    e vários workers podem dividir o mesmo job, cada um reservando os
+    passos que vai calcular. A reserva só é feita quando o passo já tem
+    vaga no semáforo e quota livre no modelo; um passo reservado por outro
+    worker vai para o fim da fila, e este worker segue com os próximos.
+    """
+
+    def __init__(self, model, store, fanout: int = 4, poll_interval: float = 0.5, **kwargs):
+        """
+        Args:
+            model: Modelo com `ainvoke` (ex.: RateLimitedModel)
+            store: Armazenamento com get(key)/set(key, message), como ResponseCache
+                ou JobJournal
+            fanout (int): Tamanho médio dos grupos de cada nível do reduce
+            poll_interval (float): Intervalo para tentar de novo um passo
+                reservado por outro worker
+            **kwargs: Demais argumentos de MapReduceSummarizer
+        """
+        super().__init__(model, **kwargs)
+        self.store = store
+        self.fanout = max(2, fanout)
+        self.poll_interval = poll_interval
+        self.nodes_reused = 0
+        self.nodes_computed = 0
+
+    def _stored(self, key: str) -> Optional[str]:
+        message = self.store.get(key)
+        return None if message is None else result_text(message)
+
+    def _remember(self, key: str, summary: str, kind: str, inputs: List[str]):
+        record = getattr(self.store, "record", None)
+        if record is not None:
+            record(key, summary, kind=kind, inputs=inputs)
+        else:
+            self.store.set(key, AIMessage(content=summary))
+
+    async def _claim(self, key: str) -> bool:
+        """
+        Reserva o nó para este worker (True se o `store` não tem reservas).
+
+        Chamada já com a vaga do semáforo: antes de reservar, espera a quota
+        do modelo ficar livre (sem consumi-la), para a reserva não envelhecer
+        parada no limitador.
+        """
+        claim = getattr(self.store, "claim", None)
+        if claim is None:
+            return True
+        limiter = getattr(self.model, "limiter", None)
+        if limiter is not None:
+            wait = limiter.peek_wait()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return claim(key)
+
+    async def _wait_or_claim(self, key: str) -> Optional[str]:
+        """
+        Resumo já calculado do nó, ou None se este worker deve calculá-lo.
+
+        Usado na raiz, que não tem outros passos para adiantar: se outro
+        worker reservou o nó, espera o resultado dele aparecer no `store`.
+        """
+        while True:
+            summary = self._stored(key)
+            if summary is not None:
+                return summary
+            if await self._claim(key):
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def _leaf(self, index: int, chunk: Any, semaphore: asyncio.Semaphore,
+                    total: Optional[int]) -> Optional[Dict[str, Any]]:
+        text = chunk_text(chunk)
+        # Com pré-filtro o modelo vê outro texto: o resumo não pode ser
+        # confundido com o de uma execução sem ele (ou com outro pré-filtro)
+        kind = "map" if self.prefilter is None else f"map+{prefilter_id(self.prefilter)}"
+        key = node_key(kind, self.map_prompt, [text])
+        summary = self._stored(key)
+        if summary is None:
+            result = await self._map_one(index, chunk, semaphore, total, claim=lambda: self._claim(key))
+            if result is not None:
+                self.nodes_computed += 1
+                self._remember(key, result["summary"], "map", [hashlib.sha256(text.encode("utf-8")).hexdigest()])
+                return {**result, "key": key}
+            summary = self._stored(key)
+            if summary is None:
+                # Reservado por outro worker: tenta de novo depois dos outros
+                return None
+        self.nodes_reused += 1
+        return {"index": index, "summary": summary, "latency": 0.0, "reused": True, "key": key}
+
+    def merkle_groups(self, nodes: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Agrupa nós consecutivos com fronteiras definidas pelo conteúdo.
+
+        Um grupo termina depois de um nó cuja chave é múltipla de `fanout`
+        (em média a cada `fanout` nós) ou quando o próximo nó estouraria
+        `token_budget`. Todo grupo tem pelo menos dois nós, quando possível.
+        """
+        overhead = self._prompt_tokens(self.collapse_prompt, [])
+        groups: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = overhead
+        for node in nodes:
+            tokens = estimate_tokens(node["summary"]) + 1
+            if len(current) >= 2 and current_tokens + tokens > self.token_budget:
+                groups.append(current)
+                current, current_tokens = [], overhead
+            current.append(node)
+            current_tokens += tokens
+            if len(current) >= 2 and int(node["key"][:8], 16) % self.fanout == 0:
+                groups.append(current)
+                current, current_tokens = [], overhead
+        if current:
+            if len(current) == 1 and groups:
+                groups[-1].append(current[0])
+            else:
+                groups.append(current)
+        return groups
+
+    async def _reduce_node(self, kind: str, prompt: PromptTemplate, children: List[Dict[str, Any]],
+                           semaphore: asyncio.Semaphore) -> Optional[Dict[str, Any]]:
+        inputs = [child["key"] for child in children]
+        key = node_key(kind, prompt, inputs)
+        summary = self._stored(key)
+        if summary is None:
+            async with semaphore:
+                if await self._claim(key):
+                    with TELEMETRY.span(kind, size=len(children)):
+                        context = "\n".join(child["summary"] for child in children)
+                        summary = result_text(await self.model.ainvoke(prompt.format(context=context)))
+                    self.nodes_computed += 1
+                    self._remember(key, summary, kind, inputs)
+                    return {"key": key, "summary": summary, "reused": False}
+            summary = self._stored(key)
+            if summary is None:
+                # Reservado por outro worker: tenta de novo depois dos outros
+                return None
+        self.nodes_reused += 1
+        return {"key": key, "summary": summary, "reused": True}
+
+    async def _asummarize(self, chunks: Iterable[Any], on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Igual a MapReduceSummarizer.asummarize, reaproveitando os nós guardados.
+
+        Returns:
+            dict: As chaves de asummarize, mais "root" (chave da raiz),
+                "nodes_reused" e "nodes_computed"
+        """
+        start = time.perf_counter()
+        self.nodes_reused = self.nodes_computed = 0
+        self.reduce_levels = 0
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        map_results = await self._run_map(chunks, self._leaf)
+
+        print("\n🔄 Combinando sumários...")
+        nodes = [{"key": r["key"], "summary": r["summary"]} for r in map_results]
+        while len(nodes) > 1 and self._prompt_tokens(self.reduce_prompt, [n["summary"] for n in nodes]) > self.token_budget:
+            groups = self.merkle_groups(nodes)
+            self.reduce_levels += 1
+            nodes = list(await asyncio.gather(
+                *(self._settle(lambda g=g: self._reduce_node("collapse", self.collapse_prompt, g, semaphore))
+                  for g in groups)
+            ))
+            reused = sum(n["reused"] for n in nodes)
+            print(f"🌳 Nível {self.reduce_levels} do reduce: {len(groups)} grupos, {reused} reaproveitados")
+
+        root_inputs = [n["key"] for n in nodes]
+        root_key = node_key("reduce", self.reduce_prompt, root_inputs)
+        summary = await self._wait_or_claim(root_key)
+        if summary is not None:
+            self.nodes_reused += 1
+            if on_token is not None:
+                on_token(summary)
+        else:
+            summary = await self._final_reduce([n["summary"] for n in nodes], on_token)
+            self.nodes_computed += 1
+            self._remember(root_key, summary, "reduce", root_inputs)
+
+        print(f"♻️  Nós reaproveitados: {self.nodes_reused}, recalculados: {self.nodes_computed}")
+        return {
+            "summary": summary,
+            "map_results": [{k: v for k, v in r.items() if k != "key"} for r in map_results],
+            "reduce_levels": self.reduce_levels,
+            "elapsed": time.perf_counter() - start,
+            "root": root_key,
+            "nodes_reused": self.nodes_reused,
+            "nodes_computed": self.nodes_computed,
+        }
@@ -0,0 +1,271 @@
+"""
+TELEMETRIA DE DESEMPENHO
+========================
+
+Mede para onde vai o tempo de cada chamada ao Gemini, separando:
+- espera no limitador de quota
+- tempo do modelo (rede + geração)
+- espera entre tentativas (backoff após 429)
+- tokens de entrada e saída
+
+As medidas ficam em histogramas com rótulos (ex.: por modelo e por etapa
+do pipeline). Trechos do código podem ser marcados com spans no estilo
+OpenTelemetry (trace_id, span_id, span pai), que se aninham sozinhos em
+threads e corrotinas via contextvars.
+
+Tudo pode ser exportado em formato texto do Prometheus ou em JSON.
+
+Como usar:
+from telemetria_gemini import TELEMETRY
+
+with TELEMETRY.span("minha_etapa", documento="a.txt"):
+    model.invoke("...")
+print(TELEMETRY.to_prometheus())
+TELEMETRY.export("metricas.json")
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+# Limites (segundos) dos buckets dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("gemini_current_span", default=None)
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantil estimado por interpolação linear dentro do bucket (limitado ao máximo visto)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= target and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return min(self.max, lower + (upper - lower) * (target - seen) / count)
+            seen += count
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class Span:
+    """Trecho medido de uma operação (nos moldes de um span do OpenTelemetry)"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Telemetry:
+    """
+    Registro de histogramas, contadores e spans.
+
+    Seguro para uso entre threads; uma instância global (TELEMETRY) é
+    usada por padrão pelos modelos, pelo sumarizador e pelo agendador.
+    """
+
+    def __init__(self, max_spans: int = 1000, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Args:
+            max_spans (int): Quantos spans concluídos guardar (os mais recentes)
+            buckets (tuple): Limites dos buckets dos histogramas
+        """
+        self.buckets = buckets
+        self.spans: deque = deque(maxlen=max_spans)
+        self._histograms: Dict[str, Dict[tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    def observe(self, name: str, value: float, **labels: Any):
+        """Registra um valor no histograma `name` com os rótulos dados"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels: Any):
+        """Soma `amount` ao contador `name`"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any):
+        """Mede a duração do bloco no histograma `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        """
+        Abre um span filho do span atual (ou a raiz de um novo trace).
+
+        A duração também vai para o histograma gemini_stage_seconds{stage=name}.
+        """
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set_attribute("error", type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self.spans.append(span)
+            self.observe("gemini_stage_seconds", span.duration, stage=name)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.spans.clear()
+
+    # ------------------------------------------------------------------
+    # Exportação
+    # ------------------------------------------------------------------
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def to_prometheus(self) -> str:
+        """Métricas no formato texto de exposição do Prometheus"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict[str, Any]:
+        """Métricas e spans recentes como dicionário serializável"""
+        with self._lock:
+            histograms = {
+                name: [{"labels": dict(key), **h.snapshot()} for key, h in sorted(series.items())]
+                for name, series in sorted(self._histograms.items())
+            }
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+        return {"histograms": histograms, "counters": counters, "spans": [s.to_dict() for s in list(self.spans)]}
+
+    def export(self, path: str):
+        """Grava em `path`: Prometheus se terminar em .prom, senão JSON"""
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_json(), indent=2)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def print_summary(self):
+        """Resumo legível dos histogramas (contagem, média e p95)"""
+        data = self.to_json()
+        print("📈 Telemetria:")
+        for name, series in data["histograms"].items():
+            for item in series:
+                labels = ", ".join(f"{k}={v}" for k, v in item["labels"].items())
+                print(f"   {name}{{{labels}}}: {item['count']} medições, "
+                      f"média {item['mean']:.3f}s, p95 {item['p95']:.3f}s")
+        for name, series in data["counters"].items():
+            for item in series:
+                labels = ", ".join(f"{k}={v}" for k, v in item["labels"].items())
+                print(f"   {name}{{{labels}}}: {item['value']:g}")
+
+
+# Instância compartilhada
+TELEMETRY = Telemetry()
@@ -0,0 +1,33 @@
+"""
+Configuração dos testes: os módulos *_gemini.py ficam no diretório pai e
+nenhum teste chama a API de verdade (a chave é falsa).
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "chave-falsa-dos-testes")
+
+
+def run_in_thread(function, timeout=10.0):
+    """
+    Roda `function` em uma thread; um travamento vira falha, não um teste preso.
+
+    Returns:
+        dict: {"result": ...} ou {"error": exceção}
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = function()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "a chamada travou"
+    return outcome
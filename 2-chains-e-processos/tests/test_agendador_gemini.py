@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agendador_gemini import PRIORITY_INTERACTIVE, DeadlineExceededError, RequestScheduler
+from quota_gemini import QuotaLimiter
+
+
+class EchoModel:
+    def invoke(self, prompt):
+        return AIMessage(content=f"modelo: {prompt}")
+
+
+class EchoFallback:
+    def invoke(self, prompt):
+        return AIMessage(content=prompt)
+
+
+def exhausted_limiter():
+    """Limitador sem capacidade nos próximos segundos"""
+    limiter = QuotaLimiter.from_config({"requests_per_minute": 1, "burst_size": 1,
+                                        "requests_per_hour": None, "requests_per_day": None,
+                                        "tokens_per_minute": None})
+    limiter.reserve(1)
+    return limiter
+
+
+def test_fallback_answer_is_marked_degraded():
+    with RequestScheduler(EchoModel(), limiter=exhausted_limiter(), fallback=EchoFallback()) as scheduler:
+        result = scheduler.submit("Pergunta?", priority=PRIORITY_INTERACTIVE, deadline=1).result(5)
+    assert result.content == "Pergunta?"
+    assert result.response_metadata["degraded"] is True
+    assert result.response_metadata["fallback"] == "EchoFallback"
+
+
+def test_missed_deadline_without_fallback_raises():
+    with RequestScheduler(EchoModel(), limiter=exhausted_limiter()) as scheduler:
+        future = scheduler.submit("Pergunta?", priority=PRIORITY_INTERACTIVE, deadline=1)
+        with pytest.raises(DeadlineExceededError):
+            future.result(5)
+
+
+def test_model_answer_is_not_marked():
+    limiter = QuotaLimiter.from_config({"requests_per_minute": 600, "burst_size": 5})
+    with RequestScheduler(EchoModel(), limiter=limiter, fallback=EchoFallback()) as scheduler:
+        result = scheduler.invoke("Pergunta?", deadline=5)
+    assert result.content == "modelo: Pergunta?"
+    assert "degraded" not in result.response_metadata
+
+
+def test_expired_request_behind_the_head_is_shed():
+    scheduler = RequestScheduler(EchoModel(), limiter=exhausted_limiter())
+    try:
+        # A cabeça da fila (interativa, sem prazo) espera a quota; a de lote
+        # atrás dela vence antes disso
+        scheduler.submit("Pergunta?", priority=PRIORITY_INTERACTIVE)
+        batch = scheduler.submit("Chunk", deadline=0.5)
+        with pytest.raises(DeadlineExceededError):
+            batch.result(5)
+        assert scheduler.get_stats()["queued"] == 1
+    finally:
+        scheduler.close(wait=False)
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+
+import pytest
+
+from cache_gemini import SingleFlight
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "resposta"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", call) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["resposta"] * 5
+    assert len(calls) == 1
+    assert flight.get_stats() == {"upstream_calls": 1, "calls_saved": 4}
+
+
+def test_followers_get_the_leader_error():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.02)
+        raise ValueError("erro do modelo")
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", call) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return f"resposta {len(calls)}"
+
+    async def main():
+        leader = asyncio.ensure_future(asyncio.wait_for(flight.ado("k", call), 0.02))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", call))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "resposta 2"
+    assert flight.get_stats() == {"upstream_calls": 2, "calls_saved": 0}
+
+
+def test_cancelled_follower_does_not_affect_the_others():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "resposta"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", call))
+        await asyncio.sleep(0)
+        impatient = asyncio.ensure_future(asyncio.wait_for(flight.ado("k", call), 0.01))
+        patient = asyncio.ensure_future(flight.ado("k", call))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        return await leader, await patient
+
+    assert asyncio.run(main()) == ("resposta", "resposta")
+
+
+def test_interrupted_thread_leader_hands_over():
+    flight = SingleFlight()
+    entered = threading.Event()
+    results = []
+
+    def interrupted():
+        entered.set()
+        threading.Event().wait(0.05)
+        raise KeyboardInterrupt
+
+    def leader():
+        try:
+            flight.do("k", interrupted)
+        except KeyboardInterrupt:
+            pass
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    entered.wait(1)
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", lambda: "resposta")))
+    follower.start()
+    thread.join(2)
+    follower.join(2)
+    assert results == ["resposta"]
+
+
+def test_cache_evicts_least_recently_used_entries():
+    from cache_gemini import ResponseCache
+
+    cache = ResponseCache(":memory:", max_entries=3)
+    for i in range(3):
+        cache.set(f"k{i}", f"resposta {i}")
+    cache.get("k0")
+    cache.set("k3", "resposta 3")
+    assert cache.get("k1") is None
+    assert [cache.get(k).content for k in ("k0", "k2", "k3")] == ["resposta 0", "resposta 2", "resposta 3"]
+    assert cache.get_stats()["entries"] == 3
+
+
+def test_cache_totals_follow_replacements_and_byte_limit():
+    from cache_gemini import ResponseCache
+
+    cache = ResponseCache(":memory:", max_entries=100, max_bytes=2000)
+    for _ in range(5):
+        cache.set("mesma", "x" * 100)
+    stats = cache.get_stats()
+    assert stats["entries"] == 1
+    assert (cache._count, cache._bytes) == (stats["entries"], stats["bytes"])
+    for i in range(20):
+        cache.set(f"k{i}", "y" * 200)
+    assert cache.get_stats()["bytes"] <= 2000
+    assert (cache._count, cache._bytes) == tuple(cache.get_stats()[k] for k in ("entries", "bytes"))
+
+
+def test_cache_set_does_not_scan_the_table_on_every_write():
+    from cache_gemini import ResponseCache
+
+    cache = ResponseCache(":memory:", sweep_every=50)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for i in range(100):
+        cache.set(f"k{i}", "resposta")
+    assert sum("COUNT(*)" in sql for sql in statements) == 2
+
+
+def test_cache_entries_expire():
+    from cache_gemini import ResponseCache
+
+    cache = ResponseCache(":memory:", ttl_seconds=0.01)
+    cache.set("k", "resposta")
+    threading.Event().wait(0.03)
+    assert cache.get("k") is None
+    assert cache._count == 0
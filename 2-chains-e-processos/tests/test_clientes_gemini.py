@@ -0,0 +1,11 @@
+import os
+
+from clientes_gemini import ClientRegistry
+
+
+def test_default_key_and_explicit_env_key_share_the_quota():
+    registry = ClientRegistry()
+    default = registry.quota("gemini-2.5-flash-lite")
+    explicit = registry.quota("gemini-2.5-flash-lite", os.environ["GOOGLE_API_KEY"])
+    assert default is explicit
+    assert registry.quota("gemini-2.5-flash-lite", "outra-chave") is not default
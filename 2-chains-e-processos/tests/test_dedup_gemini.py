@@ -0,0 +1,15 @@
+from dedup_gemini import NearDuplicateIndex
+
+
+def test_saved_index_loads_with_the_same_buckets(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = NearDuplicateIndex(max_bucket_size=3)
+    texts = [f"parágrafo de boilerplate repetido número {i % 7} com rodapé" for i in range(40)]
+    for i, text in enumerate(texts):
+        index.add(text, f"resumo {i}" if i % 2 else {"resumo": i})
+    index.save(path)
+
+    loaded = NearDuplicateIndex(max_bucket_size=3, path=path)
+    assert loaded._values == index._values
+    assert loaded._buckets == index._buckets
+    assert loaded.lookup(texts[5]) == index.lookup(texts[5])
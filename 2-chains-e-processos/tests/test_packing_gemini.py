@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from langchain_core.messages import AIMessage
+
+from packing_gemini import PromptPacker, build_packed_prompt, parse_packed_response
+
+
+class PackModel:
+    """Modelo falso: responde pacotes em JSON (ou texto inválido) e prompts avulsos direto"""
+
+    def __init__(self, valid_packs=True):
+        self.valid_packs = valid_packs
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if "### Request 1" not in prompt:
+            return AIMessage(content=f"avulso: {prompt}")
+        if not self.valid_packs:
+            return AIMessage(content="desculpe, não entendi")
+        count = prompt.count("### Request ")
+        return AIMessage(content=json.dumps([{"id": i, "answer": f"r{i}"} for i in range(1, count + 1)]))
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+
+def test_parse_packed_response_ignores_bad_ids():
+    text = '```json\n[{"id": 1, "answer": "a"}, {"id": 1, "answer": "b"}, {"id": 9, "answer": "c"}]\n```'
+    assert parse_packed_response(text, 2) == {0: "a"}
+
+
+def test_packs_are_answered_in_order():
+    model = PackModel()
+    packer = PromptPacker(model, pack_size=4)
+    results = packer.invoke_many([f"p{i}" for i in range(8)])
+    assert [r.content for r in results] == ["r1", "r2", "r3", "r4"] * 2
+    assert packer.get_stats()["requests_sent"] == 2
+
+
+def test_failed_pack_is_never_resent_unchanged():
+    model = PackModel(valid_packs=False)
+    packer = PromptPacker(model, pack_size=4, max_retries=2)
+    prompts = [f"p{i}" for i in range(6)]
+    results = packer.invoke_many(prompts)
+    assert [r.content for r in results] == [f"avulso: {p}" for p in prompts]
+    assert len(model.prompts) == len(set(model.prompts))
+    assert build_packed_prompt(prompts[:4]) in model.prompts
+
+
+def test_failed_pack_is_never_resent_unchanged_async():
+    model = PackModel(valid_packs=False)
+    packer = PromptPacker(model, pack_size=2, max_retries=3)
+    prompts = [f"p{i}" for i in range(4)]
+    results = asyncio.run(packer.ainvoke_many(prompts))
+    assert [r.content for r in results] == [f"avulso: {p}" for p in prompts]
+    assert len(model.prompts) == len(set(model.prompts))
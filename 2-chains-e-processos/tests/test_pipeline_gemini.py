@@ -0,0 +1,48 @@
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from conftest import run_in_thread
+from pipeline_gemini import Stage, StagedPipeline
+
+
+def test_results_in_input_order():
+    pipeline = StagedPipeline([
+        Stage("dobrar", RunnableLambda(lambda x: x * 2), workers=3, queue_size=2),
+        Stage("somar", RunnableLambda(lambda x: x + 1), workers=2, queue_size=2),
+    ])
+    outcome = run_in_thread(lambda: pipeline.run(list(range(30))))
+    assert outcome["result"] == [x * 2 + 1 for x in range(30)]
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError("item 3")
+    return x
+
+
+def test_stage_error_with_full_queue_does_not_hang():
+    pipeline = StagedPipeline([Stage("falha", RunnableLambda(fail_on_three), workers=2, queue_size=2)])
+    outcome = run_in_thread(lambda: pipeline.run(list(range(50))))
+    assert isinstance(outcome["error"], ValueError)
+
+
+def test_stage_error_with_generator_input_does_not_hang():
+    pipeline = StagedPipeline([
+        Stage("falha", RunnableLambda(fail_on_three), workers=2, queue_size=2),
+        Stage("igual", RunnableLambda(lambda x: x), workers=1, queue_size=1),
+    ])
+    outcome = run_in_thread(lambda: pipeline.run(x for x in range(50)))
+    assert isinstance(outcome["error"], ValueError)
+
+
+def test_return_exceptions_keeps_going():
+    pipeline = StagedPipeline([Stage("falha", RunnableLambda(fail_on_three), workers=2, queue_size=2)],
+                              return_exceptions=True)
+    results = run_in_thread(lambda: pipeline.run(list(range(10))))["result"]
+    assert isinstance(results[3], ValueError)
+    assert [r for i, r in enumerate(results) if i != 3] == [x for x in range(10) if x != 3]
+
+
+def test_requires_a_stage():
+    with pytest.raises(ValueError):
+        StagedPipeline([])
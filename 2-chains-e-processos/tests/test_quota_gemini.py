@@ -0,0 +1,16 @@
+from quota_gemini import SlidingWindowCounter
+
+
+def test_window_frees_space_when_the_oldest_events_expire():
+    now = [1000.0]
+    counter = SlidingWindowCounter(86400, clock=lambda: now[0])
+    for second in range(10):
+        now[0] = 1000.0 + second
+        counter.add(2)
+    now[0] = 1000.0 + 86400 + 0.5
+
+    assert counter.count() == 18
+    assert counter.time_until_available(1, 20) == 0.0
+    # 5 a mais precisam expirar 3 eventos: os 2 do segundo 1001 e mais 1 do 1002
+    assert counter.time_until_available(5, 20) == 1.5
+    assert counter.time_until_available(21, 20) == float("inf")
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+from langchain_core.messages import AIMessage
+
+from conftest import run_in_thread
+from sumarizacao_gemini import MapReduceSummarizer
+
+
+class FakeModel:
+    """Modelo falso: resume devolvendo o fim do prompt e falha nos prompts com `fail_on`"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        if self.fail_on is not None and self.fail_on in prompt:
+            raise ValueError(f"falha em {self.fail_on}")
+        return AIMessage(content=f"resumo({prompt[-12:]})")
+
+
+def chunks(n):
+    return [f"chunk número {i:03d}" for i in range(n)]
+
+
+def test_map_keeps_chunk_order_with_generator_input():
+    summarizer = MapReduceSummarizer(FakeModel(), max_concurrency=3, queue_size=2)
+    results = asyncio.run(summarizer.amap(c for c in chunks(20)))
+    assert [r["index"] for r in results] == list(range(20))
+
+
+def test_map_error_with_generator_input_does_not_hang():
+    summarizer = MapReduceSummarizer(FakeModel(fail_on="número 003"), max_concurrency=2, queue_size=2)
+    outcome = run_in_thread(lambda: summarizer.summarize(c for c in chunks(50)))
+    assert isinstance(outcome["error"], ValueError)
+
+
+def test_map_error_with_list_input_is_raised():
+    summarizer = MapReduceSummarizer(FakeModel(fail_on="número 003"), max_concurrency=2)
+    outcome = run_in_thread(lambda: summarizer.summarize(chunks(10)))
+    assert isinstance(outcome["error"], ValueError)
+
+
+class SlowModel:
+    """Modelo falso mais lento, que anota os prompts em uma lista compartilhada"""
+
+    def __init__(self, prompts, started):
+        self.prompts = prompts
+        self.started = started
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.prompts.append(prompt)
+        self.started.set()
+        await asyncio.sleep(0.02)
+        return AIMessage(content=f"resumo({prompt[-12:]})")
+
+
+def run_two_workers(tmp_path, make_chunks):
+    from journal_gemini import JobJournal
+    from sumarizacao_gemini import IncrementalSummarizer
+
+    path = str(tmp_path / "journal.jsonl")
+    prompts = []
+    started = threading.Event()
+    models, outcomes = {}, {}
+
+    def worker(name):
+        # O worker "b" entra com o job já em andamento
+        if name == "b":
+            started.wait(5)
+        journal = JobJournal(path, worker_id=name)
+        models[name] = SlowModel(prompts, started)
+        summarizer = IncrementalSummarizer(models[name], store=journal, max_concurrency=3,
+                                           queue_size=2, token_budget=120, poll_interval=0.01)
+        try:
+            outcomes[name] = summarizer.summarize(make_chunks())
+        finally:
+            journal.close()
+
+    threads = [threading.Thread(target=worker, args=(name,), daemon=True) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(20)
+        assert not thread.is_alive(), "os workers travaram"
+    return models, outcomes, prompts
+
+
+def test_two_workers_split_one_job_from_a_list(tmp_path):
+    models, outcomes, prompts = run_two_workers(tmp_path, lambda: chunks(24))
+    assert models["a"].calls > 0 and models["b"].calls > 0
+    assert len(prompts) == len(set(prompts)), "um passo foi calculado pelos dois workers"
+    assert outcomes["a"]["summary"] == outcomes["b"]["summary"]
+
+
+def test_two_workers_split_one_job_from_a_generator(tmp_path):
+    models, outcomes, prompts = run_two_workers(tmp_path, lambda: (c for c in chunks(24)))
+    assert models["a"].calls > 0 and models["b"].calls > 0
+    assert len(prompts) == len(set(prompts)), "um passo foi calculado pelos dois workers"
+    assert outcomes["a"]["summary"] == outcomes["b"]["summary"]
+
+
+def test_default_worker_ids_differ_between_processes(tmp_path):
+    import os
+
+    from journal_gemini import JobJournal
+
+    with JobJournal(str(tmp_path / "journal.jsonl")) as journal:
+        assert journal.worker_id.endswith(f"-{os.getpid()}")
+
+
+class DictStore(dict):
+    """Store em memória com a interface get/set do ResponseCache"""
+
+    def set(self, key, message):
+        self[key] = message
+
+
+def test_prefilter_is_part_of_the_leaf_key():
+    from sumarizacao_gemini import IncrementalSummarizer
+
+    store = DictStore()
+    IncrementalSummarizer(FakeModel(), store=store).summarize(chunks(4))
+    model = FakeModel()
+    IncrementalSummarizer(model, store=store, prefilter=str.upper).summarize(chunks(4))
+    # Os resumos sem pré-filtro não servem: os 4 chunks passam de novo pela fase map
+    assert model.calls >= 4
+    model = FakeModel()
+    IncrementalSummarizer(model, store=store, prefilter=str.upper).summarize(chunks(4))
+    assert model.calls == 0
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from quota_gemini import CircuitBreaker, QuotaLimiter
+from utils_gemini import RateLimitedModel
+
+FAST_QUOTA = {"requests_per_minute": 6000, "burst_size": 100, "requests_per_hour": None,
+              "requests_per_day": None, "tokens_per_minute": None}
+
+
+class ScriptedClient:
+    """Chat model falso que devolve (ou levanta) as respostas na ordem dada"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+
+    def _next(self):
+        outcome = self.outcomes.pop(0) if self.outcomes else AIMessage(content="ok")
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def invoke(self, prompt):
+        return self._next()
+
+    async def ainvoke(self, prompt):
+        outcome = self._next()
+        if outcome == "lento":
+            await asyncio.sleep(10)
+        return outcome
+
+
+def make_model(client, breaker):
+    return RateLimitedModel(client=client, limiter=QuotaLimiter.from_config(FAST_QUOTA),
+                            circuit_breaker=breaker, max_retries=0)
+
+
+def open_breaker(model):
+    for _ in range(2):
+        with pytest.raises(Exception, match="429"):
+            model.invoke("oi")
+    assert model.circuit_breaker.state == "open"
+    time.sleep(0.02)
+
+
+def test_non_quota_error_in_the_trial_closes_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    model = make_model(ScriptedClient(Exception("429 quota"), Exception("429 quota"), ValueError("prompt inválido")),
+                       breaker)
+    open_breaker(model)
+
+    # A chamada de teste falha com um erro que não é de quota: o servidor respondeu
+    with pytest.raises(ValueError):
+        model.invoke("oi")
+    assert breaker.state == "closed"
+    assert model.invoke("oi").content == "ok"
+
+
+def test_cancelled_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+    model = make_model(ScriptedClient(Exception("429 quota"), Exception("429 quota"), "lento"), breaker)
+    open_breaker(model)
+
+    async def cancel_trial():
+        task = asyncio.ensure_future(model.ainvoke("oi"))
+        await asyncio.sleep(0.05)
+        assert breaker.state == "half_open"
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == "open"
+    # A próxima chamada vira a nova chamada de teste em vez de ficar recusada
+    assert model.invoke("oi").content == "ok"
+    assert breaker.state == "closed"
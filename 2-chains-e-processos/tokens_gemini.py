@@ -0,0 +1,122 @@
+"""
+ESTIMATIVA LOCAL DE TOKENS
+==========================
+
+A quota do Gemini também limita tokens por minuto (TPM), então o
+limitador precisa saber quanto cada requisição vai custar ANTES de
+enviá-la. Este módulo estima tokens localmente, sem chamar a API:
+
+- textos: heurística por palavras/pontuação, com cache por conteúdo
+- templates: a parte fixa do template é contada uma única vez
+- calibração: depois de cada chamada, o uso real (usage_metadata) ajusta
+  um fator de correção, então a estimativa converge para o tokenizador
+  do Gemini
+
+Como usar:
+from tokens_gemini import TokenEstimator
+
+estimator = TokenEstimator()
+estimator.estimate("Seu prompt aqui")
+estimator.estimate_template(map_prompt, context=chunk)
+"""
+
+import math
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Palavras e números contam ~1.3 token; cada pontuação/símbolo conta 1
+_WORD = re.compile(r"\w+", re.UNICODE)
+_SYMBOL = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+@lru_cache(maxsize=65536)
+def _raw_estimate(text: str) -> int:
+    if not text:
+        return 0
+    words = _WORD.findall(text)
+    # Palavras longas viram vários tokens
+    word_tokens = sum(1 + len(word) // 8 for word in words) * 1.3
+    symbols = len(_SYMBOL.findall(text))
+    return max(1, math.ceil(max(word_tokens + symbols, len(text) / 4)))
+
+
+class TokenEstimator:
+    """
+    Estimador de tokens com cache e calibração pelo uso real.
+
+    Uma única instância pode ser compartilhada entre threads.
+    """
+
+    def __init__(self, smoothing: float = 0.2):
+        """
+        Args:
+            smoothing (float): Peso de cada nova observação no fator de correção
+        """
+        self.smoothing = smoothing
+        self.correction = 1.0
+        self._template_overhead: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, text: str) -> int:
+        """Tokens estimados de um texto (cacheado por conteúdo)"""
+        return math.ceil(_raw_estimate(text) * self.correction)
+
+    def estimate_prompt(self, prompt: Any) -> int:
+        """Aceita strings, listas de mensagens, tuplas (papel, texto) e PromptValues"""
+        if isinstance(prompt, str):
+            return self.estimate(prompt)
+        if hasattr(prompt, "to_messages"):
+            prompt = prompt.to_messages()
+        if isinstance(prompt, (list, tuple)):
+            total = 0
+            for message in prompt:
+                if isinstance(message, (list, tuple)) and len(message) == 2:
+                    content = message[1]
+                else:
+                    content = getattr(message, "content", message)
+                # ~4 tokens de estrutura por mensagem
+                total += self.estimate(str(content)) + 4
+            return total
+        return self.estimate(str(getattr(prompt, "content", prompt)))
+
+    def estimate_template(self, template: Any, **variables: Any) -> int:
+        """
+        Tokens de um PromptTemplate preenchido.
+
+        A parte fixa do template é contada só na primeira vez; depois só as
+        variáveis são estimadas.
+        """
+        key = getattr(template, "template", None) or str(template)
+        overhead = self._template_overhead.get(key)
+        if overhead is None:
+            fixed = re.sub(r"\{[^{}]*\}", "", key)
+            overhead = _raw_estimate(fixed)
+            self._template_overhead[key] = overhead
+        variable_tokens = sum(_raw_estimate(str(value)) for value in variables.values())
+        return math.ceil((overhead + variable_tokens) * self.correction)
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Ajusta o fator de correção com o uso real de uma chamada"""
+        if not actual or not estimated:
+            return
+        with self._lock:
+            ratio = actual / (estimated / self.correction)
+            self.correction = (1 - self.smoothing) * self.correction + self.smoothing * ratio
+
+
+def usage_tokens(result: Any) -> Optional[Dict[str, int]]:
+    """Extrai usage_metadata (input/output/total) de uma resposta, se houver"""
+    usage = getattr(result, "usage_metadata", None)
+    if not usage:
+        return None
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    }
+
+
+# Instância compartilhada usada por padrão pelos modelos e pelo sumarizador
+DEFAULT_ESTIMATOR = TokenEstimator()
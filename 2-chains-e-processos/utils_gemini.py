@@ -10,98 +10,532 @@ from utils_gemini import RateLimitedModel
 
 model = RateLimitedModel()
 result = model.invoke("Seu prompt aqui")
+
+Em código assíncrono as requisições podem rodar em paralelo enquanto
+houver quota (veja quota_gemini.py):
+results = await model.abatch(["Prompt 1", "Prompt 2", "Prompt 3"])
+
+O RateLimitedModel é um Runnable do LangChain (LCEL), então pode ser
+encadeado com `|`; invoke, batch, stream e astream_events da chain passam
+pelo limitador compartilhado:
+chain = PromptTemplate.from_template("Resuma: {texto}") | model | StrOutputParser()
+chain.batch([{"texto": t} for t in textos])
+
+Para APIs que exigem um BaseChatModel (ex.: load_summarize_chain), use
+model.as_chat_model() (veja adaptador_gemini.py).
+
+Para mostrar a resposta enquanto ela é gerada:
+for chunk in model.stream("Seu prompt aqui"):
+    print(chunk.content, end="", flush=True)
+
+Cada chamada registra espera na quota, tempo do modelo, backoff e tokens
+em telemetria_gemini.TELEMETRY (exportável para Prometheus ou JSON).
+
+Importar este módulo é barato: langchain_google_genai e o .env só são
+carregados quando o primeiro RateLimitedModel faz uma chamada real ao
+Gemini. Respostas do cache não constroem o cliente. Para conferir o custo
+de inicialização: python benchmark_gemini.py --startup
+
+Modelos do mesmo processo dividem clientes e quota pelo registro de
+clientes_gemini.py: dois RateLimitedModel do mesmo modelo e API key usam
+o mesmo bucket de requisições por minuto.
 """
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
+from cache_gemini import SingleFlight, make_cache_key
+from clientes_gemini import REGISTRY
+from tokens_gemini import DEFAULT_ESTIMATOR, usage_tokens
+from telemetria_gemini import TELEMETRY
+from quota_gemini import (
+    QuotaLimiter, QUOTA_CONFIG, AdaptiveRateController, CircuitBreaker, is_quota_error,
+)
+from collections import deque
+from typing import Any
+import asyncio
+import math
 import time
-import random
 
-# Carrega as variáveis de ambiente (API key do Gemini)
-load_dotenv()
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+
+def quota_concurrency(config):
+    """
+    Config de batch/abatch com `max_concurrency` padrão da quota.
+    
+    Sem um limite explícito, o LCEL usaria um thread (ou corrotina) por
+    entrada; o padrão passa a ser QUOTA_CONFIG["max_concurrent_requests"].
+    O ritmo continua vindo do limitador, então o lote usa a quota inteira.
+    """
+    if isinstance(config, list):
+        return [quota_concurrency(c) for c in config]
+    config = dict(config or {})
+    if config.get("max_concurrency") is None:
+        config["max_concurrency"] = QUOTA_CONFIG["max_concurrent_requests"]
+    return config
+
+
+async def _single(value):
+    yield value
+
 
-class RateLimitedModel:
+class RateLimitedModel(Runnable[Any, BaseMessage]):
     """
     Modelo Gemini com rate limiting automático para evitar exceder quotas.
     
     Características:
-    - Delays automáticos de 4.5s entre chamadas
+    - Token buckets por minuto/hora/dia (QUOTA_CONFIG) em vez de delay fixo
+    - Orçamento de tokens por minuto: cada requisição reserva os tokens
+      estimados localmente e a reserva é corrigida com o uso real
+    - Versões assíncronas (ainvoke, abatch, astream) com requisições em paralelo
     - Tratamento automático de erros de quota
-    - Retry automático com backoff
-    - Compatível com todos os códigos LangChain
+    - Retry limitado, com a espera sugerida pelo servidor e taxa adaptativa (AIMD)
+    - Circuit breaker: com quota esgotada as chamadas falham rápido
+      (CircuitOpenError) em vez de ficarem presas
+    - Single-flight: prompts idênticos em andamento ao mesmo tempo viram
+      uma única chamada, com o resultado repassado a todos
+    - Streaming (stream, astream) com a mesma quota, medindo o tempo até o
+      primeiro token (TTFT) e tokens/s de cada chamada
+    - Cliente construído só na primeira chamada real (cache hits não o criam)
+      e compartilhado pelo processo (clientes_gemini.REGISTRY), assim como
+      o limitador, o controle de taxa e o circuit breaker da API key
+    - Runnable do LCEL: funciona com `|`, batch, abatch, stream, astream e
+      astream_events, sempre através do limitador
+    - Compatível com todos os códigos LangChain (as_chat_model() para as
+      APIs que exigem um BaseChatModel)
     """
     
-    def __init__(self, model_name="gemini-2.5-flash-lite", temperature=0):
+    def __init__(self, model_name="gemini-2.5-flash-lite", temperature=0, limiter=None, cache=None,
+                 max_retries=None, circuit_breaker=None, single_flight=None, client=None,
+                 token_estimator=None, telemetry=None, api_key=None):
         """
         Inicializa o modelo com rate limiting.
         
         Args:
             model_name (str): Nome do modelo Gemini (padrão: gemini-2.5-flash-lite)
             temperature (float): Temperatura do modelo (padrão: 0)
+            limiter (QuotaLimiter): Limitador a usar (padrão: o compartilhado
+                do registro para este modelo e API key)
+            cache (ResponseCache): Cache persistente de respostas (opcional);
+                respostas encontradas nele não gastam quota nem esperam
+            max_retries (int): Tentativas extras em erro de quota
+                (padrão: QUOTA_CONFIG["max_retries_on_quota_error"])
+            circuit_breaker (CircuitBreaker): Circuit breaker a usar (padrão: o
+                compartilhado do registro, ou um novo com `limiter` ou `client`)
+            single_flight (SingleFlight): Agrupador de chamadas idênticas; passe
+                o mesmo objeto para agrupar entre modelos (padrão: um novo)
+            client: Chat model do LangChain a usar no lugar do ChatGoogleGenerativeAI
+                (ex.: o modelo simulado de benchmark_gemini.py)
+            token_estimator (TokenEstimator): Estimador de tokens (padrão: o
+                compartilhado de tokens_gemini)
+            telemetry (Telemetry): Onde registrar espera na quota, tempo do
+                modelo, backoff e tokens (padrão: TELEMETRY)
+            api_key (str): API key do Gemini (padrão: GOOGLE_API_KEY do ambiente)
         """
-        self.model = ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
+        self.model_name = model_name
+        self.temperature = temperature
+        self.api_key = api_key
+        self._client = client
+        if limiter is None and client is None:
+            # Mesma quota para todos os modelos do processo com esta API key
+            quota = REGISTRY.quota(model_name, api_key)
+            self.limiter = quota.limiter
+            self.rate_controller = quota.rate_controller
+            self.circuit_breaker = circuit_breaker or quota.circuit_breaker
+        else:
+            self.limiter = limiter or QuotaLimiter.from_config()
+            self.rate_controller = AdaptiveRateController(self.limiter)
+            self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.cache = cache
+        self.cache_hits = 0
+        self.max_retries = max_retries if max_retries is not None else QUOTA_CONFIG["max_retries_on_quota_error"]
+        self.quota_errors = 0
+        self.single_flight = single_flight or SingleFlight()
+        self.stream_metrics = deque(maxlen=1000)
+        self.token_estimator = token_estimator or DEFAULT_ESTIMATOR
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.telemetry = telemetry or TELEMETRY
         self.last_call_time = 0
-        self.min_delay = 4.5  # Mínimo 4.5 segundos entre chamadas
+        self.min_delay = self.limiter.min_interval  # Intervalo médio entre chamadas
         self.request_count = 0
+        self.in_flight = 0
+        
+    @property
+    def model(self):
+        """Chat model do LangChain, construído na primeira chamada real"""
+        if self._client is None:
+            self._client = REGISTRY.client(self.model_name, self.temperature, self.api_key)
+        return self._client
+    
+    def _reservation(self, prompt):
+        """
+        Estima os tokens da requisição.
+        
+        Returns:
+            tuple: (tokens de entrada estimados, tokens a reservar no TPM)
+        """
+        input_estimate = self.token_estimator.estimate_prompt(prompt)
+        return input_estimate, input_estimate + QUOTA_CONFIG["expected_output_tokens"]
+    
+    def _wait_for_quota(self, prompt):
+        """Bloqueia até o limitador liberar a requisição (requisições e tokens)"""
+        reservation = self._reservation(prompt)
+        sleep_time = self.limiter.reserve(1, reservation[1])
+        self.telemetry.observe("gemini_limiter_wait_seconds", sleep_time, model=self.model_name)
+        if sleep_time > 0:
+            print(f"⏳ Aguardando {sleep_time:.1f}s para respeitar rate limit...")
+            time.sleep(sleep_time)
+        return reservation
+    
+    async def _await_quota(self, prompt):
+        """Suspende a corrotina até o limitador liberar a requisição"""
+        reservation = self._reservation(prompt)
+        sleep_time = await self.limiter.aacquire(1, reservation[1])
+        self.telemetry.observe("gemini_limiter_wait_seconds", sleep_time, model=self.model_name)
+        if sleep_time > 0:
+            print(f"⏳ Aguardou {sleep_time:.1f}s para respeitar rate limit")
+        return reservation
+    
+    def _cached(self, prompt):
+        """Retorna a resposta do cache, se houver"""
+        if self.cache is None:
+            return None
+        result = self.cache.lookup(self.model_name, self.temperature, prompt)
+        if result is not None:
+            self.cache_hits += 1
+            self.telemetry.increment("gemini_cache_hits_total", model=self.model_name)
+            print("📋 Usando resultado do cache")
+        return result
+    
+    def _store(self, prompt, result):
+        if self.cache is not None:
+            self.cache.update(self.model_name, self.temperature, prompt, result)
+    
+    def _record_usage(self, result, reservation):
+        """Corrige a reserva de tokens e calibra o estimador com o uso real"""
+        input_estimate, reserved = reservation
+        usage = usage_tokens(result)
+        if usage is None:
+            return
+        self.input_tokens += usage["input_tokens"]
+        self.output_tokens += usage["output_tokens"]
+        self.telemetry.increment("gemini_tokens_total", usage["input_tokens"], model=self.model_name, direction="in")
+        self.telemetry.increment("gemini_tokens_total", usage["output_tokens"], model=self.model_name, direction="out")
+        self.limiter.adjust_tokens(usage["total_tokens"] - reserved)
+        self.token_estimator.record_usage(input_estimate, usage["input_tokens"])
+    
+    def _record_success(self, result=None, reservation=None):
+        if reservation is not None:
+            self._record_usage(result, reservation)
+        self.last_call_time = time.time()
+        self.request_count += 1
+        self.rate_controller.on_success()
+        self.circuit_breaker.record_success()
+        print(f"✅ Requisição {self.request_count} processada com sucesso")
+    
+    def _observe_call(self, start, outcome):
+        """Registra o tempo do modelo (rede + geração) e o resultado da chamada"""
+        self.telemetry.observe("gemini_model_seconds", time.perf_counter() - start, model=self.model_name)
+        self.telemetry.increment("gemini_requests_total", model=self.model_name, outcome=outcome)
+    
+    def _handle_error(self, e, attempt, reservation=None):
+        """
+        Trata um erro da chamada ao modelo.
+        
+        Returns:
+            float: Segundos a esperar antes da próxima tentativa
+            
+        Raises:
+            Exception: O próprio erro, se não for de quota ou se as tentativas acabaram
+        """
+        if reservation is not None:
+            # A requisição recusada não gastou tokens
+            self.limiter.refund(0, reservation[1])
+        if not is_quota_error(e):
+            raise e
+        self.quota_errors += 1
+        self.circuit_breaker.record_failure()
+        backoff = self.rate_controller.on_quota_error(e)
+        if attempt >= self.max_retries:
+            raise e
+        self.telemetry.observe("gemini_retry_wait_seconds", backoff, model=self.model_name)
+        print(f"🚫 Quota excedida! Aguardando {backoff:.1f} segundos "
+              f"(taxa reduzida para {self.rate_controller.requests_per_minute:.1f} req/min)...")
+        return backoff
         
-    def invoke(self, prompt):
+    def invoke(self, prompt, config=None, **kwargs):
         """
         Invoca o modelo com rate limiting automático.
         
         Args:
             prompt: O prompt ou mensagem para enviar ao modelo
+            config (RunnableConfig): Config do LCEL (callbacks, tags, ...)
             
         Returns:
             Resposta do modelo
             
         Raises:
-            Exception: Se houver erro não relacionado à quota
+            CircuitOpenError: Se o circuito estiver aberto por erros de quota
+            Exception: Se houver erro não relacionado à quota, ou se a quota
+                continuar esgotada depois de `max_retries` tentativas
         """
-        # Aguarda o tempo necessário para respeitar o rate limit
-        current_time = time.time()
-        time_since_last_call = current_time - self.last_call_time
+        return self._call_with_config(self._invoke, prompt, config)
+    
+    def _invoke(self, prompt):
+        cached = self._cached(prompt)
+        if cached is not None:
+            return cached
         
-        if time_since_last_call < self.min_delay:
-            sleep_time = self.min_delay - time_since_last_call + random.uniform(0, 1)
-            print(f"⏳ Aguardando {sleep_time:.1f}s para respeitar rate limit...")
-            time.sleep(sleep_time)
+        # Pedidos idênticos em andamento esperam a mesma chamada
+        key = make_cache_key(self.model_name, self.temperature, prompt)
+        with self.telemetry.span("gemini.invoke", model=self.model_name):
+            return self.single_flight.do(key, lambda: self._invoke_upstream(prompt))
+    
+    def _invoke_upstream(self, prompt):
+        """Chamada real ao modelo, com quota, retry e circuit breaker"""
+        for attempt in range(self.max_retries + 1):
+            with self.circuit_breaker.guard():
+                # Aguarda o tempo necessário para respeitar o rate limit
+                reservation = self._wait_for_quota(prompt)
+                
+                start = time.perf_counter()
+                try:
+                    result = self.model.invoke(prompt)
+                except Exception as e:
+                    self._observe_call(start, "quota_error" if is_quota_error(e) else "error")
+                    backoff = self._handle_error(e, attempt, reservation)
+                else:
+                    self._observe_call(start, "ok")
+                    self._record_success(result, reservation)
+                    self._store(prompt, result)
+                    return result
+            time.sleep(backoff)
+    
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        """
+        Versão assíncrona de invoke.
+        
+        Várias chamadas podem ficar em andamento ao mesmo tempo: cada uma
+        espera apenas pelo seu token, e a latência de rede de uma se sobrepõe
+        à espera das outras.
+        """
+        return await self._acall_with_config(self._ainvoke, prompt, config)
+    
+    async def _ainvoke(self, prompt):
+        cached = self._cached(prompt)
+        if cached is not None:
+            return cached
         
-        try:
-            result = self.model.invoke(prompt)
-            self.last_call_time = time.time()
-            self.request_count += 1
-            print(f"✅ Requisição {self.request_count} processada com sucesso")
-            return result
-        except Exception as e:
-            if "quota" in str(e).lower() or "429" in str(e):
-                print(f"🚫 Quota excedida! Aguardando 60 segundos...")
-                time.sleep(60)
-                # Tenta novamente
-                return self.invoke(prompt)
-            else:
-                raise e
+        key = make_cache_key(self.model_name, self.temperature, prompt)
+        with self.telemetry.span("gemini.invoke", model=self.model_name):
+            return await self.single_flight.ado(key, lambda: self._ainvoke_upstream(prompt))
+    
+    async def _ainvoke_upstream(self, prompt):
+        """Versão assíncrona de _invoke_upstream"""
+        for attempt in range(self.max_retries + 1):
+            with self.circuit_breaker.guard():
+                reservation = await self._await_quota(prompt)
+                self.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    result = await self.model.ainvoke(prompt)
+                except Exception as e:
+                    self._observe_call(start, "quota_error" if is_quota_error(e) else "error")
+                    backoff = self._handle_error(e, attempt, reservation)
+                else:
+                    self._observe_call(start, "ok")
+                    self._record_success(result, reservation)
+                    self._store(prompt, result)
+                    return result
+                finally:
+                    self.in_flight -= 1
+            await asyncio.sleep(backoff)
+    
+    def batch(self, prompts, config=None, *, return_exceptions=False, **kwargs):
+        """
+        Processa vários prompts em paralelo (threads), respeitando a quota.
+        
+        Args:
+            prompts (list): Prompts ou listas de mensagens
+            config (RunnableConfig): Config do LCEL; `max_concurrency` é o
+                máximo de requisições em andamento
+                (padrão: QUOTA_CONFIG["max_concurrent_requests"])
+            return_exceptions (bool): Devolve os erros na lista em vez de levantar
+            
+        Returns:
+            list: Respostas na mesma ordem dos prompts
+        """
+        return super().batch(prompts, quota_concurrency(config), return_exceptions=return_exceptions, **kwargs)
+    
+    async def abatch(self, prompts, config=None, *, return_exceptions=False, **kwargs):
+        """Versão assíncrona de batch (corrotinas em vez de threads)"""
+        return await super().abatch(prompts, quota_concurrency(config),
+                                    return_exceptions=return_exceptions, **kwargs)
+    
+    def _record_stream(self, start, first_token_at, full):
+        """Guarda TTFT, duração e tokens/s de uma chamada em streaming"""
+        end = time.perf_counter()
+        usage = getattr(full, "usage_metadata", None) or {}
+        text = getattr(full, "content", "") if full is not None else ""
+        output_tokens = usage.get("output_tokens") or math.ceil(len(str(text)) / 4)
+        generation_time = end - (first_token_at or end)
+        metrics = {
+            "ttft": (first_token_at or end) - start,
+            "duration": end - start,
+            "output_tokens": output_tokens,
+            "tokens_per_second": output_tokens / generation_time if generation_time > 0 else 0.0,
+        }
+        self.stream_metrics.append(metrics)
+        self.telemetry.observe("gemini_ttft_seconds", metrics["ttft"], model=self.model_name)
+        return metrics
+    
+    def stream(self, prompt, config=None, **kwargs):
+        """
+        Invoca o modelo em streaming, com a mesma quota de invoke.
+        
+        Erros de quota antes do primeiro chunk são tratados com retry como em
+        invoke; depois que a resposta começou, o erro é repassado.
+        
+        Yields:
+            Chunks da resposta (AIMessageChunk) conforme chegam
+        """
+        yield from self._transform_stream_with_config(iter([prompt]), self._stream_prompts, config)
+    
+    def _stream_prompts(self, prompts):
+        for prompt in prompts:
+            yield from self._stream(prompt)
+    
+    def _stream(self, prompt):
+        cached = self._cached(prompt)
+        if cached is not None:
+            yield cached
+            return
+        
+        for attempt in range(self.max_retries + 1):
+            with self.circuit_breaker.guard():
+                reservation = self._wait_for_quota(prompt)
+                start = time.perf_counter()
+                first_token_at = None
+                full = None
+                self.in_flight += 1
+                try:
+                    for chunk in self.model.stream(prompt):
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            # O servidor respondeu: o circuito fecha mesmo que o consumidor pare no meio
+                            self.circuit_breaker.end_trial(answered=True)
+                        full = chunk if full is None else full + chunk
+                        yield chunk
+                except Exception as e:
+                    self._observe_call(start, "quota_error" if is_quota_error(e) else "error")
+                    if first_token_at is not None:
+                        raise
+                    backoff = self._handle_error(e, attempt, reservation)
+                else:
+                    self._observe_call(start, "ok")
+                    self._record_success(full, reservation)
+                    self._record_stream(start, first_token_at, full)
+                    if full is not None:
+                        self._store(prompt, full)
+                    return
+                finally:
+                    self.in_flight -= 1
+            time.sleep(backoff)
+    
+    async def astream(self, prompt, config=None, **kwargs):
+        """Versão assíncrona de stream (também usada por astream_events)"""
+        async for chunk in self._atransform_stream_with_config(_single(prompt), self._astream_prompts, config):
+            yield chunk
+    
+    async def _astream_prompts(self, prompts):
+        async for prompt in prompts:
+            async for chunk in self._astream(prompt):
+                yield chunk
+    
+    async def _astream(self, prompt):
+        cached = self._cached(prompt)
+        if cached is not None:
+            yield cached
+            return
+        
+        for attempt in range(self.max_retries + 1):
+            with self.circuit_breaker.guard():
+                reservation = await self._await_quota(prompt)
+                start = time.perf_counter()
+                first_token_at = None
+                full = None
+                self.in_flight += 1
+                try:
+                    async for chunk in self.model.astream(prompt):
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            # O servidor respondeu: o circuito fecha mesmo que o consumidor pare no meio
+                            self.circuit_breaker.end_trial(answered=True)
+                        full = chunk if full is None else full + chunk
+                        yield chunk
+                except Exception as e:
+                    self._observe_call(start, "quota_error" if is_quota_error(e) else "error")
+                    if first_token_at is not None:
+                        raise
+                    backoff = self._handle_error(e, attempt, reservation)
+                else:
+                    self._observe_call(start, "ok")
+                    self._record_success(full, reservation)
+                    self._record_stream(start, first_token_at, full)
+                    if full is not None:
+                        self._store(prompt, full)
+                    return
+                finally:
+                    self.in_flight -= 1
+            await asyncio.sleep(backoff)
+    
+    def as_chat_model(self):
+        """
+        Este modelo como BaseChatModel do LangChain, para APIs que exigem
+        um (ex.: load_summarize_chain). As chamadas continuam passando pelo
+        limitador, cache e retry deste objeto.
+        """
+        from adaptador_gemini import RateLimitedChatModel
+        return RateLimitedChatModel(rate_limited=self)
     
     def get_stats(self):
         """Retorna estatísticas de uso"""
+        limiter_status = self.limiter.get_status()
+        streams = list(self.stream_metrics)
         return {
             "total_requests": self.request_count,
             "last_call_time": self.last_call_time,
-            "min_delay": self.min_delay
+            "min_delay": self.min_delay,
+            "in_flight": self.in_flight,
+            "cache_hits": self.cache_hits,
+            "quota_errors": self.quota_errors,
+            "requests_per_minute": self.rate_controller.requests_per_minute,
+            "circuit_state": self.circuit_breaker.state,
+            "single_flight_saved": self.single_flight.calls_saved,
+            "total_wait_time": limiter_status["total_wait_time"],
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "reserved_tokens": limiter_status["total_tokens"],
+            "streams": len(streams),
+            "avg_ttft": sum(m["ttft"] for m in streams) / len(streams) if streams else None,
+            "avg_tokens_per_second": (sum(m["tokens_per_second"] for m in streams) / len(streams)
+                                      if streams else None),
         }
 
 # Função de conveniência para criar modelo rapidamente
-def create_gemini_model(model_name="gemini-2.5-flash-lite", temperature=0):
+def create_gemini_model(model_name="gemini-2.5-flash-lite", temperature=0, limiter=None, cache=None):
     """
     Função rápida para criar um modelo Gemini com rate limiting.
     
     Args:
         model_name (str): Nome do modelo
         temperature (float): Temperatura
+        limiter (QuotaLimiter): Limitador compartilhado (opcional)
+        cache (ResponseCache): Cache persistente de respostas (opcional)
         
     Returns:
         RateLimitedModel: Modelo configurado
     """
-    return RateLimitedModel(model_name, temperature)
+    return RateLimitedModel(model_name, temperature, limiter, cache)
 
 # Exemplo de uso
 if __name__ == "__main__":